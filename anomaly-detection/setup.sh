@@ -4,7 +4,9 @@
 kubectl apply dummy_pod.yaml
 
 # update the DEFAULT_INSTANCE_IP set to the t3.small instance
-docker buildx build --platform linux/amd64 -t chidambaram27/anomaly-detection-tool:v2 ./tool
+docker buildx build --platform linux/amd64 \
+  --build-context anomaly_core=../ml-model/pipelines/anomaly_core \
+  -t chidambaram27/anomaly-detection-tool:v2 ./tool
 
 docker push chidambaram27/anomaly-detection-tool:v1
 
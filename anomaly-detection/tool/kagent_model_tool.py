@@ -6,12 +6,83 @@ Uses HTTP transport for MCP communication
 """
 import os
 import json
+import time
+# Start of the module import, for the tool's startup metrics
+_IMPORT_STARTED = time.perf_counter()
+import asyncio
+import threading
+import contextvars
+import httpx
 import requests
-import pandas as pd
-from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional
-from prometheus_api_client import PrometheusConnect
+import numpy as np
+from datetime import datetime
+from collections import OrderedDict
+from contextlib import asynccontextmanager, suppress
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, AsyncIterator, Awaitable, Callable, Dict, List, Any, Optional, Sequence, Tuple, Union
 from fastmcp import FastMCP
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from anomaly_core import (
+    DEFAULT_METRIC_SPEC,
+    FEATURE_COLUMNS,
+    MetricSpec,
+    MicroBatcher,
+    ModelRouter,
+    ModelStore,
+    RangeCache,
+    ResultStore,
+    RingBuffer,
+    RollingFeatureState,
+    SingleFlight,
+    Telemetry,
+    align_series,
+    align_window,
+    anomaly_periods,
+    anomaly_scores,
+    compute_features,
+    configure_tracing,
+    decode_infer_outputs,
+    encode_infer_request,
+    format_timestamps,
+    instance_matchers,
+    load_metric_spec,
+    lttb_indices,
+    minmax_indices,
+    parse_duration,
+    pushdown_features,
+    pushdown_queries,
+    run_max,
+    run_mean,
+    run_min,
+    samples_to_arrays,
+    validate_pushdown,
+)
+
+# Only the DataFrame wrappers and the sync query path need these; importing them
+# on first use keeps them off the server's cold start
+if TYPE_CHECKING:
+    import pandas as pd
+    from prometheus_api_client import PrometheusConnect
+
+
+class _SeriesStream:
+    """Streaming state for one (queries, step): rolling features plus scored rows"""
+    
+    def __init__(self, capacity: int, covered_since: float, metric_spec: MetricSpec):
+        self.lock = threading.Lock()
+        self.alock = asyncio.Lock()
+        self.features = RollingFeatureState(metric_spec.window, metric_spec.feature_matrix)
+        # Each row is the feature vector followed by the model's anomaly score
+        self.rows = RingBuffer(capacity, len(metric_spec.feature_columns) + 1)
+        self.covered_since = covered_since
+        # Wall-clock end of the last window fetched into this stream
+        self.scored_until = 0.0
+    
+    def append(self, timestamps: np.ndarray, features: np.ndarray, scores: np.ndarray) -> None:
+        self.rows.append(timestamps, np.column_stack((features, scores)))
+        if len(self.rows) == self.rows.capacity:
+            self.covered_since = max(self.covered_since, self.rows.oldest_timestamp)
 
 
 class AnomalyDetectionTool:
@@ -22,7 +93,36 @@ class AnomalyDetectionTool:
         prometheus_url: str,
         inference_service_url: str,
         model_name: str = "sklearn-iris",
-        namespace: str = "default"
+        namespace: str = "default",
+        stream_buffer_hours: int = 24,
+        max_streams: int = 64,
+        max_concurrent_queries: int = 8,
+        max_concurrent_inferences: int = 8,
+        prometheus_timeout: float = 30.0,
+        inference_timeout: float = 30.0,
+        binary_payloads: bool = True,
+        max_payload_bytes: int = 4 * 1024 * 1024,
+        scoring_backend: str = "http",
+        model_store: Optional[ModelStore] = None,
+        cache_max_bytes: int = 64 * 1024 * 1024,
+        cache_ttl_seconds: float = 300.0,
+        merge_gap_seconds: float = 0.0,
+        min_period_seconds: float = 0.0,
+        top_periods: int = 10,
+        max_series_points: int = 48,
+        downsample_method: str = "minmax",
+        result_store: Optional[ResultStore] = None,
+        metric_spec: Optional[MetricSpec] = None,
+        route_by_instance: bool = False,
+        model_index_ttl_seconds: float = 60.0,
+        coalesce_requests: bool = True,
+        batch_window_seconds: float = 0.002,
+        feature_source: str = "client",
+        pushdown_retry_seconds: float = 3600.0,
+        watched_instances: Sequence[str] = (),
+        prescore_interval_seconds: float = 30.0,
+        anomaly_threshold: float = 0.0,
+        telemetry: Optional[Telemetry] = None
     ):
         """
         Initialize the tool
@@ -32,19 +132,389 @@ class AnomalyDetectionTool:
             inference_service_url: KServe InferenceService URL (can be internal or external)
             model_name: Name of the InferenceService
             namespace: Kubernetes namespace
+            stream_buffer_hours: Hours of scored samples kept per query for incremental calls
+            max_streams: Maximum number of queries with streaming state (least recently used evicted)
+            max_concurrent_queries: Async Prometheus range queries allowed in flight at once
+            max_concurrent_inferences: Async KServe requests allowed in flight at once
+            prometheus_timeout: Per-call timeout in seconds for Prometheus queries
+            inference_timeout: Per-call timeout in seconds for KServe requests
+            binary_payloads: Use the v2 binary tensor extension, falling back to JSON
+                if the server rejects it
+            max_payload_bytes: Approximate request size limit; larger feature matrices
+                are split into chunks that are scored in parallel
+            scoring_backend: "http" to always call KServe, or "local" to score in-process
+                with the model from model_store, falling back to KServe while no model is loaded
+            model_store: Source of the local model for the "local" backend
+            cache_max_bytes: Memory budget of the Prometheus range-query cache; 0 disables it
+            cache_ttl_seconds: Maximum age of cached range-query results
+            merge_gap_seconds: Anomaly periods separated by at most this much normal or
+                missing data are reported as one period
+            min_period_seconds: Anomaly periods shorter than this are not reported
+            top_periods: Anomaly periods included in a summary, most anomalous (lowest peak score) first
+            max_series_points: Point budget of the downsampled CPU series in a summary
+            downsample_method: "minmax" (keeps spikes) or "lttb" (keeps visual shape)
+            result_store: Where full per-sample results are saved for paging;
+                None keeps summaries only
+            metric_spec: Metrics fetched per node and the features built from them; must
+                match the spec the deployed model was trained with (default: CPU only)
+            route_by_instance: Score each instance with its own model when the deployment
+                serves one (per-instance pipeline), falling back to model_name
+            model_index_ttl_seconds: How long the list of served models is cached
+            coalesce_requests: Identical predictions that overlap in time share one
+                Prometheus query and inference (single-flight)
+            batch_window_seconds: Async KServe scoring calls for the same model arriving within
+                this window are sent as one request; 0 disables micro-batching
+            feature_source: "client" computes rolling features in the tool from raw samples;
+                "prometheus" has Prometheus compute them with subqueries (full fetches and
+                the fleet sweep), used once it has matched the client engine on real data
+            pushdown_retry_seconds: After push-down features differ from the client engine, how
+                long features are computed client-side before push-down is checked again
+            watched_instances: Instances run_prescoring keeps scored in the background, so
+                tool calls for them are answered from the stream buffers without fetching
+            prescore_interval_seconds: Cadence of background scoring; buffers up to twice
+                this old are served as-is
+            anomaly_threshold: Rows whose anomaly score (decision_function, lower is more
+                anomalous) is below this are reported as anomalies; 0 is the model's own
+                cut-off, raise it to flag more and lower it to flag only the most severe
+            telemetry: Stage metrics and spans; a private instance by default
         """
         self.prometheus_url = prometheus_url
         self.inference_service_url = inference_service_url
         self.model_name = model_name
         self.namespace = namespace
-        self.prom = PrometheusConnect(url=prometheus_url, disable_ssl=True)
+        self.stream_buffer_hours = stream_buffer_hours
+        self.max_streams = max_streams
+        self.max_concurrent_queries = max_concurrent_queries
+        self.max_concurrent_inferences = max_concurrent_inferences
+        self.prometheus_timeout = prometheus_timeout
+        self.inference_timeout = inference_timeout
+        self.binary_payloads = binary_payloads
+        self.max_payload_bytes = max_payload_bytes
+        self.merge_gap_seconds = merge_gap_seconds
+        self.min_period_seconds = min_period_seconds
+        if downsample_method not in ("minmax", "lttb"):
+            raise ValueError(f"downsample_method must be 'minmax' or 'lttb', got {downsample_method!r}")
+        self.top_periods = top_periods
+        self.max_series_points = max_series_points
+        self.downsample_method = downsample_method
+        self.result_store = result_store
+        self.metric_spec = metric_spec or DEFAULT_METRIC_SPEC
+        self._router = ModelRouter(model_name, self._served_models, model_index_ttl_seconds) if route_by_instance else None
+        # None until the first binary request tells us whether the server supports it
+        self._binary_supported: Optional[bool] = None
+        if scoring_backend not in ("http", "local"):
+            raise ValueError(f"scoring_backend must be 'http' or 'local', got {scoring_backend!r}")
+        self.scoring_backend = scoring_backend
+        if feature_source not in ("client", "prometheus"):
+            raise ValueError(f"feature_source must be 'client' or 'prometheus', got {feature_source!r}")
+        self.feature_source = feature_source
+        # Set once push-down features have matched the client engine on real data
+        self._pushdown_verified = False
+        if pushdown_retry_seconds < 0:
+            raise ValueError(f"pushdown_retry_seconds must not be negative, got {pushdown_retry_seconds}")
+        self.pushdown_retry_seconds = pushdown_retry_seconds
+        # Monotonic time before which a failed push-down is not tried again
+        self._pushdown_retry_at = 0.0
+        if prescore_interval_seconds <= 0:
+            raise ValueError(f"prescore_interval_seconds must be positive, got {prescore_interval_seconds}")
+        if len(watched_instances) > max_streams:
+            print(f"Warning: {len(watched_instances)} watched instances but max_streams={max_streams}; "
+                  f"pre-scored streams will be evicted")
+        self.watched_instances = list(watched_instances)
+        self.prescore_interval_seconds = prescore_interval_seconds
+        self.anomaly_threshold = anomaly_threshold
+        # Stream keys the last pre-scoring pass refreshed
+        self._prescored_keys: set = set()
+        self._prescore_lookups = 0
+        self._prescore_hits = 0
+        self.model_store = model_store
+        self._prom: Optional["PrometheusConnect"] = None
+        self._session = requests.Session()
+        self._streams: "OrderedDict[Tuple[Tuple[str, ...], str, str], _SeriesStream]" = OrderedDict()
+        self._streams_lock = threading.Lock()
+        # Shared across tool calls and sessions: overlapping windows only fetch what is missing
+        self._range_cache = RangeCache(cache_max_bytes, cache_ttl_seconds) if cache_max_bytes > 0 else None
+        self._stream_lookups = 0
+        self._stream_hits = 0
+        
+        # Alert storms: identical calls share one computation, different nodes share inference requests
+        self._single_flight = SingleFlight() if coalesce_requests else None
+        self._batcher = None
+        if batch_window_seconds > 0:
+            rows_per_request = max(max_payload_bytes // (8 * len(self.metric_spec.feature_columns)), 1)
+            self._batcher = MicroBatcher(self._ainfer_rows, batch_window_seconds, rows_per_request)
+        
+        self.telemetry = telemetry or Telemetry()
+        self.telemetry.track_cache("prometheus_range", lambda: self.cache_stats().get('hit_ratio', 0.0))
+        self.telemetry.track_cache("stream", lambda: self._stream_hits / self._stream_lookups if self._stream_lookups else 0.0)
+        self.telemetry.track_cache("prescored", lambda: self._prescore_hits / self._prescore_lookups if self._prescore_lookups else 0.0)
+        self.telemetry.observe_feature_source("client")
+        if self._single_flight is not None:
+            self.telemetry.track_cache("single_flight", lambda: self._single_flight.shared_ratio)
+        if self._batcher is not None:
+            self.telemetry.track_cache("inference_batch", lambda: self._batcher.merged_ratio)
+        
+        # Async I/O path: pooled keep-alive clients, created on first use inside the event loop
+        self._prometheus_client: Optional[httpx.AsyncClient] = None
+        self._inference_client: Optional[httpx.AsyncClient] = None
+        self._prometheus_slots = asyncio.Semaphore(max_concurrent_queries)
+        self._inference_slots = asyncio.Semaphore(max_concurrent_inferences)
+        
+        # Filled in by warm_up(); "ok", "pending" or the error per step
+        self.warm_state: Dict[str, str] = {}
+    
+    @property
+    def prom(self) -> "PrometheusConnect":
+        """Client of the sync query path, created on first use (the MCP tools use the async path)"""
+        if self._prom is None:
+            from prometheus_api_client import PrometheusConnect
+            self._prom = PrometheusConnect(url=self.prometheus_url, disable_ssl=True)
+        return self._prom
+    
+    def query_prometheus_range(
+        self,
+        query: str,
+        start: float,
+        end: float,
+        step: str = "10s"
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Query Prometheus for an explicit time range as raw arrays
         
+        Args:
+            query: PromQL query
+            start: Range start, epoch seconds
+            end: Range end, epoch seconds
+            step: Query resolution step
+            
+        Returns:
+            (timestamps, values) as float64 arrays; empty if the range has no samples
+        """
+        return self._first_series(self.query_prometheus_series(query, start, end, step))
+    
+    def query_prometheus_series(
+        self,
+        query: str,
+        start: float,
+        end: float,
+        step: str = "10s"
+    ) -> List[Tuple[Dict[str, str], np.ndarray, np.ndarray]]:
+        """
+        Run one range query and return every matching series, through the range cache
+        
+        Returns:
+            List of (labels, timestamps, values), one entry per series
+        """
+        def _fetch(fetch_start: float, fetch_end: float) -> List[Tuple[Dict[str, str], np.ndarray, np.ndarray]]:
+            return self._all_series_arrays(self.prom.custom_query_range(
+                query=query,
+                start_time=datetime.fromtimestamp(fetch_start),
+                end_time=datetime.fromtimestamp(fetch_end),
+                step=step
+            ))
+        
+        with self.telemetry.stage("prometheus_query", query=query):
+            if self._range_cache is None:
+                series = _fetch(start, end)
+            else:
+                series = self._range_cache.get(query, start, end, parse_duration(step), _fetch)
+        self.telemetry.observe_rows("prometheus_query", sum(len(timestamps) for _, timestamps, _ in series))
+        return series
+    
+    @staticmethod
+    def _first_series(series: List[Tuple[Dict[str, str], np.ndarray, np.ndarray]]) -> Tuple[np.ndarray, np.ndarray]:
+        """Arrays of the first series; empty if there is none"""
+        if not series:
+            return samples_to_arrays([])
+        
+        _, timestamps, values = series[0]
+        return timestamps, values
+    
+    @staticmethod
+    def _all_series_arrays(result: List[Dict[str, Any]]) -> List[Tuple[Dict[str, str], np.ndarray, np.ndarray]]:
+        """Every series of a range-query result as (labels, timestamps, values)"""
+        return [(series.get('metric', {}),) + samples_to_arrays(series['values']) for series in result]
+    
+    def _metric_queries(self, query: Optional[Union[str, Sequence[str]]]) -> Tuple[str, ...]:
+        """One PromQL expression per metric of the spec; None selects every node"""
+        if query is None:
+            return tuple(self.metric_spec.queries())
+        queries = (query,) if isinstance(query, str) else tuple(query)
+        if len(queries) != len(self.metric_spec.metrics):
+            raise ValueError(
+                f"Expected {len(self.metric_spec.metrics)} queries for metrics "
+                f"{self.metric_spec.metric_names}, got {len(queries)}"
+            )
+        return queries
+    
+    def _first_group(self, series_per_metric: List[List[Tuple[Dict[str, str], np.ndarray, np.ndarray]]]) -> Tuple[np.ndarray, np.ndarray]:
+        """Aligned arrays of the first group; empty if any metric returned nothing"""
+        aligned = align_series(series_per_metric)
+        if not aligned:
+            return np.empty(0, dtype=np.float64), np.empty((0, len(series_per_metric)))
+        
+        _, timestamps, values = aligned[0]
+        return timestamps, values
+    
+    def query_prometheus_aligned(
+        self,
+        queries: Sequence[str],
+        start: float,
+        end: float,
+        step: str = "10s"
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Run one range query per metric concurrently and align them onto one time index
+        
+        Args:
+            queries: PromQL expression per metric
+            start: Range start, epoch seconds
+            end: Range end, epoch seconds
+            step: Query resolution step
+            
+        Returns:
+            (timestamps, values) with values shaped (n, len(queries)); empty if any metric has no samples
+        """
+        return self._first_group(self._query_series_concurrently(queries, start, end, step))
+    
+    def _query_series_concurrently(
+        self,
+        queries: Sequence[str],
+        start: float,
+        end: float,
+        step: str
+    ) -> List[List[Tuple[Dict[str, str], np.ndarray, np.ndarray]]]:
+        """query_prometheus_series for each query, run in parallel threads"""
+        if len(queries) == 1:
+            return [self.query_prometheus_series(queries[0], start, end, step)]
+        
+        # One context copy per query keeps each worker's span under the caller's trace
+        contexts = [contextvars.copy_context() for _ in queries]
+        with ThreadPoolExecutor(max_workers=min(len(queries), self.max_concurrent_queries)) as pool:
+            return list(pool.map(
+                lambda context, query: context.run(self.query_prometheus_series, query, start, end, step),
+                contexts, queries
+            ))
+    
+    def query_prometheus_features(
+        self,
+        queries: Sequence[str],
+        start: float,
+        end: float,
+        step: str = "10s"
+    ) -> List[Tuple[Dict[str, str], np.ndarray, np.ndarray]]:
+        """
+        Fetch feature matrices with the rolling features computed by Prometheus
+        
+        One push-down query per metric (see anomaly_core.pushdown), evaluated on the
+        step grid. Until push-down has matched the client engine once, the raw series
+        are fetched too and compared, and the client engine's features are returned
+        until a comparison has passed. After a mismatch the tool warns, counts a
+        "pushdown_validation" error, and full fetches compute features client-side
+        for pushdown_retry_seconds before push-down is checked again.
+        
+        Args:
+            queries: PromQL expression per metric
+            start: Range start, epoch seconds
+            end: Range end, epoch seconds
+            step: Query resolution step
+            
+        Returns:
+            (labels, timestamps, features) per group, columns following metric_spec.feature_columns
+        """
+        step_seconds = parse_duration(step)
+        start, end = align_window(start, end, step_seconds)
+        results = self._query_series_concurrently(pushdown_queries(self.metric_spec, queries, step_seconds), start, end, step)
+        with self.telemetry.stage("feature_engineering", source="prometheus"):
+            groups = pushdown_features(self.metric_spec, results)
+        
+        if not self._pushdown_verified:
+            raw = align_series(self._query_series_concurrently(queries, start, end, step))
+            groups = self._verify_pushdown(raw, groups, step_seconds)
+        return groups
+    
+    def _verify_pushdown(
+        self,
+        raw: List[Tuple[Dict[str, str], np.ndarray, np.ndarray]],
+        groups: List[Tuple[Dict[str, str], np.ndarray, np.ndarray]],
+        step_seconds: float
+    ) -> List[Tuple[Dict[str, str], np.ndarray, np.ndarray]]:
+        """Push-down groups once they have matched the client engine on raw, else client-side groups"""
+        report = validate_pushdown(self.metric_spec, raw, groups, step_seconds)
+        if report['ok'] and report['rows_compared'] > 0:
+            self._pushdown_verified = True
+            self.telemetry.observe_feature_source("prometheus")
+            return groups
+        
+        # A window too short to compare anything is checked again on the next fetch
+        if not report['ok']:
+            message = (
+                f"Prometheus-computed features differ from the client engine "
+                f"(max abs error {report['max_abs_error']})"
+            )
+            print(f"Warning: {message}, computing features client-side for {self.pushdown_retry_seconds:.0f}s")
+            self.telemetry.count_error("pushdown_validation", ValueError(message))
+            self._pushdown_retry_at = time.monotonic() + self.pushdown_retry_seconds
+        self.telemetry.observe_feature_source("client")
+        return [(labels,) + self.metric_spec.compute_features(timestamps, values) for labels, timestamps, values in raw]
+    
+    @property
+    def pushdown_active(self) -> bool:
+        """Whether full fetches currently ask Prometheus for the features"""
+        return self.feature_source == "prometheus" and time.monotonic() >= self._pushdown_retry_at
+    
+    def _fetch_features(
+        self,
+        queries: Sequence[str],
+        start: float,
+        end: float,
+        step: str
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """(timestamps, features) of the first group from feature_source; ValueError if there is no data"""
+        if self.pushdown_active:
+            groups = self.query_prometheus_features(queries, start, end, step)
+            if not groups or len(groups[0][1]) == 0:
+                raise ValueError("No data returned from Prometheus")
+            _, timestamps, features = groups[0]
+            return timestamps, features
+        
+        timestamps, values = self.query_prometheus_aligned(queries, start, end, step)
+        if len(timestamps) == 0:
+            raise ValueError("No data returned from Prometheus")
+        with self.telemetry.stage("feature_engineering", rows=len(timestamps)):
+            return self.metric_spec.compute_features(timestamps, values)
+    
+    def query_prometheus_arrays(
+        self,
+        query: str,
+        hours: int = 1,
+        step: str = "10s"
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Query Prometheus for metrics as raw arrays
+        
+        Args:
+            query: PromQL query
+            hours: Number of hours of data to fetch
+            step: Query resolution step
+            
+        Returns:
+            (timestamps, values) as float64 arrays, timestamps in epoch seconds
+        """
+        end = time.time()
+        timestamps, values = self.query_prometheus_range(query, end - hours * 3600, end, step)
+        
+        if len(timestamps) == 0:
+            raise ValueError("No data returned from Prometheus")
+        
+        return timestamps, values
+    
     def query_prometheus(
         self,
         query: str,
         hours: int = 1,
         step: str = "10s"
-    ) -> pd.DataFrame:
+    ) -> "pd.DataFrame":
         """
         Query Prometheus for metrics
         
@@ -56,48 +526,37 @@ class AnomalyDetectionTool:
         Returns:
             DataFrame with timestamp and value columns
         """
-        end_time = datetime.now()
-        start_time = end_time - timedelta(hours=hours)
+        import pandas as pd
         
-        result = self.prom.custom_query_range(
-            query=query,
-            start_time=start_time,
-            end_time=end_time,
-            step=step
-        )
-        
-        if not result:
-            raise ValueError("No data returned from Prometheus")
-        
-        timestamps = []
-        values = []
-        for sample in result[0]['values']:
-            timestamps.append(datetime.fromtimestamp(sample[0]).isoformat())
-            values.append(float(sample[1]))
+        timestamps, values = self.query_prometheus_arrays(query, hours=hours, step=step)
         
         df = pd.DataFrame({
-            'timestamp': timestamps,
+            'timestamp': pd.to_datetime(timestamps, unit='s'),
             'cpu_usage': values
         })
         
         return df
     
-    def engineer_features(self, df: pd.DataFrame) -> pd.DataFrame:
+    def engineer_features(self, df: "pd.DataFrame") -> "pd.DataFrame":
         """
         Engineer features matching the training pipeline
         
+        Thin DataFrame wrapper around anomaly_core.compute_features; the
+        prediction path calls the array engine directly.
+        
         Args:
             df: DataFrame with timestamp and cpu_usage columns
             
         Returns:
             DataFrame with engineered features
         """
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        df['rolling_mean'] = df['cpu_usage'].rolling(window=5, min_periods=1).mean()
-        df['rolling_std'] = df['cpu_usage'].rolling(window=5, min_periods=1).std().fillna(0)
-        df['rate_of_change'] = df['cpu_usage'].diff().fillna(0)
-        df['hour'] = df['timestamp'].dt.hour
-        df = df.dropna()
+        import pandas as pd
+        
+        timestamps = pd.to_datetime(df['timestamp']).to_numpy(dtype='datetime64[ns]').astype(np.int64) / 1e9
+        timestamps, features = compute_features(timestamps, df['cpu_usage'].to_numpy(dtype=np.float64))
+        
+        df = pd.DataFrame(features, columns=FEATURE_COLUMNS)
+        df.insert(0, 'timestamp', pd.to_datetime(timestamps, unit='s'))
         
         return df
     
@@ -109,140 +568,1154 @@ class AnomalyDetectionTool:
         Call KServe InferenceService for predictions
         
         Args:
-            features: List of feature vectors [cpu_usage, rolling_mean, rolling_std, rate_of_change, hour]
+            features: List of feature vectors, columns as in metric_spec.feature_columns
             
         Returns:
             Prediction results
         """
+        headers = {
+            "Content-Type": "application/json"
+        }
+        
+        response = self._session.post(
+            self._inference_endpoint(),
+            json=self._inference_payload(features),
+            headers=headers,
+            timeout=self.inference_timeout
+        )
+        response.raise_for_status()
+        
+        return response.json()
+    
+    def _inference_endpoint(self, model_name: Optional[str] = None) -> str:
+        # Internal: http://sklearn-iris.default.svc.cluster.local/v2/models/sklearn-iris/infer
+        # External: Use the ALB URL if exposed
+        return f"{self.inference_service_url}/v2/models/{model_name or self.model_name}/infer"
+    
+    def model_for_instance(self, instance: str) -> str:
+        """Model that scores instance: its own when routing is enabled and one is served, else model_name"""
+        if self._router is None:
+            return self.model_name
+        return self._router.route(instance)
+    
+    def _served_models(self) -> List[str]:
+        """Model names available for routing, from the local package or the predictor's model list"""
+        if self.scoring_backend == "local" and self.model_store is not None:
+            return list(self.model_store.models)
+        
+        response = self._session.get(f"{self.inference_service_url}/v1/models", timeout=self.inference_timeout)
+        response.raise_for_status()
+        return response.json().get("models", [])
+    
+    @staticmethod
+    def _inference_payload(features: List[List[float]]) -> Dict[str, Any]:
         # KServe v2 protocol format
-        payload = {
+        return {
             "inputs": [
                 {
                     "name": "input-0",
-                    "shape": [len(features), 5],
+                    "shape": [len(features), len(features[0]) if len(features) else 0],
                     "datatype": "FP64",
                     "data": features
                 }
             ]
         }
+    
+    def predict_values(self, features: np.ndarray, model_name: Optional[str] = None) -> np.ndarray:
+        """
+        Score a feature matrix and return the raw prediction array
         
-        # Construct endpoint URL
-        # Internal: http://sklearn-iris.default.svc.cluster.local/v2/models/sklearn-iris/infer
-        # External: Use the ALB URL if exposed
-        endpoint = f"{self.inference_service_url}/v2/models/{self.model_name}/infer"
+        Args:
+            features: (n, len(metric_spec.feature_columns)) feature matrix
+            model_name: Served model to use (see model_for_instance); default model_name
+            
+        Returns:
+            float64 array of predictions (-1 anomaly, 1 normal)
+        """
+        return np.where(self.score_values(features, model_name) < 0, -1.0, 1.0)
+    
+    def score_values(self, features: np.ndarray, model_name: Optional[str] = None) -> np.ndarray:
+        """
+        Score a feature matrix and return the anomaly score per row
         
-        headers = {
-            "Content-Type": "application/json"
-        }
+        Scores are the model's decision_function: negative for anomalies, lower
+        for more anomalous rows. A server that only returns labels (the sklearn
+        runtime) yields the -1/1 labels, which keep the sign convention but do
+        not rank rows within a class.
+        
+        Args:
+            features: (n, len(metric_spec.feature_columns)) feature matrix
+            model_name: Served model to use (see model_for_instance); default model_name
+            
+        Returns:
+            float64 array of anomaly scores
+        """
+        if len(features) == 0:
+            return np.empty(0, dtype=np.float64)
+        
+        local = self._score_local(features, model_name)
+        if local is not None:
+            return local
+        
+        chunks = self._inference_chunks(features)
+        if len(chunks) == 1:
+            return self._infer_chunk(chunks[0], model_name)
         
-        response = requests.post(endpoint, json=payload, headers=headers, timeout=30)
+        contexts = [contextvars.copy_context() for _ in chunks]
+        with ThreadPoolExecutor(max_workers=min(len(chunks), self.max_concurrent_inferences)) as pool:
+            return np.concatenate(list(pool.map(
+                lambda context, chunk: context.run(self._infer_chunk, chunk, model_name),
+                contexts, chunks
+            )))
+    
+    def _score_local(self, features: np.ndarray, model_name: Optional[str] = None) -> Optional[np.ndarray]:
+        """Score in-process with the cached model; None means use the KServe path"""
+        if self.scoring_backend != "local" or self.model_store is None:
+            return None
+        
+        model = self.model_store.models.get(model_name) if model_name else None
+        model = model or self.model_store.model
+        if model is None:
+            return None
+        
+        try:
+            with self.telemetry.stage("local_inference", rows=len(features)):
+                if hasattr(model, "decision_function"):
+                    scores = np.asarray(model.decision_function(features), dtype=np.float64)
+                else:
+                    scores = np.asarray(model.predict(features), dtype=np.float64)
+        except Exception as e:
+            print(f"Warning: local scoring failed, falling back to KServe: {e}")
+            return None
+        self.telemetry.observe_rows("local_inference", len(features))
+        return scores
+    
+    def _use_binary(self) -> bool:
+        return self.binary_payloads and self._binary_supported is not False
+    
+    def _inference_chunks(self, features: np.ndarray) -> List[np.ndarray]:
+        """Split a feature matrix into row chunks that fit max_payload_bytes"""
+        # Raw FP64 is 8 bytes per value; JSON-encoded floats average roughly 20
+        bytes_per_row = features.shape[1] * (8 if self._use_binary() else 20)
+        rows_per_chunk = max(self.max_payload_bytes // bytes_per_row, 1)
+        return [features[i:i + rows_per_chunk] for i in range(0, len(features), rows_per_chunk)]
+    
+    def _binary_rejected(self, status_code: int) -> bool:
+        """Record whether the server handled a binary request; True means retry as JSON"""
+        # Only a server that cannot parse the body or content type rejects the encoding itself;
+        # other 4xx (unknown model, invalid input) are real errors and are raised as they are.
+        # Concurrent first requests may all be rejected, so anything not yet confirmed can fall back
+        if self._binary_supported is not True and status_code in (400, 415):
+            self._binary_supported = False
+            return True
+        if status_code < 400:
+            self._binary_supported = True
+        return False
+    
+    def _infer_chunk(self, features: np.ndarray, model_name: Optional[str] = None) -> np.ndarray:
+        """Score one chunk over the sync session, binary first when enabled"""
+        with self.telemetry.stage("inference", rows=len(features), model=model_name or self.model_name):
+            if self._use_binary():
+                body, headers = self._encode_chunk(features, binary=True)
+                response = self._session.post(
+                    self._inference_endpoint(model_name), data=body, headers=headers, timeout=self.inference_timeout
+                )
+                if not self._binary_rejected(response.status_code):
+                    return self._decode_chunk(response)
+            
+            body, headers = self._encode_chunk(features, binary=False)
+            response = self._session.post(
+                self._inference_endpoint(model_name), data=body, headers=headers, timeout=self.inference_timeout
+            )
+            return self._decode_chunk(response)
+    
+    def _encode_chunk(self, features: np.ndarray, binary: bool) -> Tuple[bytes, Dict[str, str]]:
+        """v2 request body and headers, carrying the current trace context to the predictor"""
+        body, headers = encode_infer_request(features, binary=binary)
+        self.telemetry.observe_payload("inference_request", len(body))
+        self.telemetry.observe_rows("inference", len(features))
+        return body, self.telemetry.trace_headers(headers)
+    
+    def _decode_chunk(self, response: Union[requests.Response, httpx.Response]) -> np.ndarray:
+        """Anomaly scores of a v2 response (the labels when the server sends no score output)"""
+        response.raise_for_status()
+        self.telemetry.observe_payload("inference_response", len(response.content))
+        return anomaly_scores(decode_infer_outputs(response.content, response.headers))
+    
+    def _async_clients(self) -> Tuple[httpx.AsyncClient, httpx.AsyncClient]:
+        """Pooled keep-alive clients for Prometheus and KServe, created lazily"""
+        if self._prometheus_client is None:
+            self._prometheus_client = httpx.AsyncClient(
+                base_url=self.prometheus_url,
+                # Matches PrometheusConnect(disable_ssl=True) on the sync path
+                verify=False,
+                timeout=self.prometheus_timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrent_queries,
+                    max_keepalive_connections=self.max_concurrent_queries
+                )
+            )
+        if self._inference_client is None:
+            self._inference_client = httpx.AsyncClient(
+                timeout=self.inference_timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrent_inferences,
+                    max_keepalive_connections=self.max_concurrent_inferences
+                )
+            )
+        return self._prometheus_client, self._inference_client
+    
+    async def aquery_prometheus_range(
+        self,
+        query: str,
+        start: float,
+        end: float,
+        step: str = "10s"
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Async version of query_prometheus_range using the Prometheus HTTP API directly
+        
+        Args:
+            query: PromQL query
+            start: Range start, epoch seconds
+            end: Range end, epoch seconds
+            step: Query resolution step
+            
+        Returns:
+            (timestamps, values) as float64 arrays; empty if the range has no samples
+        """
+        return self._first_series(await self.aquery_prometheus_series(query, start, end, step))
+    
+    async def aquery_prometheus_series(
+        self,
+        query: str,
+        start: float,
+        end: float,
+        step: str = "10s"
+    ) -> List[Tuple[Dict[str, str], np.ndarray, np.ndarray]]:
+        """Async version of query_prometheus_series"""
+        async def _fetch(fetch_start: float, fetch_end: float) -> List[Tuple[Dict[str, str], np.ndarray, np.ndarray]]:
+            return self._all_series_arrays(await self._aquery_range_result(query, fetch_start, fetch_end, step))
+        
+        with self.telemetry.stage("prometheus_query", query=query):
+            if self._range_cache is None:
+                series = await _fetch(start, end)
+            else:
+                series = await self._range_cache.aget(query, start, end, parse_duration(step), _fetch)
+        self.telemetry.observe_rows("prometheus_query", sum(len(timestamps) for _, timestamps, _ in series))
+        return series
+    
+    async def aquery_prometheus_aligned(
+        self,
+        queries: Sequence[str],
+        start: float,
+        end: float,
+        step: str = "10s"
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Async version of query_prometheus_aligned"""
+        results = await asyncio.gather(*(self.aquery_prometheus_series(query, start, end, step) for query in queries))
+        return self._first_group(list(results))
+    
+    async def aquery_prometheus_features(
+        self,
+        queries: Sequence[str],
+        start: float,
+        end: float,
+        step: str = "10s"
+    ) -> List[Tuple[Dict[str, str], np.ndarray, np.ndarray]]:
+        """Async version of query_prometheus_features"""
+        step_seconds = parse_duration(step)
+        start, end = align_window(start, end, step_seconds)
+        pushed_queries = pushdown_queries(self.metric_spec, queries, step_seconds)
+        if self._pushdown_verified:
+            results = await asyncio.gather(*(self.aquery_prometheus_series(q, start, end, step) for q in pushed_queries))
+        else:
+            # Raw series for the one-time comparison, fetched alongside
+            results = await asyncio.gather(*(
+                self.aquery_prometheus_series(q, start, end, step) for q in list(pushed_queries) + list(queries)
+            ))
+        with self.telemetry.stage("feature_engineering", source="prometheus"):
+            groups = pushdown_features(self.metric_spec, results[:len(pushed_queries)])
+        
+        if not self._pushdown_verified:
+            groups = self._verify_pushdown(align_series(list(results[len(pushed_queries):])), groups, step_seconds)
+        return groups
+    
+    async def _afetch_features(
+        self,
+        queries: Sequence[str],
+        start: float,
+        end: float,
+        step: str
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Async version of _fetch_features"""
+        if self.pushdown_active:
+            groups = await self.aquery_prometheus_features(queries, start, end, step)
+            if not groups or len(groups[0][1]) == 0:
+                raise ValueError("No data returned from Prometheus")
+            _, timestamps, features = groups[0]
+            return timestamps, features
+        
+        timestamps, values = await self.aquery_prometheus_aligned(queries, start, end, step)
+        if len(timestamps) == 0:
+            raise ValueError("No data returned from Prometheus")
+        with self.telemetry.stage("feature_engineering", rows=len(timestamps)):
+            return self.metric_spec.compute_features(timestamps, values)
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and size of the Prometheus range-query cache"""
+        return self._range_cache.stats() if self._range_cache is not None else {}
+    
+    async def _aquery_range_result(
+        self,
+        query: str,
+        start: float,
+        end: float,
+        step: str
+    ) -> List[Dict[str, Any]]:
+        """Raw ``data.result`` of a /api/v1/query_range call"""
+        client, _ = self._async_clients()
+        params = {"query": query, "start": start, "end": end, "step": step}
+        
+        async with self._prometheus_slots:
+            response = await client.get("/api/v1/query_range", params=params)
+        response.raise_for_status()
+        self.telemetry.observe_payload("prometheus_response", len(response.content))
+        
+        body = response.json()
+        if body.get("status") != "success":
+            raise ValueError(f"Prometheus query failed: {body.get('error', body)}")
+        
+        return body["data"]["result"]
+    
+    async def aquery_prometheus_arrays(
+        self,
+        query: str,
+        hours: int = 1,
+        step: str = "10s"
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Async version of query_prometheus_arrays"""
+        end = time.time()
+        timestamps, values = await self.aquery_prometheus_range(query, end - hours * 3600, end, step)
+        
+        if len(timestamps) == 0:
+            raise ValueError("No data returned from Prometheus")
+        
+        return timestamps, values
+    
+    async def apredict(
+        self,
+        features: List[List[float]]
+    ) -> Dict[str, Any]:
+        """Async version of predict over the pooled KServe client"""
+        _, client = self._async_clients()
+        
+        async with self._inference_slots:
+            response = await client.post(self._inference_endpoint(), json=self._inference_payload(features))
         response.raise_for_status()
         
         return response.json()
     
+    async def apredict_values(self, features: np.ndarray, model_name: Optional[str] = None) -> np.ndarray:
+        """Async version of predict_values"""
+        return np.where(await self.ascore_values(features, model_name) < 0, -1.0, 1.0)
+    
+    async def ascore_values(self, features: np.ndarray, model_name: Optional[str] = None) -> np.ndarray:
+        """Async version of score_values"""
+        if len(features) == 0:
+            return np.empty(0, dtype=np.float64)
+        
+        if self.scoring_backend == "local":
+            # CPU-bound; keep it off the event loop
+            local = await asyncio.to_thread(self._score_local, features, model_name)
+            if local is not None:
+                return local
+        
+        if self._batcher is not None:
+            # Concurrent calls for other nodes on the same model join this request
+            return await self._batcher.submit(model_name or self.model_name, features)
+        return await self._ainfer_rows(model_name, features)
+    
+    async def _ainfer_rows(self, model_name: Optional[str], features: np.ndarray) -> np.ndarray:
+        """Score a feature matrix over KServe, one concurrent request per payload-sized chunk"""
+        chunks = self._inference_chunks(features)
+        results = await asyncio.gather(*(self._ainfer_chunk(chunk, model_name) for chunk in chunks))
+        return np.concatenate(results)
+    
+    async def _ainfer_chunk(self, features: np.ndarray, model_name: Optional[str] = None) -> np.ndarray:
+        """Async version of _infer_chunk; concurrency is bounded by the inference semaphore"""
+        _, client = self._async_clients()
+        
+        async with self._inference_slots:
+            with self.telemetry.stage("inference", rows=len(features), model=model_name or self.model_name):
+                if self._use_binary():
+                    body, headers = self._encode_chunk(features, binary=True)
+                    response = await client.post(self._inference_endpoint(model_name), content=body, headers=headers)
+                    if not self._binary_rejected(response.status_code):
+                        return self._decode_chunk(response)
+                
+                body, headers = self._encode_chunk(features, binary=False)
+                response = await client.post(self._inference_endpoint(model_name), content=body, headers=headers)
+                return self._decode_chunk(response)
+    
+    async def aclose(self) -> None:
+        """Close the pooled async clients"""
+        for client in (self._prometheus_client, self._inference_client):
+            if client is not None:
+                await client.aclose()
+        self._prometheus_client = None
+        self._inference_client = None
+    
+    @property
+    def ready(self) -> bool:
+        """True once warm_up() has finished the in-process steps a tool call depends on"""
+        required = ("clients", "features") + (("model",) if "model" in self.warm_state else ())
+        return bool(self.warm_state) and all(self.warm_state.get(step) == "ok" for step in required)
+    
+    async def warm_up(self, model_poll_seconds: float = 1.0) -> Dict[str, str]:
+        """
+        Do the one-time work of a first tool call before any call arrives
+        
+        Opens the pooled clients and their connections to Prometheus and KServe,
+        waits for the local model on the "local" backend, and runs feature
+        engineering and scoring once on synthetic rows. Prometheus and KServe
+        being unreachable is recorded but does not keep the tool from becoming
+        ready: calls would report the error either way.
+        
+        Args:
+            model_poll_seconds: How often to check whether the model store has loaded a model
+            
+        Returns:
+            warm_state: "ok" or the error per step
+        """
+        started = time.perf_counter()
+        self.warm_state = {"clients": "pending", "prometheus": "pending", "features": "pending", "scoring": "pending"}
+        if self.scoring_backend == "local" and self.model_store is not None:
+            self.warm_state["model"] = "pending"
+        
+        async def _step(name: str, work: Callable[[], Awaitable[Any]]) -> None:
+            try:
+                await work()
+            except Exception as e:
+                self.warm_state[name] = f"{type(e).__name__}: {e}"
+                print(f"Warning: warm-up step {name} failed: {e}")
+            else:
+                self.warm_state[name] = "ok"
+        
+        async def _clients() -> None:
+            self._async_clients()
+        
+        async def _prometheus() -> None:
+            prometheus_client, _ = self._async_clients()
+            async with self._prometheus_slots:
+                response = await prometheus_client.get("/api/v1/query", params={"query": "vector(1)"})
+            response.raise_for_status()
+        
+        async def _model() -> None:
+            while self.model_store.model is None and not self.model_store.models:
+                await asyncio.sleep(model_poll_seconds)
+        
+        # One full rolling window of flat synthetic samples per metric
+        timestamps = time.time() - self.metric_spec.window * 10.0 + np.arange(self.metric_spec.window) * 10.0
+        values = np.zeros((len(timestamps), len(self.metric_spec.metric_names)))
+        features = None
+        
+        async def _features() -> None:
+            nonlocal features
+            with self.telemetry.stage("feature_engineering", rows=len(timestamps)):
+                _, features = self.metric_spec.compute_features(timestamps, values)
+        
+        async def _scoring() -> None:
+            await self.ascore_values(features)
+        
+        await _step("clients", _clients)
+        await _step("prometheus", _prometheus)
+        if "model" in self.warm_state:
+            await _step("model", _model)
+        await _step("features", _features)
+        if features is not None:
+            await _step("scoring", _scoring)
+        else:
+            self.warm_state["scoring"] = "skipped"
+        
+        self.telemetry.observe_startup("warm_up", time.perf_counter() - started)
+        return dict(self.warm_state)
+    
+    def _score_incremental(
+        self,
+        queries: Tuple[str, ...],
+        start: float,
+        end: float,
+        step: str,
+        model_name: Optional[str] = None,
+        max_age: float = 0.0
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Score [start, end] reusing the stream of these queries and model from earlier calls
+        
+        Only samples newer than the stream's last sample are fetched, featurized
+        and sent to the model; older rows come from the ring buffer. With max_age,
+        a stream fetched up to less than max_age seconds before end is served
+        without fetching at all (pre-scored streams).
+        
+        Returns:
+            (timestamps, features, scores) for the requested window
+        """
+        stream = self._get_stream(queries, start, step, model_name)
+        step_seconds = parse_duration(step)
+        
+        with stream.lock:
+            fetch_start = max(start, stream.features.last_timestamp + step_seconds)
+            fresh = self._fresh(stream, end, max_age)
+            if fetch_start <= end and not fresh:
+                try:
+                    timestamps, values = self.query_prometheus_aligned(queries, fetch_start, end, step)
+                    with self.telemetry.stage("feature_engineering", rows=len(timestamps)):
+                        timestamps, features = stream.features.update(timestamps, values)
+                    scores = self.score_values(features, model_name)
+                except Exception:
+                    self._drop_stream((queries, step, model_name or ""), stream)
+                    raise
+                stream.append(timestamps, features, scores)
+                stream.scored_until = end
+            
+            timestamps, rows = stream.rows.since(start)
+        
+        return timestamps, rows[:, :-1], rows[:, -1]
+    
+    async def _ascore_incremental(
+        self,
+        queries: Tuple[str, ...],
+        start: float,
+        end: float,
+        step: str,
+        model_name: Optional[str] = None,
+        max_age: float = 0.0
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Async version of _score_incremental; callers on one stream are serialized"""
+        stream = self._get_stream(queries, start, step, model_name)
+        step_seconds = parse_duration(step)
+        
+        async with stream.alock:
+            fetch_start = max(start, stream.features.last_timestamp + step_seconds)
+            fresh = self._fresh(stream, end, max_age)
+            if fetch_start <= end and not fresh:
+                try:
+                    timestamps, values = await self.aquery_prometheus_aligned(queries, fetch_start, end, step)
+                    with self.telemetry.stage("feature_engineering", rows=len(timestamps)):
+                        timestamps, features = stream.features.update(timestamps, values)
+                    scores = await self.ascore_values(features, model_name)
+                except Exception:
+                    self._drop_stream((queries, step, model_name or ""), stream)
+                    raise
+                stream.append(timestamps, features, scores)
+                stream.scored_until = end
+            
+            timestamps, rows = stream.rows.since(start)
+        
+        return timestamps, rows[:, :-1], rows[:, -1]
+    
+    def _fresh(self, stream: _SeriesStream, end: float, max_age: float) -> bool:
+        """Whether a pre-scored stream is recent enough to answer without fetching"""
+        if max_age <= 0:
+            return False
+        self._prescore_lookups += 1
+        if end - stream.scored_until > max_age:
+            return False
+        self._prescore_hits += 1
+        return True
+    
+    def _prescore_max_age(self, queries: Tuple[str, ...], step: str, model_name: Optional[str]) -> float:
+        """Staleness a call may be served with: two pre-scoring intervals for watched streams, else 0"""
+        if (queries, step, model_name or "") in self._prescored_keys:
+            return 2 * self.prescore_interval_seconds
+        return 0.0
+    
+    async def prescore_once(self, hours: Optional[int] = None, step: str = "10s") -> int:
+        """
+        Refresh the stream of every watched instance, as the MCP tools would query it
+        
+        The first pass fetches the whole window; later passes only fetch the new tail,
+        and concurrent instances share inference requests through the micro-batcher.
+        
+        Args:
+            hours: Window kept scored (default: stream_buffer_hours)
+            step: Query resolution step (the tools use the default "10s")
+            
+        Returns:
+            Number of instances scored successfully
+        """
+        hours = min(hours or self.stream_buffer_hours, self.stream_buffer_hours)
+        
+        async def _score(instance: str) -> Optional[Tuple[Tuple[str, ...], str, str]]:
+            queries = tuple(self.metric_spec.queries(instance_matchers(instance=instance)))
+            try:
+                model_name = await asyncio.to_thread(self.model_for_instance, instance)
+                end = time.time()
+                await self._ascore_incremental(queries, end - hours * 3600, end, step, model_name)
+            except Exception as e:
+                self.telemetry.count_error("prescore", e)
+                print(f"Warning: pre-scoring {instance} failed: {e}")
+                return None
+            return (queries, step, model_name or "")
+        
+        with self.telemetry.stage("prescore", instances=len(self.watched_instances)):
+            keys = await asyncio.gather(*(_score(instance) for instance in self.watched_instances))
+        self._prescored_keys = {key for key in keys if key is not None}
+        self.telemetry.observe_rows("prescore", len(self._prescored_keys))
+        return len(self._prescored_keys)
+    
+    async def run_prescoring(self) -> None:
+        """Score the watched instances every prescore_interval_seconds until cancelled"""
+        while True:
+            started = time.monotonic()
+            await self.prescore_once()
+            await asyncio.sleep(max(self.prescore_interval_seconds - (time.monotonic() - started), 0.0))
+    
+    def _get_stream(self, queries: Tuple[str, ...], start: float, step: str, model_name: Optional[str] = None) -> _SeriesStream:
+        """Stream for (queries, step, model) that can serve a window starting at start, creating it if needed"""
+        # Keyed by model too, so a newly routed per-instance model does not reuse rows scored by another
+        key = (queries, step, model_name or "")
+        
+        with self._streams_lock:
+            stream = self._streams.get(key)
+            self._stream_lookups += 1
+            # Reuse only if the stream covers the window start and has no gap before it
+            if stream is None or stream.covered_since > start or stream.features.last_timestamp < start:
+                capacity = int(self.stream_buffer_hours * 3600 // parse_duration(step)) + 1
+                stream = _SeriesStream(capacity, covered_since=start, metric_spec=self.metric_spec)
+                self._streams[key] = stream
+            else:
+                self._stream_hits += 1
+            self._streams.move_to_end(key)
+            while len(self._streams) > self.max_streams:
+                self._streams.popitem(last=False)
+        
+        return stream
+    
+    def _drop_stream(self, key: Tuple[Tuple[str, ...], str, str], stream: _SeriesStream) -> None:
+        # Feature state may have advanced past rows that were never scored
+        with self._streams_lock:
+            if self._streams.get(key) is stream:
+                del self._streams[key]
+    
+    def reset_streams(self) -> None:
+        """Drop all incremental state, e.g. after a new model is deployed"""
+        with self._streams_lock:
+            self._streams.clear()
+    
+    def on_model_change(self, uri: str = "") -> None:
+        """
+        Forget everything derived from the previous model; a ModelStore on_change callback
+        
+        Cached stream scores came from the previous model, and a new package may add
+        or remove per-instance models, so the route table is refetched too.
+        
+        Args:
+            uri: Storage URI of the new model (unused)
+        """
+        self.reset_streams()
+        if self._router is not None:
+            self._router.invalidate()
+    
     def predict_from_prometheus(
         self,
-        query: str = '100 - (avg(rate(node_cpu_seconds_total{mode="idle"}[5m])) * 100)',
-        hours: int = 1
+        query: Optional[Union[str, Sequence[str]]] = None,
+        hours: int = 1,
+        step: str = "10s",
+        incremental: bool = True,
+        instance: str = "",
+        threshold: Optional[float] = None
     ) -> Dict[str, Any]:
         """
         Complete workflow: Query Prometheus -> Engineer features -> Predict
         
         Args:
-            query: PromQL query
+            query: PromQL query, or one per metric of the metric spec; None uses the
+                spec's queries over every node
             hours: Hours of data to analyze
+            step: Query resolution step
+            incremental: Reuse streaming state from earlier calls for the same query,
+                fetching and scoring only samples newer than the last call
+            instance: Instance the query selects; routes scoring to its own model when
+                route_by_instance is enabled
+            threshold: Anomaly score cut-off for this call (default anomaly_threshold)
             
         Returns:
             Dictionary with predictions, metadata, and anomaly timing information
+            (shared with concurrent identical calls; treat it as read-only)
         """
-        # Step 1: Query Prometheus
-        df = self.query_prometheus(query, hours=hours)
-        
-        # Step 2: Engineer features
-        df_features = self.engineer_features(df)
-        
-        # Step 3: Prepare features for model
-        feature_columns = ['cpu_usage', 'rolling_mean', 'rolling_std', 'rate_of_change', 'hour']
-        features = df_features[feature_columns].values.tolist()
-        
-        # Step 4: Get predictions
-        predictions = self.predict(features)
-        
-        # Step 5: Format results
-        # KServe returns predictions in format: {"outputs": [{"name": "output-0", "data": [...]}]}
-        prediction_values = predictions.get("outputs", [{}])[0].get("data", [])
-        
-        # IsolationForest returns -1 for anomalies, 1 for normal
-        anomalies = sum(1 for p in prediction_values if p == -1)
-        normal = sum(1 for p in prediction_values if p == 1)
-        
-        # Step 6: Extract anomaly timing information
-        # Find all anomalies with their timestamps and CPU usage
-        anomaly_details = []
-        for i, pred in enumerate(prediction_values):
-            if pred == -1:  # Anomaly detected
-                timestamp = df_features['timestamp'].iloc[i]
-                anomaly_details.append({
-                    'timestamp': timestamp.isoformat() if hasattr(timestamp, 'isoformat') else str(timestamp),
-                    'cpu_usage': float(df_features['cpu_usage'].iloc[i]),
-                    'index': i
-                })
-        
-        # Find first anomaly time
-        first_anomaly_time = anomaly_details[0]['timestamp'] if anomaly_details else None
-        
-        # Find anomaly periods (consecutive anomalies)
-        # Step interval is 10s based on query_prometheus default
-        step_seconds = 10
-        anomaly_periods = []
-        period_start_idx = None
-        
-        for i, pred in enumerate(prediction_values):
-            if pred == -1:  # Anomaly
-                if period_start_idx is None:
-                    period_start_idx = i
-            else:  # Normal
-                if period_start_idx is not None:
-                    # Period ended, record it
-                    start_timestamp = df_features['timestamp'].iloc[period_start_idx]
-                    end_timestamp = df_features['timestamp'].iloc[i - 1]
-                    duration_seconds = (i - period_start_idx) * step_seconds
-                    
-                    anomaly_periods.append({
-                        'start': start_timestamp.isoformat() if hasattr(start_timestamp, 'isoformat') else str(start_timestamp),
-                        'end': end_timestamp.isoformat() if hasattr(end_timestamp, 'isoformat') else str(end_timestamp),
-                        'duration_seconds': duration_seconds,
-                        'duration_formatted': f"{duration_seconds // 60}m {duration_seconds % 60}s"
-                    })
-                    period_start_idx = None
-        
-        # Handle case where anomaly continues to the end of the data
-        if period_start_idx is not None:
-            start_timestamp = df_features['timestamp'].iloc[period_start_idx]
-            end_timestamp = df_features['timestamp'].iloc[-1]
-            duration_seconds = (len(prediction_values) - period_start_idx) * step_seconds
+        queries = self._metric_queries(query)
+        return self._coalesce(
+            ("predict", queries, hours, step, incremental, instance, threshold),
+            lambda: self._predict_from_prometheus(queries, hours, step, incremental, instance, threshold)
+        )
+    
+    def _coalesce(self, key: Tuple[Any, ...], compute: Callable[[], Any]) -> Any:
+        """compute(), shared with identical calls in flight when coalescing is enabled"""
+        if self._single_flight is None:
+            return compute()
+        return self._single_flight.run(key, compute)
+    
+    async def _acoalesce(self, key: Tuple[Any, ...], compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Async version of _coalesce; compute returns an awaitable"""
+        if self._single_flight is None:
+            return await compute()
+        return await self._single_flight.arun(key, compute)
+    
+    def _predict_from_prometheus(
+        self,
+        queries: Tuple[str, ...],
+        hours: int,
+        step: str,
+        incremental: bool,
+        instance: str,
+        threshold: Optional[float]
+    ) -> Dict[str, Any]:
+        model_name = self.model_for_instance(instance)
+        end = time.time()
+        start = end - hours * 3600
+        
+        if incremental and hours <= self.stream_buffer_hours:
+            # Steps 1-4 on the new tail only; earlier rows come from the stream buffer
+            timestamps, feature_matrix, scores = self._score_incremental(
+                queries, start, end, step, model_name, self._prescore_max_age(queries, step, model_name)
+            )
+            if len(timestamps) == 0:
+                raise ValueError("No data returned from Prometheus")
+        else:
+            # Steps 1-2: Query Prometheus (one concurrent query per metric) and engineer
+            # features, client-side with the training engine or pushed down to Prometheus
+            timestamps, feature_matrix = self._fetch_features(queries, start, end, step)
             
-            anomaly_periods.append({
-                'start': start_timestamp.isoformat() if hasattr(start_timestamp, 'isoformat') else str(start_timestamp),
-                'end': end_timestamp.isoformat() if hasattr(end_timestamp, 'isoformat') else str(end_timestamp),
-                'duration_seconds': duration_seconds,
-                'duration_formatted': f"{duration_seconds // 60}m {duration_seconds % 60}s"
+            # Step 3-4: Get anomaly scores
+            scores = self.score_values(feature_matrix, model_name)
+        
+        with self.telemetry.stage("postprocessing", rows=len(timestamps)):
+            return self.summarize_predictions(
+                timestamps, feature_matrix, scores, step, queries=queries, threshold=threshold
+            )
+    
+    async def apredict_from_prometheus(
+        self,
+        query: Optional[Union[str, Sequence[str]]] = None,
+        hours: int = 1,
+        step: str = "10s",
+        incremental: bool = True,
+        instance: str = "",
+        threshold: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Async version of predict_from_prometheus used by the MCP tools
+        
+        Prometheus and KServe calls go through pooled clients with bounded
+        concurrency, so concurrent tool calls do not block the event loop.
+        Identical calls in flight at the same time share one computation.
+        """
+        queries = self._metric_queries(query)
+        return await self._acoalesce(
+            ("predict", queries, hours, step, incremental, instance, threshold),
+            lambda: self._apredict_from_prometheus(queries, hours, step, incremental, instance, threshold)
+        )
+    
+    async def _apredict_from_prometheus(
+        self,
+        queries: Tuple[str, ...],
+        hours: int,
+        step: str,
+        incremental: bool,
+        instance: str,
+        threshold: Optional[float]
+    ) -> Dict[str, Any]:
+        # The model list is cached; a refresh is one blocking request, so keep it off the event loop
+        model_name = await asyncio.to_thread(self.model_for_instance, instance)
+        end = time.time()
+        start = end - hours * 3600
+        
+        if incremental and hours <= self.stream_buffer_hours:
+            # Watched instances are answered from their pre-scored stream without fetching
+            timestamps, feature_matrix, scores = await self._ascore_incremental(
+                queries, start, end, step, model_name, self._prescore_max_age(queries, step, model_name)
+            )
+            if len(timestamps) == 0:
+                raise ValueError("No data returned from Prometheus")
+        else:
+            timestamps, feature_matrix = await self._afetch_features(queries, start, end, step)
+            scores = await self.ascore_values(feature_matrix, model_name)
+        
+        with self.telemetry.stage("postprocessing", rows=len(timestamps)):
+            return self.summarize_predictions(
+                timestamps, feature_matrix, scores, step, queries=queries, threshold=threshold
+            )
+    
+    async def apredict_fleet(
+        self,
+        matchers: str = "",
+        hours: int = 1,
+        step: str = "10s",
+        threshold: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Score every node matching a selector with one query and one inference call
+        
+        Each metric of the spec is one ``by (instance)`` range query for all nodes;
+        the queries run concurrently, are aligned per node, featurized together in
+        one batched pass, and scored in one KServe v2 request per model (a single
+        request unless route_by_instance gives nodes their own models).
+        
+        Args:
+            matchers: Label matchers selecting the nodes, see anomaly_core.instance_matchers
+            hours: Hours of data to analyze
+            step: Query resolution step
+            threshold: Anomaly score cut-off for this call (default anomaly_threshold)
+            
+        Returns:
+            Per-node summaries, most severe first (shared with concurrent identical calls)
+        """
+        return await self._acoalesce(
+            ("fleet", matchers, hours, step, threshold),
+            lambda: self._apredict_fleet(matchers, hours, step, threshold)
+        )
+    
+    async def _apredict_fleet(
+        self,
+        matchers: str,
+        hours: int,
+        step: str,
+        threshold: Optional[float]
+    ) -> List[Dict[str, Any]]:
+        end = time.time()
+        instances, series_index, timestamps, feature_matrix = await self._afleet_features(
+            self.metric_spec.queries(matchers, by_instance=True), end - hours * 3600, end, step
+        )
+        
+        # Rows grouped by routed model, one batched request per model, run concurrently
+        series_models = np.array(await asyncio.to_thread(lambda: [self.model_for_instance(i) for i in instances]))
+        row_models = series_models[series_index]
+        model_names = np.unique(series_models)
+        row_groups = [np.flatnonzero(row_models == name) for name in model_names]
+        results = await asyncio.gather(*(
+            self.ascore_values(feature_matrix[rows], str(name)) for name, rows in zip(model_names, row_groups)
+        ))
+        scores = np.empty(len(feature_matrix), dtype=np.float64)
+        for rows, group_scores in zip(row_groups, results):
+            scores[rows] = group_scores
+        
+        with self.telemetry.stage("postprocessing", rows=len(timestamps)):
+            return self.summarize_fleet(
+                instances, series_index, timestamps, feature_matrix, scores, step, threshold=threshold
+            )
+    
+    async def _afleet_features(
+        self,
+        queries: Sequence[str],
+        start: float,
+        end: float,
+        step: str
+    ) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]:
+        """(instances, series_index, timestamps, features) of every node the by-instance queries return"""
+        if self.pushdown_active:
+            groups = await self.aquery_prometheus_features(queries, start, end, step)
+            if not groups:
+                raise ValueError("No data returned from Prometheus")
+            instances = [labels.get('instance', str(labels)) for labels, _, _ in groups]
+            series_index = np.repeat(np.arange(len(groups)), [len(ts) for _, ts, _ in groups])
+            timestamps = np.concatenate([ts for _, ts, _ in groups])
+            return instances, series_index, timestamps, np.concatenate([features for _, _, features in groups])
+        
+        results = await asyncio.gather(*(self.aquery_prometheus_series(query, start, end, step) for query in queries))
+        series = align_series(list(results))
+        if not series:
+            raise ValueError("No data returned from Prometheus")
+        
+        instances = [labels.get('instance', str(labels)) for labels, _, _ in series]
+        with self.telemetry.stage("feature_engineering", rows=sum(len(ts) for _, ts, _ in series)):
+            series_index, timestamps, feature_matrix = self.metric_spec.compute_features_batch([(ts, v) for _, ts, v in series])
+        return instances, series_index, timestamps, feature_matrix
+    
+    def summarize_fleet(
+        self,
+        instances: List[str],
+        series_index: np.ndarray,
+        timestamps: np.ndarray,
+        feature_matrix: np.ndarray,
+        scores: np.ndarray,
+        step: str = "10s",
+        threshold: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Aggregate batched anomaly scores into one summary per node
+        
+        Args:
+            instances: Instance label per series
+            series_index: Series position of each scored row
+            timestamps: float64 epoch seconds per row
+            feature_matrix: Feature rows that were scored
+            scores: Anomaly score per row (see score_values)
+            step: Query resolution step
+            threshold: Rows scoring below this are anomalous (default anomaly_threshold)
+            
+        Returns:
+            Per-node summaries sorted by peak (lowest) score, then anomaly percentage and
+            longest anomaly period
+        """
+        threshold = self.anomaly_threshold if threshold is None else threshold
+        n_series = len(instances)
+        step_seconds = parse_duration(step)
+        anomalous = scores < threshold
+        cpu_usage = feature_matrix[:, self.metric_spec.primary_column]
+        
+        samples = np.bincount(series_index, minlength=n_series)
+        anomalies = np.bincount(series_index[anomalous], minlength=n_series)
+        
+        starts, ends, durations = anomaly_periods(
+            timestamps,
+            anomalous,
+            step_seconds,
+            segment_ids=series_index,
+            max_gap_seconds=self.merge_gap_seconds,
+            min_duration_seconds=self.min_period_seconds
+        )
+        periods = np.bincount(series_index[starts], minlength=n_series)
+        longest = np.zeros(n_series)
+        np.maximum.at(longest, series_index[starts], durations)
+        
+        last_anomaly = np.full(n_series, -np.inf)
+        np.maximum.at(last_anomaly, series_index[anomalous], timestamps[anomalous])
+        peak_cpu = np.full(n_series, -np.inf)
+        np.maximum.at(peak_cpu, series_index[anomalous], cpu_usage[anomalous])
+        last_anomaly_iso = format_timestamps(np.where(np.isfinite(last_anomaly), last_anomaly, 0))
+        
+        # Severity from the same scored pass: the most anomalous row and the average per node
+        peak_score = np.full(n_series, np.inf)
+        np.minimum.at(peak_score, series_index, scores)
+        score_sums = np.bincount(series_index, weights=scores, minlength=n_series)
+        
+        summaries = []
+        for i, instance in enumerate(instances):
+            has_anomalies = anomalies[i] > 0
+            summaries.append({
+                "instance": instance,
+                "total_samples": int(samples[i]),
+                "anomalies_detected": int(anomalies[i]),
+                "anomaly_percentage": float(anomalies[i] / samples[i] * 100) if samples[i] else 0.0,
+                "anomaly_periods": int(periods[i]),
+                "longest_period_seconds": int(longest[i]),
+                "last_anomaly_time": last_anomaly_iso[i] if has_anomalies else None,
+                "peak_anomalous_cpu_usage": float(peak_cpu[i]) if has_anomalies else None,
+                "peak_score": float(peak_score[i]) if samples[i] else None,
+                "mean_score": float(score_sums[i] / samples[i]) if samples[i] else None
             })
         
+        summaries.sort(key=lambda s: (
+            s["peak_score"] if s["peak_score"] is not None else np.inf,
+            -s["anomaly_percentage"],
+            -s["longest_period_seconds"]
+        ))
+        return summaries
+    
+    def summarize_predictions(
+        self,
+        timestamps: np.ndarray,
+        feature_matrix: np.ndarray,
+        scores: np.ndarray,
+        step: str = "10s",
+        queries: Sequence[str] = (),
+        threshold: Optional[float] = None,
+        result_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Turn scored rows into a size-bounded summary
+        
+        The response holds counts, the top anomaly periods and a downsampled CPU
+        series, so its size does not grow with the time window. The full
+        per-sample result is saved to the result store and can be paged with
+        load_result(result_id), or summarized again at another threshold with
+        rethreshold_result(result_id, threshold).
+        
+        Args:
+            timestamps: float64 epoch seconds per row
+            feature_matrix: Feature rows that were scored
+            scores: Anomaly score per row (see score_values)
+            step: Query resolution step
+            queries: PromQL queries the rows came from (stored with the full result)
+            threshold: Rows scoring below this are anomalous (default anomaly_threshold)
+            result_id: Id of the stored result these rows came from; it is not saved again
+            
+        Returns:
+            Dictionary with counts, anomaly timing and severity information and a downsampled
+            series; "cpu_usage" values are the first metric of the metric spec
+        """
+        threshold = self.anomaly_threshold if threshold is None else threshold
+        cpu_usage = feature_matrix[:, self.metric_spec.primary_column]
+        
+        # Negative decision_function scores are IsolationForest's anomalies at threshold 0
+        anomalous = scores < threshold
+        anomalies = int(np.count_nonzero(anomalous))
+        normal = len(scores) - anomalies
+        anomaly_index = np.flatnonzero(anomalous)
+        first_anomaly_time = format_timestamps(timestamps[anomaly_index[:1]])[0] if anomalies else None
+        
+        # Anomaly periods from the real timestamps, so gaps and other steps are measured correctly
+        starts, ends, durations = anomaly_periods(
+            timestamps,
+            anomalous,
+            parse_duration(step),
+            max_gap_seconds=self.merge_gap_seconds,
+            min_duration_seconds=self.min_period_seconds
+        )
+        peaks = run_max(cpu_usage, starts, ends)
+        peak_scores = run_min(scores, starts, ends)
+        mean_scores = run_mean(scores, starts, ends)
+        # Most anomalous first, ties (e.g. label-only scores) broken by duration, then CPU peak
+        top = np.lexsort((-peaks, -durations, peak_scores))[:self.top_periods]
+        period_starts = format_timestamps(timestamps[starts[top]])
+        period_ends = format_timestamps(timestamps[ends[top]])
+        anomaly_periods_list = [
+            {
+                'start': period_start,
+                'end': period_end,
+                'duration_seconds': duration,
+                'duration_formatted': f"{duration // 60}m {duration % 60}s",
+                'peak_cpu_usage': peak,
+                'peak_score': peak_score,
+                'mean_score': mean_score
+            }
+            for period_start, period_end, duration, peak, peak_score, mean_score in zip(
+                period_starts, period_ends, durations[top].astype(int).tolist(), peaks[top].tolist(),
+                peak_scores[top].tolist(), mean_scores[top].tolist()
+            )
+        ]
+        
+        if self.downsample_method == "lttb":
+            keep = lttb_indices(timestamps, cpu_usage, self.max_series_points)
+        else:
+            keep = minmax_indices(cpu_usage, self.max_series_points)
+        
+        if self.result_store is not None and result_id is None:
+            result_id = self.result_store.save(
+                {
+                    'timestamps': timestamps,
+                    'features': feature_matrix,
+                    'predictions': np.where(anomalous, -1, 1).astype(np.int8),
+                    'scores': scores
+                },
+                {
+                    'queries': list(queries),
+                    'step': step,
+                    'feature_columns': self.metric_spec.feature_columns,
+                    'primary_column': self.metric_spec.primary_column,
+                    'threshold': threshold,
+                    'created': time.time()
+                }
+            )
+        
         return {
-            "total_samples": len(features),
+            "total_samples": len(feature_matrix),
             "anomalies_detected": anomalies,
             "normal_samples": normal,
-            "anomaly_percentage": (anomalies / len(features) * 100) if features else 0,
-            "predictions": prediction_values,
-            "timestamps": [ts.isoformat() if hasattr(ts, 'isoformat') else str(ts) for ts in df_features['timestamp'].tolist()],
-            "cpu_usage": df_features['cpu_usage'].tolist(),
+            "anomaly_percentage": (anomalies / len(feature_matrix) * 100) if len(feature_matrix) else 0,
+            "threshold": threshold,
+            "peak_score": float(scores.min()) if len(scores) else None,
             # Anomaly timing information
             "first_anomaly_time": first_anomaly_time,
-            "anomaly_periods": anomaly_periods,
-            "anomaly_details": anomaly_details
+            "anomaly_period_count": len(starts),
+            "anomaly_periods": anomaly_periods_list,
+            "series": {
+                "timestamps": format_timestamps(timestamps[keep]),
+                "cpu_usage": np.round(cpu_usage[keep], 2).tolist(),
+                "anomalous": anomalous[keep].tolist()
+            },
+            "result_id": result_id
+        }
+    
+    def rethreshold_result(self, result_id: str, threshold: float) -> Dict[str, Any]:
+        """
+        Summarize a stored result again at another anomaly threshold, without re-scoring
+        
+        Args:
+            result_id: Id from a summary
+            threshold: Rows scoring below this are anomalous
+            
+        Returns:
+            Summary like summarize_predictions, for the same rows and result id
+        """
+        if self.result_store is None:
+            raise ValueError("Result storage is disabled")
+        metadata, arrays = self.result_store.load(result_id)
+        
+        return self.summarize_predictions(
+            arrays['timestamps'],
+            arrays['features'],
+            self._stored_scores(arrays),
+            metadata['step'],
+            queries=metadata['queries'],
+            threshold=threshold,
+            result_id=result_id
+        )
+    
+    @staticmethod
+    def _stored_scores(arrays: Dict[str, np.ndarray]) -> np.ndarray:
+        # Results saved before scores were stored only have the labels, which share the sign convention
+        if 'scores' in arrays:
+            return arrays['scores']
+        return arrays['predictions'].astype(np.float64)
+    
+    def load_result(
+        self,
+        result_id: str,
+        offset: int = 0,
+        limit: int = 500,
+        anomalies_only: bool = True,
+        threshold: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Page through a full result saved by summarize_predictions
+        
+        Args:
+            result_id: Id from a summary
+            offset: First row of the page (after the anomalies_only filter)
+            limit: Maximum rows in the page
+            anomalies_only: Only return rows predicted as anomalous
+            threshold: Anomaly score cut-off for the labels and the anomalies_only filter
+                (default: the threshold the result was summarized with)
+            
+        Returns:
+            Dictionary with the queries, row counts and the requested rows
+        """
+        if self.result_store is None:
+            raise ValueError("Result storage is disabled")
+        metadata, arrays = self.result_store.load(result_id)
+        
+        scores = self._stored_scores(arrays)
+        if threshold is None:
+            predictions = arrays['predictions']
+        else:
+            predictions = np.where(scores < threshold, -1, 1)
+        rows = np.arange(len(predictions))
+        if anomalies_only:
+            rows = rows[predictions == -1]
+        page = rows[offset:offset + limit]
+        cpu_usage = arrays['features'][page, metadata['primary_column']]
+        
+        return {
+            "result_id": result_id,
+            "queries": metadata['queries'],
+            "step": metadata['step'],
+            "threshold": metadata.get('threshold', 0.0) if threshold is None else threshold,
+            "total_rows": len(rows),
+            "offset": offset,
+            "rows": [
+                {'timestamp': timestamp, 'cpu_usage': usage, 'prediction': prediction, 'score': score, 'index': index}
+                for timestamp, usage, prediction, score, index in zip(
+                    format_timestamps(arrays['timestamps'][page]),
+                    cpu_usage.tolist(),
+                    predictions[page].tolist(),
+                    scores[page].tolist(),
+                    page.tolist()
+                )
+            ]
         }
-
 
 # Configuration from environment
 PROMETHEUS_URL = os.getenv(
@@ -255,20 +1728,177 @@ INFERENCE_SERVICE_URL = os.getenv(
 )
 MODEL_NAME = os.getenv("MODEL_NAME", "sklearn-iris")
 DEFAULT_INSTANCE_IP = os.getenv("DEFAULT_INSTANCE_IP", "10.0.1.10:9100")
+STREAM_BUFFER_HOURS = int(os.getenv("STREAM_BUFFER_HOURS", "24"))
+MAX_CONCURRENT_QUERIES = int(os.getenv("MAX_CONCURRENT_QUERIES", "8"))
+MAX_CONCURRENT_INFERENCES = int(os.getenv("MAX_CONCURRENT_INFERENCES", "8"))
+PROMETHEUS_TIMEOUT = float(os.getenv("PROMETHEUS_TIMEOUT", "30"))
+INFERENCE_TIMEOUT = float(os.getenv("INFERENCE_TIMEOUT", "30"))
+INFERENCE_BINARY = os.getenv("INFERENCE_BINARY", "true").lower() == "true"
+INFERENCE_MAX_PAYLOAD_BYTES = int(os.getenv("INFERENCE_MAX_PAYLOAD_BYTES", str(4 * 1024 * 1024)))
+NAMESPACE = os.getenv("NAMESPACE", "default")
+SCORING_BACKEND = os.getenv("SCORING_BACKEND", "http")
+MODEL_STORAGE_URI = os.getenv("MODEL_STORAGE_URI", "")
+MODEL_CACHE_DIR = os.getenv("MODEL_CACHE_DIR", "/tmp/anomaly-model-cache")
+MODEL_REFRESH_SECONDS = float(os.getenv("MODEL_REFRESH_SECONDS", "60"))
+S3_ENDPOINT = os.getenv("S3_ENDPOINT", "http://minio-service.kubeflow:9000")
+PROMETHEUS_CACHE_BYTES = int(os.getenv("PROMETHEUS_CACHE_BYTES", str(64 * 1024 * 1024)))
+PROMETHEUS_CACHE_TTL_SECONDS = float(os.getenv("PROMETHEUS_CACHE_TTL_SECONDS", "300"))
+ANOMALY_MERGE_GAP_SECONDS = float(os.getenv("ANOMALY_MERGE_GAP_SECONDS", "0"))
+ANOMALY_MIN_PERIOD_SECONDS = float(os.getenv("ANOMALY_MIN_PERIOD_SECONDS", "0"))
+RESPONSE_TOP_PERIODS = int(os.getenv("RESPONSE_TOP_PERIODS", "10"))
+RESPONSE_MAX_POINTS = int(os.getenv("RESPONSE_MAX_POINTS", "48"))
+RESPONSE_DOWNSAMPLE = os.getenv("RESPONSE_DOWNSAMPLE", "minmax")
+RESULT_DIR = os.getenv("RESULT_DIR", "/tmp/anomaly-results")
+RESULT_MAX_FILES = int(os.getenv("RESULT_MAX_FILES", "200"))
+METRIC_SPEC = load_metric_spec(os.getenv("METRIC_SPEC", ""))
+MODEL_ROUTING = os.getenv("MODEL_ROUTING", "global")
+MODEL_INDEX_TTL_SECONDS = float(os.getenv("MODEL_INDEX_TTL_SECONDS", "60"))
+COALESCE_REQUESTS = os.getenv("COALESCE_REQUESTS", "true").lower() == "true"
+INFERENCE_BATCH_WINDOW_MS = float(os.getenv("INFERENCE_BATCH_WINDOW_MS", "2"))
+FEATURE_SOURCE = os.getenv("FEATURE_SOURCE", "client")
+PUSHDOWN_RETRY_SECONDS = float(os.getenv("PUSHDOWN_RETRY_SECONDS", "3600"))
+WATCHED_INSTANCES = [i.strip() for i in os.getenv("WATCHED_INSTANCES", "").split(",") if i.strip()]
+PRESCORE_INTERVAL_SECONDS = float(os.getenv("PRESCORE_INTERVAL_SECONDS", "30"))
+ANOMALY_SCORE_THRESHOLD = float(os.getenv("ANOMALY_SCORE_THRESHOLD", "0"))
+
+# Local scoring follows the storageUri of the deployed InferenceService (or a fixed URI)
+model_store = None
+if SCORING_BACKEND == "local":
+    model_store = ModelStore(
+        cache_dir=MODEL_CACHE_DIR,
+        storage_uri=MODEL_STORAGE_URI,
+        inference_service_name=MODEL_NAME,
+        namespace=NAMESPACE,
+        s3_endpoint=S3_ENDPOINT
+    )
 
 # Initialize tool
 tool = AnomalyDetectionTool(
     prometheus_url=PROMETHEUS_URL,
     inference_service_url=INFERENCE_SERVICE_URL,
-    model_name=MODEL_NAME
+    model_name=MODEL_NAME,
+    stream_buffer_hours=STREAM_BUFFER_HOURS,
+    max_concurrent_queries=MAX_CONCURRENT_QUERIES,
+    max_concurrent_inferences=MAX_CONCURRENT_INFERENCES,
+    prometheus_timeout=PROMETHEUS_TIMEOUT,
+    inference_timeout=INFERENCE_TIMEOUT,
+    namespace=NAMESPACE,
+    binary_payloads=INFERENCE_BINARY,
+    max_payload_bytes=INFERENCE_MAX_PAYLOAD_BYTES,
+    scoring_backend=SCORING_BACKEND,
+    model_store=model_store,
+    cache_max_bytes=PROMETHEUS_CACHE_BYTES,
+    cache_ttl_seconds=PROMETHEUS_CACHE_TTL_SECONDS,
+    merge_gap_seconds=ANOMALY_MERGE_GAP_SECONDS,
+    min_period_seconds=ANOMALY_MIN_PERIOD_SECONDS,
+    top_periods=RESPONSE_TOP_PERIODS,
+    max_series_points=RESPONSE_MAX_POINTS,
+    downsample_method=RESPONSE_DOWNSAMPLE,
+    result_store=ResultStore(RESULT_DIR, RESULT_MAX_FILES) if RESULT_MAX_FILES > 0 else None,
+    metric_spec=METRIC_SPEC,
+    route_by_instance=MODEL_ROUTING == "instance",
+    model_index_ttl_seconds=MODEL_INDEX_TTL_SECONDS,
+    coalesce_requests=COALESCE_REQUESTS,
+    batch_window_seconds=INFERENCE_BATCH_WINDOW_MS / 1000,
+    feature_source=FEATURE_SOURCE,
+    pushdown_retry_seconds=PUSHDOWN_RETRY_SECONDS,
+    watched_instances=WATCHED_INSTANCES,
+    prescore_interval_seconds=PRESCORE_INTERVAL_SECONDS,
+    anomaly_threshold=ANOMALY_SCORE_THRESHOLD
 )
 
+if model_store is not None:
+    model_store.on_change = tool.on_model_change
+    model_store.start_auto_refresh(MODEL_REFRESH_SECONDS)
+
+
+async def _warm_up() -> None:
+    """Start-up work that runs after the server accepts connections; /ready reports when it is done"""
+    # Spans are exported only when OTEL_EXPORTER_OTLP_ENDPOINT is set; the OTLP
+    # exporter is slow to import, and spans started before this are not exported
+    await asyncio.to_thread(configure_tracing, "anomaly-detection-tool")
+    state = await tool.warm_up()
+    print(f"✓ Warm-up finished ({'ready' if tool.ready else 'not ready'}): {state}")
+
+
+@asynccontextmanager
+async def _lifespan(server: FastMCP) -> AsyncIterator[Dict[str, Any]]:
+    """Warm the tool up, and pre-score WATCHED_INSTANCES for as long as the server is up"""
+    # fastmcp 4.x runs this once per server when the app starts; older releases ran it
+    # per MCP session (one scheduler per client, nothing before the first), hence the pin
+    tasks = [asyncio.create_task(_warm_up())]
+    if tool.watched_instances:
+        tasks.append(asyncio.create_task(tool.run_prescoring()))
+    try:
+        yield {}
+    finally:
+        for task in tasks:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+
+
 # Initialize FastMCP Server
-mcp = FastMCP("Anomaly Detection Model")
+mcp = FastMCP("Anomaly Detection Model", lifespan=_lifespan)
+# custom_route (the /metrics and /ready endpoints) needs a fastmcp release that has it; see requirements.txt
+
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def metrics(request: Request) -> Response:
+    """Prometheus scrape endpoint for the tool's stage, payload and cache metrics"""
+    body, content_type = tool.telemetry.render()
+    return Response(body, media_type=content_type)
+
+
+@mcp.custom_route("/ready", methods=["GET"])
+async def ready(request: Request) -> Response:
+    """Readiness probe: 503 until warm-up has opened the clients, exercised scoring and loaded a local model"""
+    return JSONResponse(
+        {"ready": tool.ready, "warm_up": tool.warm_state},
+        status_code=200 if tool.ready else 503
+    )
+
+
+def _tool_response(response_text: str) -> str:
+    """Record the size of a tool answer, which is what the agent's context pays for"""
+    tool.telemetry.observe_payload("tool_response", len(response_text.encode()))
+    return response_text
+
+
+def _more_periods_text(result: Dict[str, Any]) -> str:
+    """Line pointing at the full result when not every period is listed"""
+    hidden = result['anomaly_period_count'] - len(result['anomaly_periods'])
+    if hidden <= 0:
+        return ""
+    text = f"  ... and {hidden} more periods"
+    if result['result_id']:
+        text += f" (use get_anomaly_result with result_id {result['result_id']})"
+    return text + "\n"
+
+
+def _score_text(result: Dict[str, Any]) -> str:
+    """Most anomalous score of a summary and the threshold it was labelled with"""
+    if result['peak_score'] is None:
+        return ""
+    return (
+        f"Peak Anomaly Score: {result['peak_score']:.4f} "
+        f"(threshold {result['threshold']:g}; lower is more anomalous)\n"
+    )
+
+
+def _series_text(result: Dict[str, Any]) -> str:
+    """Downsampled CPU series, one compact line per point (* marks anomalous points)"""
+    series = result['series']
+    text = f"CPU Usage ({len(series['timestamps'])} of {result['total_samples']} points, * = anomalous):\n"
+    for timestamp, usage, anomalous in zip(series['timestamps'], series['cpu_usage'], series['anomalous']):
+        text += f"  {timestamp} {usage:.1f}%{' *' if anomalous else ''}\n"
+    if result['result_id']:
+        text += f"Full result: {result['result_id']} (retrieve with get_anomaly_result)\n"
+    return text
 
 
 @mcp.tool()
-def predict_anomalies(
+async def predict_anomalies(
     instance_ip: str = DEFAULT_INSTANCE_IP,
     hours: int = 1
 ) -> str:
@@ -283,55 +1913,61 @@ def predict_anomalies(
     Returns:
         Formatted string with anomaly detection results including timing information
     """
-    query = f'100 - (avg(rate(node_cpu_seconds_total{{mode="idle", instance="{instance_ip}"}}[5m])) * 100)'
+    queries = tool.metric_spec.queries(instance_matchers(instance=instance_ip))
     try:
         # Validate hours
         if hours < 1 or hours > 24:
             return f"Error: hours must be between 1 and 24, got {hours}"
         
-        result = tool.predict_from_prometheus(query=query, hours=hours)
+        result = await tool.apredict_from_prometheus(query=queries, hours=hours, instance=instance_ip)
         
         # Format response with timing information
-        response_text = f"""Anomaly Detection Results:
+        with tool.telemetry.stage("response_formatting", tool="predict_anomalies"):
+            response_text = f"""Anomaly Detection Results:
 
 Total Samples Analyzed: {result['total_samples']}
 Anomalies Detected: {result['anomalies_detected']}
 Normal Samples: {result['normal_samples']}
 Anomaly Percentage: {result['anomaly_percentage']:.2f}%
-
+{_score_text(result)}
 """
-        
-        # Add timing information if anomalies were detected
-        if result['anomalies_detected'] > 0:
-            response_text += f"⏰ First Anomaly Detected: {result['first_anomaly_time']}\n\n"
             
-            if result['anomaly_periods']:
-                response_text += "Anomaly Periods:\n"
-                for i, period in enumerate(result['anomaly_periods'], 1):
-                    response_text += f"  Period {i}:\n"
-                    response_text += f"    Start: {period['start']}\n"
-                    response_text += f"    End: {period['end']}\n"
-                    response_text += f"    Duration: {period['duration_formatted']}\n"
-                response_text += "\n"
-        else:
-            response_text += "✓ No anomalies detected in the analyzed time period.\n\n"
-        
-        response_text += f"""Details:
+            # Add timing information if anomalies were detected
+            if result['anomalies_detected'] > 0:
+                response_text += f"⏰ First Anomaly Detected: {result['first_anomaly_time']}\n\n"
+                
+                if result['anomaly_periods']:
+                    response_text += f"Anomaly Periods ({result['anomaly_period_count']}, most anomalous first):\n"
+                    for i, period in enumerate(result['anomaly_periods'], 1):
+                        response_text += f"  Period {i}:\n"
+                        response_text += f"    Start: {period['start']}\n"
+                        response_text += f"    End: {period['end']}\n"
+                        response_text += f"    Duration: {period['duration_formatted']}\n"
+                        response_text += f"    Peak CPU: {period['peak_cpu_usage']:.1f}%\n"
+                        response_text += f"    Anomaly Score: peak {period['peak_score']:.4f}, mean {period['mean_score']:.4f}\n"
+                    response_text += _more_periods_text(result)
+                    response_text += "\n"
+            else:
+                response_text += "✓ No anomalies detected in the analyzed time period.\n\n"
+            
+            response_text += f"""Details:
 - The model analyzed {result['total_samples']} data points
 - {result['anomalies_detected']} anomalies were detected (marked as -1)
 - {result['normal_samples']} samples were classified as normal (marked as 1)
 - Anomaly rate: {result['anomaly_percentage']:.2f}%
 
+{_series_text(result)}
 This indicates potential issues in the cluster metrics that may require attention.
 """
-        return response_text
+        return _tool_response(response_text)
     
     except Exception as e:
+        tool.telemetry.count_error("predict_anomalies", e)
         return f"Error predicting anomalies: {str(e)}"
 
 
 @mcp.tool()
-def query_prometheus_and_predict(
+async def query_prometheus_and_predict(
     instance_ip: str = DEFAULT_INSTANCE_IP,
     time_range_hours: int = 1
 ) -> str:
@@ -346,42 +1982,220 @@ def query_prometheus_and_predict(
     Returns:
         Formatted string with prediction results including timing information
     """
-    promql_query = f'100 - (avg(rate(node_cpu_seconds_total{{mode="idle", instance="{instance_ip}"}}[5m])) * 100)'
-    try:
-        if not promql_query:
-            return "Error: promql_query parameter is required"
-        
+    promql_queries = tool.metric_spec.queries(instance_matchers(instance=instance_ip))
+    try:        
         if time_range_hours < 1 or time_range_hours > 24:
             return f"Error: time_range_hours must be between 1 and 24, got {time_range_hours}"
         
-        result = tool.predict_from_prometheus(query=promql_query, hours=time_range_hours)
+        result = await tool.apredict_from_prometheus(query=promql_queries, hours=time_range_hours, instance=instance_ip)
+        query_text = "\n       ".join(promql_queries)
         
-        response_text = f"""Query: {promql_query}
+        with tool.telemetry.stage("response_formatting", tool="query_prometheus_and_predict"):
+            response_text = f"""Query: {query_text}
 Time Range: {time_range_hours} hours
 
 Results:
 - Total Samples: {result['total_samples']}
 - Anomalies: {result['anomalies_detected']} ({result['anomaly_percentage']:.2f}%)
 - Normal: {result['normal_samples']}
-
+{_score_text(result)}
 """
+            
+            # Add timing information if anomalies were detected
+            if result['anomalies_detected'] > 0:
+                response_text += f"⏰ First Anomaly: {result['first_anomaly_time']}\n"
+                
+                if result['anomaly_periods']:
+                    response_text += f"\nAnomaly Periods ({result['anomaly_period_count']}, most anomalous first):\n"
+                    for i, period in enumerate(result['anomaly_periods'], 1):
+                        response_text += (
+                            f"  {i}. {period['start']} → {period['end']} ({period['duration_formatted']}, "
+                            f"peak CPU {period['peak_cpu_usage']:.1f}%, peak score {period['peak_score']:.4f})\n"
+                        )
+                    response_text += _more_periods_text(result)
+            else:
+                response_text += "✓ No anomalies detected.\n"
+            
+            response_text += f"\n{_series_text(result)}"
+            response_text += "\nAnomaly predictions completed successfully."
+        return _tool_response(response_text)
+    
+    except Exception as e:
+        tool.telemetry.count_error("query_prometheus_and_predict", e)
+        return f"Error querying Prometheus and predicting: {str(e)}"
+
+
+@mcp.tool()
+async def get_anomaly_result(
+    result_id: str,
+    offset: int = 0,
+    limit: int = 100,
+    anomalies_only: bool = True,
+    threshold: Optional[float] = None
+) -> str:
+    """
+    Page through the full per-sample result of an earlier anomaly prediction.
+    Prediction responses are summarized; use this for individual samples.
+    
+    Args:
+        result_id: Result id from predict_anomalies or query_prometheus_and_predict
+        offset: Index of the first sample to return
+        limit: Number of samples to return (1-500)
+        anomalies_only: Only return samples predicted as anomalous
+        threshold: Anomaly score cut-off (default: the one the result was summarized with)
+    
+    Returns:
+        Formatted string with one line per sample
+    """
+    try:
+        if limit < 1 or limit > 500:
+            return f"Error: limit must be between 1 and 500, got {limit}"
         
-        # Add timing information if anomalies were detected
-        if result['anomalies_detected'] > 0:
-            response_text += f"⏰ First Anomaly: {result['first_anomaly_time']}\n"
+        page = tool.load_result(
+            result_id, offset=offset, limit=limit, anomalies_only=anomalies_only, threshold=threshold
+        )
+        kind = "anomalous samples" if anomalies_only else "samples"
+        query_text = "\n       ".join(page['queries'])
+        
+        with tool.telemetry.stage("response_formatting", tool="get_anomaly_result"):
+            response_text = f"""Result {page['result_id']}
+Query: {query_text}
+Showing {kind} {offset + 1}-{offset + len(page['rows'])} of {page['total_rows']} (threshold {page['threshold']:g}):
+
+"""
+            for row in page['rows']:
+                label = "anomaly" if row['prediction'] == -1 else "normal"
+                response_text += (
+                    f"  [{row['index']}] {row['timestamp']} {row['cpu_usage']:.2f}% {label} (score {row['score']:.4f})\n"
+                )
             
+            if offset + len(page['rows']) < page['total_rows']:
+                response_text += f"\nMore available: call again with offset={offset + len(page['rows'])}\n"
+        return _tool_response(response_text)
+    
+    except Exception as e:
+        tool.telemetry.count_error("get_anomaly_result", e)
+        return f"Error retrieving anomaly result: {str(e)}"
+
+
+@mcp.tool()
+async def rethreshold_anomaly_result(
+    result_id: str,
+    threshold: float
+) -> str:
+    """
+    Re-label an earlier anomaly prediction at a different sensitivity, without querying or scoring again.
+    Every sample keeps its anomaly score (lower is more anomalous, below 0 is the model's default cut-off);
+    samples scoring below the new threshold are counted as anomalies.
+    
+    Args:
+        result_id: Result id from predict_anomalies or query_prometheus_and_predict
+        threshold: New anomaly score cut-off; raise it (e.g. 0.05) to flag more, lower it (e.g. -0.1)
+            to keep only the most severe anomalies
+    
+    Returns:
+        Formatted string with the counts and anomaly periods at the new threshold
+    """
+    try:
+        result = await asyncio.to_thread(tool.rethreshold_result, result_id, threshold)
+        
+        with tool.telemetry.stage("response_formatting", tool="rethreshold_anomaly_result"):
+            response_text = f"""Result {result_id} at threshold {threshold:g}:
+
+- Total Samples: {result['total_samples']}
+- Anomalies: {result['anomalies_detected']} ({result['anomaly_percentage']:.2f}%)
+- Normal: {result['normal_samples']}
+{_score_text(result)}
+"""
             if result['anomaly_periods']:
-                response_text += f"\nAnomaly Periods ({len(result['anomaly_periods'])}):\n"
+                response_text += f"Anomaly Periods ({result['anomaly_period_count']}, most anomalous first):\n"
                 for i, period in enumerate(result['anomaly_periods'], 1):
-                    response_text += f"  {i}. {period['start']} → {period['end']} ({period['duration_formatted']})\n"
-        else:
-            response_text += "✓ No anomalies detected.\n"
+                    response_text += (
+                        f"  {i}. {period['start']} → {period['end']} ({period['duration_formatted']}, "
+                        f"peak CPU {period['peak_cpu_usage']:.1f}%, peak score {period['peak_score']:.4f})\n"
+                    )
+                response_text += _more_periods_text(result)
+            else:
+                response_text += "✓ No anomalies at this threshold.\n"
+        return _tool_response(response_text)
+    
+    except Exception as e:
+        tool.telemetry.count_error("rethreshold_anomaly_result", e)
+        return f"Error re-thresholding anomaly result: {str(e)}"
+
+
+@mcp.tool()
+async def predict_fleet_anomalies(
+    instances: Optional[List[str]] = None,
+    instance_pattern: str = "",
+    label_selector: str = "",
+    hours: int = 1,
+    top_k: int = 20,
+    threshold: Optional[float] = None
+) -> str:
+    """
+    Score a whole fleet of nodes for CPU anomalies in one call and rank them by severity.
+    Fetches every matching node with a single Prometheus query and scores them in one batch.
+    With no selection arguments, every node exporter instance is scored.
+    
+    Args:
+        instances: Exact instances to score (e.g. ["10.0.0.194:9100", "10.0.1.12:9100"])
+        instance_pattern: Regex on the instance label (e.g. "10\\.0\\.1\\..*")
+        label_selector: Extra PromQL label matchers (e.g. 'job="node-exporter"')
+        hours: Number of hours of historical data to analyze (1-24)
+        top_k: Maximum number of anomalous nodes to list
+        threshold: Anomaly score cut-off (lower is more anomalous; default: the server's)
+    
+    Returns:
+        Formatted string with per-node anomaly summaries, most severe first
+    """
+    try:
+        if hours < 1 or hours > 24:
+            return f"Error: hours must be between 1 and 24, got {hours}"
+        
+        matchers = instance_matchers(
+            instances=instances,
+            instance_pattern=instance_pattern,
+            label_selector=label_selector
+        )
+        summaries = await tool.apredict_fleet(matchers=matchers, hours=hours, threshold=threshold)
+        anomalous = [s for s in summaries if s['anomalies_detected'] > 0]
+        
+        with tool.telemetry.stage("response_formatting", tool="predict_fleet_anomalies"):
+            response_text = f"""Fleet Anomaly Detection Results:
+
+Nodes Analyzed: {len(summaries)}
+Nodes With Anomalies: {len(anomalous)}
+Time Range: {hours} hours
+
+"""
+            
+            if anomalous:
+                response_text += "Nodes Ranked by Severity:\n"
+                for i, s in enumerate(anomalous[:top_k], 1):
+                    response_text += (
+                        f"  {i}. {s['instance']}: {s['anomaly_percentage']:.2f}% anomalous "
+                        f"({s['anomalies_detected']}/{s['total_samples']} samples, "
+                        f"{s['anomaly_periods']} periods, longest {s['longest_period_seconds'] // 60}m "
+                        f"{s['longest_period_seconds'] % 60}s, peak CPU {s['peak_anomalous_cpu_usage']:.1f}%, "
+                        f"peak score {s['peak_score']:.4f}, mean score {s['mean_score']:.4f}, "
+                        f"last at {s['last_anomaly_time']})\n"
+                    )
+                if len(anomalous) > top_k:
+                    response_text += f"  ... and {len(anomalous) - top_k} more nodes with anomalies\n"
+            else:
+                response_text += "✓ No anomalies detected on any node.\n"
         
-        response_text += "\nAnomaly predictions completed successfully."
-        return response_text
+        return _tool_response(response_text)
     
     except Exception as e:
-        return f"Error querying Prometheus and predicting: {str(e)}"
+        tool.telemetry.count_error("predict_fleet_anomalies", e)
+        return f"Error predicting fleet anomalies: {str(e)}"
+
+
+_import_seconds = time.perf_counter() - _IMPORT_STARTED
+tool.telemetry.observe_startup("import", _import_seconds)
+print(f"✓ Tool module imported in {_import_seconds:.2f}s")
 
 
 if __name__ == "__main__":
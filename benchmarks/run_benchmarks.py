@@ -0,0 +1,382 @@
+# benchmarks/run_benchmarks.py
+"""
+Latency, throughput and peak-memory benchmarks for the training and inference hot paths
+
+Serves synthetic node CPU series (benchmarks/synthetic.py) through a local
+Prometheus stand-in and a stub KServe v2 predictor, then times:
+
+- MCP tool stages: query_prometheus, engineer_features, predict (JSON and
+  binary v2 paths), summarize_predictions (post-processing of
+  predict_from_prometheus), predict_from_prometheus end to end, and the
+  fleet sweep when more than one node is configured
+- MCP tool cold start, each sample in a fresh interpreter: module import,
+  background warm-up, and the first predict_anomalies call with and without
+  warm-up (peak memory is the process max RSS for these)
+- pipeline components, called through their python_func: fetch_data,
+  engineer_features, train_model, update_feature_store, and optionally
+  sweep_model
+
+Each stage runs --repeat timed iterations after one warm-up, then one more
+iteration under tracemalloc for its peak Python/NumPy allocation. Results are
+written as JSON; --baseline compares against an earlier file and exits with
+status 1 when a stage got slower (median) or larger (peak memory) by more
+than --threshold.
+
+    python benchmarks/run_benchmarks.py --hours 1,24 --nodes 1,50 --output bench.json
+    python benchmarks/run_benchmarks.py --baseline bench.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, "ml-model", "pipelines"))
+sys.path.insert(0, os.path.join(REPO_ROOT, "anomaly-detection", "tool"))
+
+import numpy as np  # noqa: E402
+
+from anomaly_core import (  # noqa: E402
+    DEFAULT_METRIC_SPEC,
+    FlatIsolationForest,
+    compute_features,
+    instance_matchers,
+)
+from synthetic import StubKServe, SyntheticPrometheus, instance_name, synthetic_cpu  # noqa: E402
+
+STEP = "10s"
+STEP_SECONDS = 10.0
+
+
+class Artifact:
+    """Minimal stand-in for a KFP artifact when calling a component's python_func"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.metadata: Dict[str, Any] = {}
+
+    def log_metric(self, name: str, value: float) -> None:
+        self.metadata[name] = value
+
+
+def measure(fn: Callable[[], Any], repeat: int) -> Dict[str, Any]:
+    """
+    Time fn repeat times after a warm-up call, then record its peak allocation once
+
+    Returns:
+        Latency statistics in milliseconds and peak traced memory in bytes
+    """
+    fn()
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    # Separate pass: tracing slows allocation-heavy code and would skew the timings
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {**latency_stats(latencies), 'peak_memory_bytes': peak}
+
+
+def latency_stats(latencies: List[float]) -> Dict[str, Any]:
+    """min/median/p95/mean of latencies in milliseconds"""
+    latencies = sorted(latencies)
+    return {
+        'latency_ms': {
+            'min': latencies[0],
+            'median': statistics.median(latencies),
+            'p95': latencies[min(int(round(0.95 * (len(latencies) - 1))), len(latencies) - 1)],
+            'mean': statistics.fmean(latencies),
+        },
+    }
+
+
+def train_reference_model(hours: float) -> FlatIsolationForest:
+    """Model the stub predictor and local scoring use, trained on node 0"""
+    from sklearn.ensemble import IsolationForest
+
+    end = time.time()
+    timestamps = np.arange(end - hours * 3600, end, STEP_SECONDS)
+    _, features = compute_features(timestamps, synthetic_cpu(0, timestamps))
+    model = IsolationForest(contamination=0.05, random_state=42, n_estimators=100).fit(features)
+    return FlatIsolationForest.from_sklearn(model)
+
+
+def tool_benchmarks(prometheus: SyntheticPrometheus, kserve: StubKServe, hours: int, nodes: int, repeat: int):
+    """(stage, rows, stats) for the MCP tool hot paths"""
+    import kagent_model_tool
+
+    # No range cache: every call goes to Prometheus, as on a cold window
+    tool = kagent_model_tool.AnomalyDetectionTool(
+        prometheus_url=prometheus.url,
+        inference_service_url=kserve.url,
+        cache_max_bytes=0,
+        max_payload_bytes=64 * 1024 * 1024
+    )
+    query = DEFAULT_METRIC_SPEC.queries(instance_matchers(instance=instance_name(0)))[0]
+
+    df = tool.query_prometheus(query, hours=hours, step=STEP)
+    features_df = tool.engineer_features(df)
+    timestamps = features_df['timestamp'].to_numpy(dtype='datetime64[ns]').astype(np.int64) / 1e9
+    feature_matrix = features_df[DEFAULT_METRIC_SPEC.feature_columns].to_numpy()
+    feature_rows = feature_matrix.tolist()
+    scores = tool.score_values(feature_matrix)
+    rows = len(feature_matrix)
+
+    stages = [
+        ('tool.query_prometheus', lambda: tool.query_prometheus(query, hours=hours, step=STEP)),
+        ('tool.engineer_features', lambda: tool.engineer_features(df)),
+        ('tool.predict', lambda: tool.predict(feature_rows)),
+        ('tool.predict_values', lambda: tool.predict_values(feature_matrix)),
+        ('tool.summarize_predictions', lambda: tool.summarize_predictions(timestamps, feature_matrix, scores, STEP)),
+        ('tool.predict_from_prometheus', lambda: tool.predict_from_prometheus(query, hours=hours, step=STEP, incremental=False)),
+    ]
+    for stage, fn in stages:
+        yield stage, rows, measure(fn, repeat)
+
+    if nodes > 1:
+        loop = asyncio.new_event_loop()
+        try:
+            fleet = lambda: loop.run_until_complete(tool.apredict_fleet(hours=hours, step=STEP))  # noqa: E731
+            yield 'tool.apredict_fleet', rows * nodes, measure(fleet, repeat)
+            loop.run_until_complete(tool.aclose())
+        finally:
+            loop.close()
+
+
+# Runs in a fresh interpreter: argv is (instance, "cold" | "warm"), prints timings in seconds
+STARTUP_PROBE = """
+import asyncio, json, resource, sys, time
+started = time.perf_counter()
+import kagent_model_tool as k
+timings = {'import': time.perf_counter() - started}
+predict = getattr(k.predict_anomalies, 'fn', k.predict_anomalies)
+
+async def main():
+    if sys.argv[2] == 'warm':
+        started = time.perf_counter()
+        await k.tool.warm_up()
+        timings['warm_up'] = time.perf_counter() - started
+    for call in ('first_call', 'repeat_call'):
+        started = time.perf_counter()
+        await predict(instance_ip=sys.argv[1], hours=1)
+        timings[call] = time.perf_counter() - started
+    await k.tool.aclose()
+
+asyncio.run(main())
+timings['max_rss_bytes'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+print(json.dumps(timings))
+"""
+
+
+def startup_benchmarks(repeat: int):
+    """(stage, rows, stats) for the MCP tool's cold start, from fresh interpreters"""
+    env = {
+        **os.environ,
+        'PYTHONPATH': os.pathsep.join(sys.path[:2] + [os.environ.get('PYTHONPATH', '')]),
+        'RESULT_DIR': tempfile.mkdtemp(prefix='benchmark-results-'),
+    }
+    samples: Dict[str, List[float]] = {}
+    max_rss = 0
+    for mode in ('cold', 'warm'):
+        for _ in range(repeat):
+            output = subprocess.run(
+                [sys.executable, '-c', STARTUP_PROBE, instance_name(0), mode],
+                env=env, capture_output=True, text=True, check=True
+            ).stdout
+            timings = json.loads(output.strip().splitlines()[-1])
+            max_rss = max(max_rss, timings.pop('max_rss_bytes'))
+            for name, seconds in timings.items():
+                stage = name if name in ('import', 'warm_up') else f"{name}_{mode}"
+                samples.setdefault(stage, []).append(seconds * 1000)
+    for stage, latencies in samples.items():
+        yield f"tool.startup.{stage}", 0, {**latency_stats(latencies), 'peak_memory_bytes': max_rss}
+
+
+def pipeline_benchmarks(prometheus: SyntheticPrometheus, hours: int, repeat: int, sweep: bool):
+    """(stage, rows, stats) for the pipeline components, called through python_func"""
+    try:
+        import pipeline
+    except ImportError as e:
+        print(f"Warning: skipping pipeline benchmarks, kfp is not importable: {e}")
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        raw = Artifact(os.path.join(tmp, "raw.parquet"))
+        features = Artifact(os.path.join(tmp, "features.parquet"))
+        fetch = lambda: pipeline.fetch_data_component.python_func(  # noqa: E731
+            prometheus_url=prometheus.url,
+            training_hours=hours,
+            instance_ip=instance_name(0),
+            output_data=raw
+        )
+        engineer = lambda: pipeline.engineer_features_component.python_func(  # noqa: E731
+            input_data=raw,
+            output_features=features
+        )
+        fetch()
+        engineer()
+        rows = features.metadata['num_rows']
+
+        def train():
+            pipeline.train_model_component.python_func(
+                input_features=features,
+                output_model=Artifact(tempfile.mkdtemp(dir=tmp)),
+                output_metrics=Artifact(os.path.join(tmp, "metrics.json"))
+            )
+
+        def update_store():
+            # A fresh store each time, so every iteration backfills the same window
+            pipeline.update_feature_store_component.python_func(
+                prometheus_url=prometheus.url,
+                instance_ip=instance_name(0),
+                feature_store_uri=tempfile.mkdtemp(dir=tmp),
+                output_features=Artifact(os.path.join(tmp, "sample.parquet")),
+                initial_hours=hours
+            )
+
+        stages = [
+            ('pipeline.fetch_data', fetch),
+            ('pipeline.engineer_features', engineer),
+            ('pipeline.train_model', train),
+            ('pipeline.update_feature_store', update_store),
+        ]
+        if sweep:
+            def sweep_models():
+                pipeline.sweep_model_component.python_func(
+                    input_features=features,
+                    output_model=Artifact(tempfile.mkdtemp(dir=tmp)),
+                    output_metrics=Artifact(os.path.join(tmp, "sweep.json"))
+                )
+            stages.append(('pipeline.sweep_model', sweep_models))
+
+        for stage, fn in stages:
+            yield stage, rows, measure(fn, repeat)
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'describe', '--always', '--dirty'],
+            cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]], threshold: float) -> List[str]:
+    """Regressions of median latency or peak memory beyond threshold, as messages"""
+    previous = {(r['stage'], r['hours'], r['nodes']): r for r in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get((result['stage'], result['hours'], result['nodes']))
+        if before is None:
+            continue
+        for label, now, then in (
+            ('median latency', result['latency_ms']['median'], before['latency_ms']['median']),
+            ('peak memory', result['peak_memory_bytes'], before['peak_memory_bytes']),
+        ):
+            if then > 0 and now > then * (1 + threshold):
+                regressions.append(
+                    f"{result['stage']} (hours={result['hours']}, nodes={result['nodes']}): "
+                    f"{label} {then:.4g} -> {now:.4g} (+{(now / then - 1) * 100:.0f}%)"
+                )
+    return regressions
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(',') if item]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--hours', type=_int_list, default=[1, 24], help="series lengths in hours, comma-separated")
+    parser.add_argument('--nodes', type=_int_list, default=[1, 20], help="node counts, comma-separated")
+    parser.add_argument('--anomaly-rate', type=float, default=0.02, help="share of 2-minute windows with a spike")
+    parser.add_argument('--repeat', type=int, default=5, help="timed iterations per stage")
+    parser.add_argument('--suite', choices=['all', 'tool', 'pipeline'], default='all')
+    parser.add_argument('--sweep', action='store_true', help="also benchmark the hyperparameter sweep component")
+    parser.add_argument('--output', default='benchmark-results.json')
+    parser.add_argument('--baseline', help="earlier results file to check for regressions")
+    parser.add_argument('--threshold', type=float, default=0.2, help="allowed relative regression")
+    args = parser.parse_args()
+
+    model = train_reference_model(hours=2)
+    results = []
+    with StubKServe(model) as kserve:
+        for nodes in args.nodes:
+            with SyntheticPrometheus(nodes, args.anomaly_rate) as prometheus:
+                os.environ['PROMETHEUS_URL'] = prometheus.url
+                os.environ['INFERENCE_SERVICE_URL'] = kserve.url
+                for hours in args.hours:
+                    runs = []
+                    if args.suite in ('all', 'tool'):
+                        runs.append(tool_benchmarks(prometheus, kserve, hours, nodes, args.repeat))
+                        # Start-up cost does not depend on the series length or node count
+                        if nodes == args.nodes[0] and hours == args.hours[0]:
+                            runs.append(startup_benchmarks(args.repeat))
+                    # Components fetch one instance, so they do not depend on the node count
+                    if args.suite in ('all', 'pipeline') and nodes == args.nodes[0]:
+                        runs.append(pipeline_benchmarks(prometheus, hours, args.repeat, args.sweep))
+                    for run in runs:
+                        for stage, rows, stats in run:
+                            median_seconds = stats['latency_ms']['median'] / 1000
+                            result = {
+                                'stage': stage,
+                                'hours': hours,
+                                'nodes': nodes,
+                                'rows': rows,
+                                **stats,
+                                'throughput_rows_per_s': rows / median_seconds if median_seconds > 0 else None,
+                            }
+                            results.append(result)
+                            print(f"{stage:32s} hours={hours:<4d} nodes={nodes:<4d} rows={rows:<8d} "
+                                  f"median={stats['latency_ms']['median']:9.2f}ms "
+                                  f"peak={stats['peak_memory_bytes'] / 2**20:8.2f}MiB")
+
+    report = {
+        'revision': git_revision(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'config': {
+            'hours': args.hours,
+            'nodes': args.nodes,
+            'anomaly_rate': args.anomaly_rate,
+            'repeat': args.repeat,
+            'step': STEP,
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"✓ Wrote {len(results)} results to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f)['results'], args.threshold)
+        for message in regressions:
+            print(f"Regression: {message}")
+        if regressions:
+            return 1
+        print(f"✓ No regressions beyond {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
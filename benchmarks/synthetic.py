@@ -0,0 +1,212 @@
+# benchmarks/synthetic.py
+"""
+Synthetic node metrics and local stand-ins for Prometheus and KServe
+
+Values are a pure function of (node, timestamp), so the Prometheus stand-in
+can answer any range query for any number of nodes without storing series,
+and every run sees the same data. Each node has a daily-ish sine baseline,
+deterministic noise, and injected anomalies: spikes lasting one anomaly
+window, placed in a pseudo-random anomaly_rate share of the windows.
+
+Both servers are plain ThreadingHTTPServer instances on 127.0.0.1 with
+HTTP/1.1 keep-alive, so client connection pooling behaves as in the cluster.
+"""
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from anomaly_core import FlatIsolationForest, parse_duration
+from anomaly_core.inference import INFERENCE_HEADER, LABEL_OUTPUT, SCORE_OUTPUT
+
+ANOMALY_WINDOW_SECONDS = 120.0
+
+_INSTANCE_RE = re.compile(r'instance="([^"]+)"')
+
+
+def instance_name(node: int) -> str:
+    """Instance label of synthetic node number node"""
+    return f"10.0.{node // 256}.{node % 256}:9100"
+
+
+def _unit_noise(node: int, x: np.ndarray) -> np.ndarray:
+    """Deterministic pseudo-random values in [0, 1) per (node, x)"""
+    return np.modf(np.abs(np.sin(x * 12.9898 + (node + 1) * 78.233)) * 43758.5453)[0]
+
+
+def synthetic_cpu(node: int, timestamps: np.ndarray, anomaly_rate: float = 0.02) -> np.ndarray:
+    """
+    CPU usage percentage of one synthetic node
+
+    Args:
+        node: Node number (changes phase, level and anomaly placement)
+        timestamps: float64 epoch seconds
+        anomaly_rate: Share of ANOMALY_WINDOW_SECONDS windows that contain a spike
+
+    Returns:
+        float64 values in [0, 100]
+    """
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    baseline = 40 + 5 * (node % 7) + 20 * np.sin(2 * np.pi * timestamps / 86400 + node)
+    noise = 4 * (_unit_noise(node, timestamps / 10) - 0.5)
+    windows = np.floor(timestamps / ANOMALY_WINDOW_SECONDS)
+    spikes = np.where(_unit_noise(node + 1000, windows) < anomaly_rate, 35.0, 0.0)
+    return np.clip(baseline + noise + spikes, 0, 100)
+
+
+class SyntheticPrometheus:
+    """Answers /api/v1/query_range with synthetic CPU series for n_nodes nodes"""
+
+    def __init__(self, n_nodes: int = 1, anomaly_rate: float = 0.02):
+        self.n_nodes = n_nodes
+        self.anomaly_rate = anomaly_rate
+        self.requests = 0
+        self._server = _serve(self._handle)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "SyntheticPrometheus":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _handle(self, handler: BaseHTTPRequestHandler, body: bytes):
+        parsed = urlparse(handler.path)
+        if parsed.path.endswith('/api/v1/query'):
+            # Instant queries only serve connectivity checks, e.g. the tool's warm-up
+            payload = {'status': 'success', 'data': {'resultType': 'vector', 'result': []}}
+            return 200, {'Content-Type': 'application/json'}, json.dumps(payload).encode()
+        if not parsed.path.endswith('/api/v1/query_range'):
+            return 404, {'Content-Type': 'application/json'}, b'{"status": "error"}'
+        self.requests += 1
+        params = parse_qs(parsed.query or body.decode())
+        query = params['query'][0]
+        start, end = float(params['start'][0]), float(params['end'][0])
+        step = parse_duration(params['step'][0])
+        timestamps = np.arange(np.ceil(start / step) * step, end + step / 2, step)
+
+        result = []
+        for node, labels in self._select(query):
+            values = synthetic_cpu(node, timestamps, self.anomaly_rate)
+            result.append({
+                'metric': labels,
+                'values': [[t, repr(v)] for t, v in zip(timestamps.tolist(), values.tolist())],
+            })
+        payload = {'status': 'success', 'data': {'resultType': 'matrix', 'result': result}}
+        return 200, {'Content-Type': 'application/json'}, json.dumps(payload).encode()
+
+    def _select(self, query: str):
+        """(node, labels) per series the query returns"""
+        match = _INSTANCE_RE.search(query)
+        if match:
+            for node in range(self.n_nodes):
+                if instance_name(node) == match.group(1):
+                    return [(node, {})]
+            return []
+        if 'by (instance)' in query:
+            return [(node, {'instance': instance_name(node)}) for node in range(self.n_nodes)]
+        # Fleet-wide aggregate without grouping
+        return [(0, {})]
+
+
+class StubKServe:
+    """KServe v2 predictor scoring with a FlatIsolationForest, JSON and binary encodings
+
+    Like the flat-forest predictor it returns the labels and the anomaly-score
+    output; with scores=False it answers like the sklearn runtime (labels only).
+    """
+
+    def __init__(self, model: FlatIsolationForest, model_names: Optional[List[str]] = None, scores: bool = True):
+        self.model = model
+        self.model_names = model_names or []
+        self.scores = scores
+        self.requests = 0
+        self._server = _serve(self._handle)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "StubKServe":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _handle(self, handler: BaseHTTPRequestHandler, body: bytes):
+        path = urlparse(handler.path).path
+        if path == '/v1/models':
+            return 200, {'Content-Type': 'application/json'}, json.dumps({'models': self.model_names}).encode()
+        if not path.endswith('/infer'):
+            return 404, {'Content-Type': 'application/json'}, b'{"error": "not found"}'
+        self.requests += 1
+
+        header_length = handler.headers.get(INFERENCE_HEADER)
+        if header_length is None:
+            request = json.loads(body)
+            tensor = request['inputs'][0]
+            features = np.asarray(tensor['data'], dtype=np.float64).reshape(tensor['shape'])
+        else:
+            request = json.loads(body[:int(header_length)])
+            tensor = request['inputs'][0]
+            features = np.frombuffer(body[int(header_length):], dtype='<f8').reshape(tensor['shape'])
+
+        scores = self.model.decision_function(features).astype('<f8')
+        tensors = [(LABEL_OUTPUT, 'INT64', np.where(scores < 0, -1, 1).astype('<i8'))]
+        if self.scores:
+            tensors.append((SCORE_OUTPUT, 'FP64', scores))
+        outputs = [{'name': name, 'shape': [len(data)], 'datatype': datatype} for name, datatype, data in tensors]
+        if (request.get('parameters') or {}).get('binary_data_output'):
+            for output, (_, _, data) in zip(outputs, tensors):
+                output['parameters'] = {'binary_data_size': data.nbytes}
+            header = json.dumps({'model_name': 'stub', 'outputs': outputs}).encode()
+            return 200, {'Content-Type': 'application/octet-stream', INFERENCE_HEADER: str(len(header))}, \
+                header + b''.join(data.tobytes() for _, _, data in tensors)
+        for output, (_, _, data) in zip(outputs, tensors):
+            output['data'] = data.tolist()
+        return 200, {'Content-Type': 'application/json'}, json.dumps({'model_name': 'stub', 'outputs': outputs}).encode()
+
+
+def _serve(handle) -> ThreadingHTTPServer:
+    """Start a keep-alive HTTP server on an ephemeral port that routes every request to handle"""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # Headers and body go out in separate writes; with Nagle on, each response waits for a delayed ACK
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args) -> None:
+            pass
+
+        def _respond(self) -> None:
+            length = int(self.headers.get('Content-Length') or 0)
+            status, headers, payload = handle(self, self.rfile.read(length) if length else b'')
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        do_GET = _respond
+        do_POST = _respond
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,122 @@
+# ml-model/pipelines/anomaly_core/__init__.py
+"""
+Shared anomaly detection core used by the Kubeflow pipeline components and the
+anomaly detection MCP tool, so training and serving compute features identically.
+"""
+from .backfill import backfill_tasks, run_backfill
+from .coalescing import MicroBatcher, SingleFlight
+from .datasets import DatasetWriter, dataset_metadata, iter_dataset, read_dataset, write_dataset
+from .downsample import lttb_indices, minmax_indices
+from .feature_store import DecayedSample, FeatureStore, sample_keys
+from .features import (
+    FEATURE_COLUMNS,
+    ROLLING_WINDOW,
+    compute_features,
+    compute_features_batch,
+    feature_matrix,
+    format_timestamps,
+    hour_of_day,
+    rate_of_change,
+    rolling_mean_std,
+    samples_to_arrays,
+    segment_starts,
+)
+from .forest import FLAT_MODEL_FILENAME, FlatIsolationForest
+from .inference import (
+    LABEL_OUTPUT,
+    SCORE_OUTPUT,
+    anomaly_scores,
+    decode_infer_outputs,
+    decode_infer_response,
+    encode_infer_request,
+)
+from .metrics import DEFAULT_METRIC_SPEC, NODE_METRIC_SPEC, MetricSpec, align_series, load_metric_spec
+from .model_store import ModelStore
+from .prometheus import (
+    MAX_POINTS_PER_QUERY,
+    cpu_usage_query,
+    fetch_range_sharded,
+    instance_matchers,
+    parse_duration,
+    shard_range,
+)
+from .pushdown import align_window, pushdown_features, pushdown_queries, validate_pushdown
+from .range_cache import RangeCache
+from .registry import MODEL_INDEX_FILENAME, ModelRouter, model_name_for, read_model_index, write_model_index
+from .results import ResultStore
+from .segments import anomaly_periods, anomaly_runs, run_max, run_mean, run_min
+from .streaming import RingBuffer, RollingFeatureState
+from .telemetry import Telemetry, configure_tracing
+from .training import load_training_sample, run_sweep, save_model, sweep_grid
+
+__all__ = [
+    'DEFAULT_METRIC_SPEC',
+    'FEATURE_COLUMNS',
+    'FLAT_MODEL_FILENAME',
+    'LABEL_OUTPUT',
+    'MAX_POINTS_PER_QUERY',
+    'MODEL_INDEX_FILENAME',
+    'NODE_METRIC_SPEC',
+    'ROLLING_WINDOW',
+    'SCORE_OUTPUT',
+    'align_series',
+    'align_window',
+    'anomaly_periods',
+    'anomaly_runs',
+    'anomaly_scores',
+    'backfill_tasks',
+    'compute_features',
+    'compute_features_batch',
+    'configure_tracing',
+    'cpu_usage_query',
+    'dataset_metadata',
+    'decode_infer_outputs',
+    'decode_infer_response',
+    'encode_infer_request',
+    'feature_matrix',
+    'fetch_range_sharded',
+    'format_timestamps',
+    'hour_of_day',
+    'instance_matchers',
+    'iter_dataset',
+    'load_metric_spec',
+    'load_training_sample',
+    'lttb_indices',
+    'minmax_indices',
+    'model_name_for',
+    'parse_duration',
+    'pushdown_features',
+    'pushdown_queries',
+    'rate_of_change',
+    'read_dataset',
+    'read_model_index',
+    'rolling_mean_std',
+    'run_backfill',
+    'run_max',
+    'run_mean',
+    'run_min',
+    'run_sweep',
+    'sample_keys',
+    'samples_to_arrays',
+    'save_model',
+    'segment_starts',
+    'shard_range',
+    'sweep_grid',
+    'validate_pushdown',
+    'write_dataset',
+    'write_model_index',
+    'DatasetWriter',
+    'DecayedSample',
+    'FeatureStore',
+    'FlatIsolationForest',
+    'MetricSpec',
+    'MicroBatcher',
+    'ModelRouter',
+    'ModelStore',
+    'RangeCache',
+    'ResultStore',
+    'RingBuffer',
+    'RollingFeatureState',
+    'SingleFlight',
+    'Telemetry',
+]
@@ -0,0 +1,448 @@
+# ml-model/pipelines/anomaly_core/backfill.py
+"""
+Historical backfill: score months of history and store the anomaly periods
+
+The range is cut into one task per (instance, window), windows being aligned
+to multiples of window_hours since the epoch so task ids are stable across
+runs. Tasks run in a process pool. Each one streams its Prometheus shards
+(fetch_range_sharded) through the same rolling feature state and scoring the
+MCP tool's incremental path uses, then segments the scores into anomaly
+periods and writes them as one Parquet file:
+
+    <uri>/instance=<url-quoted instance>/date=<YYYY-MM-DD>/periods-<window start ms>.parquet
+    <uri>/_checkpoint.json        parameters and the tasks already done
+
+Period files are datasets (see datasets.py) with the period start as the
+timestamp and end_time, duration_seconds, samples, peak_score, mean_score and
+the peak of the spec's primary column as values, so the tree reads back as a
+hive-partitioned Parquet dataset. Windows without anomalies write no file.
+
+Each task covers the half-open range [start, end), so a sample on a window
+boundary is scored once, by the later window. It fetches window - 1 extra
+samples before its window, so rolling features and scores do not depend on
+how the range was cut; anomaly periods that cross a window boundary are
+split there. The checkpoint is saved every
+checkpoint_every tasks and at the end; an interrupted run started again with
+the same output uri skips the windows it finished, and a window that was
+written but not checkpointed is simply written again.
+
+Scoring is local with the deployed model artifact (per-instance packages are
+routed by instance), or remote over a KServe v2 endpoint.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence
+from urllib.parse import quote
+
+import numpy as np
+
+from .datasets import write_dataset
+from .feature_store import FeatureStore
+from .inference import anomaly_scores, decode_infer_outputs, encode_infer_request
+from .metrics import MetricSpec, align_series, load_metric_spec
+from .model_store import ModelStore
+from .prometheus import MAX_POINTS_PER_QUERY, fetch_range_sharded, instance_matchers, parse_duration
+from .registry import model_name_for
+from .segments import anomaly_periods, run_max, run_mean, run_min
+from .streaming import RollingFeatureState
+
+CHECKPOINT_FILENAME = "_checkpoint.json"
+CHECKPOINT_VERSION = 1
+
+
+def backfill_tasks(
+    instances: Sequence[str],
+    start: float,
+    end: float,
+    window_hours: float = 24.0
+) -> List[Dict[str, Any]]:
+    """
+    One task per instance and window, windows aligned to multiples of window_hours
+
+    Args:
+        instances: Instance labels to score
+        start: Range start, epoch seconds
+        end: Range end (exclusive), epoch seconds
+        window_hours: Window length; the first and last windows are clipped to the range
+
+    Returns:
+        Tasks with 'id', 'instance', 'window' (aligned window start), and the half-open
+        range 'start' to 'end' they score, instance-major
+    """
+    if window_hours <= 0:
+        raise ValueError(f"window_hours must be positive, got {window_hours}")
+    window_seconds = window_hours * 3600
+    tasks = []
+    for instance in instances:
+        window_start = np.floor(start / window_seconds) * window_seconds
+        while window_start < end:
+            tasks.append({
+                'id': f"{instance}@{int(window_start)}",
+                'instance': instance,
+                'window': float(window_start),
+                'start': max(float(window_start), start),
+                'end': min(float(window_start + window_seconds), end),
+            })
+            window_start += window_seconds
+    return tasks
+
+
+def partition_name(instance: str, window_start: float) -> str:
+    """Object name of a window's period file, relative to the output uri"""
+    date = datetime.fromtimestamp(window_start, tz=timezone.utc).strftime('%Y-%m-%d')
+    return f"instance={quote(instance, safe='')}/date={date}/periods-{int(window_start * 1000)}.parquet"
+
+
+# Set once per worker process by _init_backfill_worker
+_worker: Dict[str, Any] = {}
+
+
+def _init_backfill_worker(config: Dict[str, Any]) -> None:
+    _worker['config'] = config
+    _worker['spec'] = MetricSpec.from_dict(config['metric_spec'])
+    _worker['store'] = FeatureStore(config['output_uri'], s3_endpoint=config['s3_endpoint'])
+    _worker['model_store'] = None
+    if config['model_uri']:
+        # The parent already downloaded the artifact, so this only reads the local cache
+        model_store = ModelStore(
+            cache_dir=config['cache_dir'], storage_uri=config['model_uri'], s3_endpoint=config['s3_endpoint']
+        )
+        model_store.refresh()
+        _worker['model_store'] = model_store
+    else:
+        import requests
+        _worker['session'] = requests.Session()
+
+
+def _score(features: np.ndarray, instance: str) -> np.ndarray:
+    """Anomaly scores of one chunk, with the instance's own model when the package has one"""
+    config = _worker['config']
+    model_store = _worker['model_store']
+    if model_store is not None:
+        model = model_store.models.get(model_name_for(instance)) or model_store.model
+        if hasattr(model, "decision_function"):
+            return np.asarray(model.decision_function(features), dtype=np.float64)
+        return np.asarray(model.predict(features), dtype=np.float64)
+
+    body, headers = encode_infer_request(features, binary=True)
+    response = _worker['session'].post(
+        f"{config['inference_url']}/v2/models/{config['model_name']}/infer",
+        data=body,
+        headers=headers,
+        timeout=config['timeout']
+    )
+    response.raise_for_status()
+    return anomaly_scores(decode_infer_outputs(response.content, response.headers))
+
+
+def score_window(task: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Fetch, featurize and score one (instance, window) task and store its anomaly periods
+
+    Runs in a backfill worker process.
+
+    Returns:
+        The task plus 'rows', 'anomalies', 'periods' and 'partition' (None without anomalies)
+    """
+    config, spec, store = _worker['config'], _worker['spec'], _worker['store']
+    step_seconds = parse_duration(config['step'])
+    queries = spec.queries(instance_matchers(instance=task['instance']))
+
+    # Warm-up samples before the window, so its first rows have full rolling windows
+    fetch_start = task['start'] - (spec.window - 1) * step_seconds
+    shard_streams = [
+        fetch_range_sharded(
+            config['prometheus_url'],
+            query,
+            fetch_start,
+            task['end'],
+            step=config['step'],
+            max_points=config['max_points'],
+            max_workers=config['shard_workers'],
+            timeout=config['timeout']
+        )
+        for query in queries
+    ]
+    state = RollingFeatureState(spec.window, spec.feature_matrix)
+    timestamp_parts, score_parts, value_parts = [], [], []
+    for shard in zip(*shard_streams):
+        aligned = align_series(shard)
+        if not aligned:
+            continue
+        timestamps, features = state.update(aligned[0][1], aligned[0][2])
+        keep = (timestamps >= task['start']) & (timestamps < task['end'])
+        if not keep.any():
+            continue
+        timestamps, features = timestamps[keep], features[keep]
+        timestamp_parts.append(timestamps)
+        score_parts.append(_score(features, task['instance']))
+        value_parts.append(features[:, spec.primary_column])
+
+    result = {**task, 'rows': 0, 'anomalies': 0, 'periods': 0, 'partition': None}
+    if not timestamp_parts:
+        return result
+
+    timestamps = np.concatenate(timestamp_parts)
+    scores = np.concatenate(score_parts)
+    values = np.concatenate(value_parts)
+    anomalous = scores < config['threshold']
+    starts, ends, durations = anomaly_periods(
+        timestamps,
+        anomalous,
+        step_seconds,
+        max_gap_seconds=config['merge_gap_seconds'],
+        min_duration_seconds=config['min_period_seconds']
+    )
+    result.update(rows=len(timestamps), anomalies=int(np.count_nonzero(anomalous)), periods=len(starts))
+    if len(starts) == 0:
+        return result
+
+    name = partition_name(task['instance'], task['window'])
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "periods.parquet")
+        write_dataset(path, timestamps[starts], {
+            'end_time': timestamps[ends],
+            'duration_seconds': durations,
+            'samples': (ends - starts + 1).astype(np.float64),
+            'peak_score': run_min(scores, starts, ends),
+            'mean_score': run_mean(scores, starts, ends),
+            f"peak_{spec.feature_columns[spec.primary_column]}": run_max(values, starts, ends),
+        })
+        store.upload(path, name)
+    result['partition'] = name
+    return result
+
+
+def run_backfill(
+    prometheus_url: str,
+    output_uri: str,
+    instances: Sequence[str],
+    start: float,
+    end: float,
+    step: str = "10s",
+    window_hours: float = 24.0,
+    metric_spec: Optional[MetricSpec] = None,
+    model_uri: str = "",
+    inference_service_name: str = "",
+    namespace: str = "default",
+    inference_url: str = "",
+    model_name: str = "",
+    threshold: float = 0.0,
+    merge_gap_seconds: float = 0.0,
+    min_period_seconds: float = 0.0,
+    s3_endpoint: str = "",
+    max_workers: Optional[int] = None,
+    shard_workers: int = 2,
+    max_points: int = MAX_POINTS_PER_QUERY,
+    timeout: float = 60.0,
+    checkpoint_every: int = 20,
+    cache_dir: str = "/tmp/anomaly-model-cache"
+) -> Dict[str, Any]:
+    """
+    Score [start, end) for every instance in a process pool, resuming from the checkpoint
+
+    The model is the artifact at model_uri, else the storageUri of
+    inference_service_name, scored in the workers; with neither, rows are sent to
+    the KServe v2 endpoint inference_url/v2/models/model_name.
+
+    Args:
+        prometheus_url: Prometheus base URL
+        output_uri: s3://bucket/prefix or a local directory for periods and checkpoint
+        instances: Instance labels to score
+        start: Range start, epoch seconds
+        end: Range end (exclusive), epoch seconds
+        step: Query resolution step
+        window_hours: Time span of one task (and at most one period file)
+        metric_spec: Spec the model was trained with (default: CPU only)
+        model_uri: Artifact URI (s3://.../output_model) of the model to score with
+        inference_service_name: InferenceService whose deployed model to score with
+        namespace: Namespace of the InferenceService
+        inference_url: KServe base URL for remote scoring
+        model_name: Served model name for remote scoring
+        threshold: Rows scoring below this are anomalous
+        merge_gap_seconds: Merge periods separated by at most this much normal or missing data
+        min_period_seconds: Drop periods shorter than this
+        s3_endpoint: S3 endpoint URL, e.g. http://minio-service.kubeflow:9000
+        max_workers: Worker processes; None uses every CPU
+        shard_workers: Prometheus shards fetched concurrently per worker
+        max_points: Most evaluation points per Prometheus shard
+        timeout: Per-request timeout for Prometheus and KServe, seconds
+        checkpoint_every: Save the checkpoint after this many finished tasks
+        cache_dir: Local cache of the model artifact
+
+    Returns:
+        Run summary: task counts, rows, anomalies and periods
+    """
+    spec = metric_spec or load_metric_spec()
+    if end <= start:
+        raise ValueError(f"end must be after start, got {start} and {end}")
+
+    if model_uri or inference_service_name:
+        model_store = ModelStore(
+            cache_dir=cache_dir,
+            storage_uri=model_uri,
+            inference_service_name=inference_service_name,
+            namespace=namespace,
+            s3_endpoint=s3_endpoint
+        )
+        model_store.refresh()
+        model_uri = model_store.current_uri
+        model = model_uri
+    elif inference_url and model_name:
+        model = f"{inference_url.rstrip('/')}/v2/models/{model_name}"
+    else:
+        raise ValueError("Set model_uri, inference_service_name, or inference_url and model_name")
+
+    params = {
+        'metric_spec': spec.to_dict(),
+        'step': step,
+        'window_hours': window_hours,
+        'threshold': threshold,
+        'merge_gap_seconds': merge_gap_seconds,
+        'min_period_seconds': min_period_seconds,
+        'model': model,
+    }
+    store = FeatureStore(output_uri, s3_endpoint=s3_endpoint)
+    data = store.get_bytes(CHECKPOINT_FILENAME)
+    checkpoint = json.loads(data) if data is not None else {
+        'version': CHECKPOINT_VERSION, 'params': params, 'completed': {}
+    }
+    if checkpoint['params'] != params:
+        raise ValueError(
+            f"Backfill at {output_uri} was started with {checkpoint['params']}, this run uses {params}; "
+            f"use a new output_uri for new parameters"
+        )
+
+    tasks = backfill_tasks(instances, start, end, window_hours)
+    completed = checkpoint['completed']
+    # A clipped window that now extends further (e.g. a later end) is scored again
+    pending = [
+        task for task in tasks
+        if (completed.get(task['id']) or {}).get('end') != task['end']
+        or completed[task['id']]['start'] != task['start']
+    ]
+    print(f"Backfill: {len(tasks)} windows, {len(tasks) - len(pending)} already done, {len(pending)} to score")
+
+    config = {
+        **params,
+        'prometheus_url': prometheus_url,
+        'output_uri': output_uri,
+        's3_endpoint': s3_endpoint,
+        'model_uri': model_uri,
+        'cache_dir': cache_dir,
+        'inference_url': inference_url.rstrip('/'),
+        'model_name': model_name,
+        'shard_workers': shard_workers,
+        'max_points': max_points,
+        'timeout': timeout,
+    }
+    failures: Dict[str, str] = {}
+    started = time.monotonic()
+    since_checkpoint = 0
+    if pending:
+        workers = min(max_workers or os.cpu_count() or 1, len(pending))
+        with ProcessPoolExecutor(workers, initializer=_init_backfill_worker, initargs=(config,)) as pool:
+            futures = {pool.submit(score_window, task): task for task in pending}
+            for done, future in enumerate(as_completed(futures), 1):
+                task = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    failures[task['id']] = str(e)
+                    print(f"Warning: window {task['id']} failed: {e}")
+                    continue
+                completed[task['id']] = {
+                    key: result[key] for key in ('start', 'end', 'rows', 'anomalies', 'periods', 'partition')
+                }
+                since_checkpoint += 1
+                if since_checkpoint >= checkpoint_every:
+                    store.put_bytes(CHECKPOINT_FILENAME, json.dumps(checkpoint).encode())
+                    since_checkpoint = 0
+                    print(f"  {done}/{len(pending)} windows scored in {time.monotonic() - started:.0f}s")
+        store.put_bytes(CHECKPOINT_FILENAME, json.dumps(checkpoint).encode())
+
+    requested = [completed[task['id']] for task in tasks if task['id'] in completed]
+    summary = {
+        'windows': len(tasks),
+        'resumed': len(tasks) - len(pending),
+        'scored': len(pending) - len(failures),
+        'failed': len(failures),
+        'rows': sum(entry['rows'] for entry in requested),
+        'anomalies': sum(entry['anomalies'] for entry in requested),
+        'periods': sum(entry['periods'] for entry in requested),
+        'seconds': time.monotonic() - started,
+    }
+    if failures:
+        raise RuntimeError(
+            f"{len(failures)} of {len(tasks)} windows failed (run again to retry them): "
+            f"{dict(list(failures.items())[:5])}"
+        )
+    return summary
+
+
+def parse_time(value: str) -> float:
+    """Epoch seconds from epoch seconds or an ISO 8601 time (UTC unless it has an offset)"""
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Score historical metrics and store the anomaly periods")
+    parser.add_argument('--prometheus-url', required=True)
+    parser.add_argument('--output-uri', required=True, help="s3://bucket/prefix or a local directory")
+    parser.add_argument('--instances', required=True, help="instance labels, comma-separated")
+    parser.add_argument('--start', required=True, help="ISO 8601 time or epoch seconds")
+    parser.add_argument('--end', default="", help="ISO 8601 time or epoch seconds (default: now)")
+    parser.add_argument('--step', default="10s")
+    parser.add_argument('--window-hours', type=float, default=24.0, help="time span of one task")
+    parser.add_argument('--metric-spec', default="", help='"cpu", "node", JSON, or a JSON file path')
+    parser.add_argument('--model-uri', default="", help="s3:// artifact of the model to score with")
+    parser.add_argument('--inference-service', default="", help="score with this InferenceService's model")
+    parser.add_argument('--namespace', default="default")
+    parser.add_argument('--inference-url', default="", help="KServe base URL for remote scoring")
+    parser.add_argument('--model-name', default="", help="served model name for remote scoring")
+    parser.add_argument('--threshold', type=float, default=0.0, help="anomaly score cut-off")
+    parser.add_argument('--merge-gap-seconds', type=float, default=0.0)
+    parser.add_argument('--min-period-seconds', type=float, default=0.0)
+    parser.add_argument('--s3-endpoint', default=os.getenv("S3_ENDPOINT", ""))
+    parser.add_argument('--max-workers', type=int, default=0, help="worker processes (default: every CPU)")
+    parser.add_argument('--shard-workers', type=int, default=2, help="Prometheus shards in flight per worker")
+    args = parser.parse_args()
+
+    summary = run_backfill(
+        args.prometheus_url,
+        args.output_uri,
+        [i.strip() for i in args.instances.split(",") if i.strip()],
+        parse_time(args.start),
+        parse_time(args.end) if args.end else time.time(),
+        step=args.step,
+        window_hours=args.window_hours,
+        metric_spec=load_metric_spec(args.metric_spec),
+        model_uri=args.model_uri,
+        inference_service_name=args.inference_service,
+        namespace=args.namespace,
+        inference_url=args.inference_url,
+        model_name=args.model_name,
+        threshold=args.threshold,
+        merge_gap_seconds=args.merge_gap_seconds,
+        min_period_seconds=args.min_period_seconds,
+        s3_endpoint=args.s3_endpoint,
+        max_workers=args.max_workers or None,
+        shard_workers=args.shard_workers
+    )
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+# ml-model/pipelines/anomaly_core/coalescing.py
+"""
+Request coalescing for bursts of concurrent tool calls
+
+When an alert fires, several agent sessions ask about the same node (or the
+whole fleet) at the same moment. SingleFlight lets identical calls that
+overlap in time share one computation: the first caller runs it, the rest
+wait for its result. Results are shared, not copied, so callers must treat
+them as read-only.
+
+MicroBatcher handles the different-nodes case at the inference step:
+scoring calls for the same model that arrive within a few milliseconds are
+concatenated into one request and the predictions are split back per
+caller, so an alert storm costs one KServe round trip instead of one per
+session.
+"""
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+
+class _Call:
+    """One in-flight synchronous computation"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls with equal keys, in threads or on an event loop"""
+
+    def __init__(self):
+        self.leaders = 0
+        self.followers = 0
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._tasks: Dict[Tuple[int, Hashable], "asyncio.Future[Any]"] = {}
+
+    def run(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        fn(), or the result of the identical call already running in another thread
+
+        Args:
+            key: Identity of the call; equal keys share one execution
+            fn: Computation to run if no call with this key is in flight
+
+        Returns:
+            fn's result (its exception is raised in every waiting caller)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.followers += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def arun(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Async version of run; the computation runs as a task on the current event loop
+
+        A caller that is cancelled stops waiting but does not cancel the
+        computation the other callers share.
+        """
+        # Futures belong to one loop, so calls are only shared within a loop
+        task_key = (id(asyncio.get_running_loop()), key)
+        task = self._tasks.get(task_key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._tasks[task_key] = task
+            task.add_done_callback(lambda done: self._finish(task_key, done))
+            self.leaders += 1
+        else:
+            self.followers += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, task_key: Tuple[int, Hashable], task: "asyncio.Future[Any]") -> None:
+        if self._tasks.get(task_key) is task:
+            del self._tasks[task_key]
+        # Marks the exception retrieved when every waiter was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    @property
+    def shared_ratio(self) -> float:
+        """Share of calls answered by another caller's computation"""
+        calls = self.leaders + self.followers
+        return self.followers / calls if calls else 0.0
+
+
+class _Batch:
+    """Feature matrices collected for one key until the batch is flushed"""
+
+    def __init__(self, future: "asyncio.Future[np.ndarray]"):
+        self.future = future
+        self.parts: List[np.ndarray] = []
+        self.rows = 0
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class MicroBatcher:
+    """Merges concurrent scoring calls for the same key into one scoring call"""
+
+    def __init__(
+        self,
+        score: Callable[[Hashable, np.ndarray], Awaitable[np.ndarray]],
+        window_seconds: float = 0.002,
+        max_rows: int = 65536
+    ):
+        """
+        Args:
+            score: Coroutine function scoring a feature matrix for a key (e.g. a model name),
+                returning one prediction per row
+            window_seconds: How long the first call of a batch waits for others to join
+            max_rows: A batch reaching this many rows is flushed at once
+        """
+        if window_seconds <= 0:
+            raise ValueError(f"window_seconds must be positive, got {window_seconds}")
+        self.window_seconds = window_seconds
+        self.max_rows = max(max_rows, 1)
+        self.calls = 0
+        self.batches = 0
+        self._score = score
+        self._pending: Dict[Tuple[int, Hashable], _Batch] = {}
+        self._tasks: set = set()
+
+    async def submit(self, key: Hashable, features: np.ndarray) -> np.ndarray:
+        """
+        Score features as part of the next batch for key
+
+        Args:
+            key: Batching key; calls are merged only with calls for the same key
+            features: (n, n_features) matrix; every call in a batch must have the same width
+
+        Returns:
+            The n predictions for these rows
+        """
+        loop = asyncio.get_running_loop()
+        batch_key = (id(loop), key)
+        batch = self._pending.get(batch_key)
+        if batch is None:
+            batch = self._pending[batch_key] = _Batch(loop.create_future())
+            batch.timer = loop.call_later(self.window_seconds, self._flush, batch_key, batch)
+
+        offset = batch.rows
+        batch.parts.append(features)
+        batch.rows += len(features)
+        self.calls += 1
+        if batch.rows >= self.max_rows:
+            batch.timer.cancel()
+            self._flush(batch_key, batch)
+
+        predictions = await asyncio.shield(batch.future)
+        return predictions[offset:offset + len(features)]
+
+    def _flush(self, batch_key: Tuple[int, Hashable], batch: _Batch) -> None:
+        if self._pending.get(batch_key) is batch:
+            del self._pending[batch_key]
+        self.batches += 1
+        task = asyncio.ensure_future(self._run(batch_key[1], batch))
+        # The loop only keeps weak references to tasks
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, key: Hashable, batch: _Batch) -> None:
+        features = batch.parts[0] if len(batch.parts) == 1 else np.concatenate(batch.parts)
+        try:
+            predictions = await self._score(key, features)
+            if len(predictions) != batch.rows:
+                raise ValueError(f"Scoring returned {len(predictions)} predictions for {batch.rows} rows")
+        except asyncio.CancelledError:
+            batch.future.cancel()
+            raise
+        except Exception as e:
+            batch.future.set_exception(e)
+            # Marks the exception retrieved when every caller was cancelled
+            batch.future.exception()
+        else:
+            batch.future.set_result(predictions)
+
+    @property
+    def merged_ratio(self) -> float:
+        """Share of calls that rode on a scoring call started for another caller"""
+        return (self.calls - self.batches) / self.calls if self.calls else 0.0
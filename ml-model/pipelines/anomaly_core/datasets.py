@@ -0,0 +1,196 @@
+# ml-model/pipelines/anomaly_core/datasets.py
+"""
+Columnar dataset artifacts passed between pipeline components
+
+Datasets are Parquet files with an int64 epoch-millisecond ``timestamp`` column
+followed by float64 value columns, written whole or streamed in row groups.
+Reading them back needs no text parsing, and the schema, row count and time
+range are stored in the file footer and returned for the KFP artifact metadata.
+Row groups hold at most ROW_GROUP_ROWS rows, so iter_dataset can stream a file
+of any length in bounded memory.
+
+pyarrow is only imported when a dataset is read or written, so importing this
+module does not require it.
+"""
+import json
+from typing import Any, Dict, Iterator, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+TIMESTAMP_COLUMN = "timestamp"
+DATASET_FORMAT = "parquet"
+ROW_GROUP_ROWS = 65536
+
+_METADATA_KEY = b"anomaly_core"
+
+
+class DatasetWriter:
+    """
+    Incremental Parquet writer: each write() appends one row group
+
+    Lets producers stream chunks to the artifact without holding the whole
+    dataset in memory. Use as a context manager; metadata is complete after close.
+    """
+
+    def __init__(self, path: str, columns: Sequence[str], compression: str = "zstd"):
+        """
+        Args:
+            path: Output file (a KFP Dataset artifact path)
+            columns: Value column names, in order
+            compression: Parquet codec
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.path = path
+        self.columns = list(columns)
+        self.num_rows = 0
+        self.start_time: Optional[float] = None
+        self.end_time: Optional[float] = None
+        self._schema = pa.schema(
+            [(TIMESTAMP_COLUMN, pa.int64())] + [(name, pa.float64()) for name in self.columns]
+        )
+        self._writer = pq.ParquetWriter(path, self._schema, compression=compression)
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        """Artifact metadata (format, row count, schema, time range), JSON-serializable"""
+        return {
+            "format": DATASET_FORMAT,
+            "num_rows": self.num_rows,
+            "columns": [TIMESTAMP_COLUMN, *self.columns],
+            "schema": {TIMESTAMP_COLUMN: "int64 (epoch ms)", **{name: "float64" for name in self.columns}},
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+        }
+
+    def write(self, timestamps: np.ndarray, columns: Mapping[str, np.ndarray]) -> None:
+        """
+        Append rows
+
+        Args:
+            timestamps: float64 epoch seconds, stored as int64 epoch milliseconds
+            columns: Value arrays keyed by column name, each the same length as timestamps
+        """
+        import pyarrow as pa
+
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        if len(timestamps) == 0:
+            return
+        arrays = [pa.array(np.round(timestamps * 1000).astype(np.int64))]
+        for name in self.columns:
+            values = np.asarray(columns[name], dtype=np.float64)
+            if len(values) != len(timestamps):
+                raise ValueError(f"Column {name!r} has {len(values)} rows, expected {len(timestamps)}")
+            arrays.append(pa.array(values))
+
+        self._writer.write_table(pa.Table.from_arrays(arrays, schema=self._schema), row_group_size=ROW_GROUP_ROWS)
+        self.num_rows += len(timestamps)
+        if self.start_time is None:
+            self.start_time = float(timestamps[0])
+        self.end_time = float(timestamps[-1])
+
+    def close(self) -> None:
+        if self._writer is None:
+            return
+        self._writer.add_key_value_metadata({_METADATA_KEY: json.dumps(self.metadata).encode()})
+        self._writer.close()
+        self._writer = None
+
+    def __enter__(self) -> "DatasetWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def write_dataset(
+    path: str,
+    timestamps: np.ndarray,
+    columns: Mapping[str, np.ndarray],
+    compression: str = "zstd"
+) -> Dict[str, Any]:
+    """
+    Write a timestamped float64 table as Parquet in one go
+
+    Args:
+        path: Output file (a KFP Dataset artifact path)
+        timestamps: float64 epoch seconds, stored as int64 epoch milliseconds
+        columns: Value columns in order, each the same length as timestamps
+        compression: Parquet codec
+
+    Returns:
+        Artifact metadata (format, row count, schema, time range), JSON-serializable
+    """
+    with DatasetWriter(path, list(columns), compression=compression) as writer:
+        writer.write(timestamps, columns)
+    return writer.metadata
+
+
+def read_dataset(
+    path: str,
+    columns: Optional[Sequence[str]] = None
+) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """
+    Read a dataset written by write_dataset or DatasetWriter
+
+    Args:
+        path: Parquet file
+        columns: Value columns to load; None loads all of them
+
+    Returns:
+        (timestamps as float64 epoch seconds, {column: float64 array})
+    """
+    import pyarrow.parquet as pq
+
+    load = None if columns is None else [TIMESTAMP_COLUMN, *columns]
+    table = pq.read_table(path, columns=load, memory_map=True)
+    timestamps = table.column(TIMESTAMP_COLUMN).to_numpy().astype(np.float64) / 1000.0
+    values = {
+        name: table.column(name).to_numpy().astype(np.float64, copy=False)
+        for name in table.column_names
+        if name != TIMESTAMP_COLUMN
+    }
+    return timestamps, values
+
+
+def iter_dataset(
+    path: str,
+    columns: Optional[Sequence[str]] = None,
+    batch_rows: int = ROW_GROUP_ROWS,
+    dtype: Any = np.float64
+) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Stream a dataset in batches, without loading the whole file
+
+    Args:
+        path: Parquet file
+        columns: Value columns to load, in matrix column order; None loads all of them
+        batch_rows: Most rows per batch
+        dtype: Value matrix dtype, e.g. np.float32 to halve the memory of what is kept
+
+    Yields:
+        (timestamps as float64 epoch seconds, (rows, columns) value matrix), in file order
+    """
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(path, memory_map=True)
+    if columns is None:
+        columns = [name for name in parquet_file.schema_arrow.names if name != TIMESTAMP_COLUMN]
+    columns = list(columns)
+    for batch in parquet_file.iter_batches(batch_size=batch_rows, columns=[TIMESTAMP_COLUMN, *columns]):
+        timestamps = batch.column(0).to_numpy().astype(np.float64) / 1000.0
+        values = np.empty((batch.num_rows, len(columns)), dtype=dtype)
+        for i in range(len(columns)):
+            values[:, i] = batch.column(i + 1).to_numpy()
+        yield timestamps, values
+
+
+def dataset_metadata(path: str) -> Dict[str, Any]:
+    """Metadata stored by DatasetWriter, read from the Parquet footer only"""
+    import pyarrow.parquet as pq
+
+    file_metadata = pq.read_metadata(path).metadata or {}
+    if _METADATA_KEY not in file_metadata:
+        return {}
+    return json.loads(file_metadata[_METADATA_KEY])
@@ -0,0 +1,84 @@
+# ml-model/pipelines/anomaly_core/downsample.py
+"""
+Point-budget downsampling of a time series for compact responses
+
+Both functions return sorted row indices into the original arrays, so any
+per-row column (predictions, timestamps) can be sliced consistently. The first
+and last rows are always kept.
+"""
+import numpy as np
+
+
+def minmax_indices(values: np.ndarray, max_points: int) -> np.ndarray:
+    """
+    Keep the minimum and maximum of each bucket, so spikes survive downsampling
+
+    Args:
+        values: 1-D series
+        max_points: Point budget (at least 4)
+
+    Returns:
+        Sorted int64 row indices, at most max_points of them
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    if n <= max_points:
+        return np.arange(n, dtype=np.int64)
+    if max_points < 4:
+        raise ValueError(f"max_points must be at least 4, got {max_points}")
+
+    # Two points per bucket over the interior rows, plus the first and last row
+    interior = values[1:-1]
+    buckets = (max_points - 2) // 2
+    size = -(-len(interior) // buckets)
+    buckets = -(-len(interior) // size)
+    # Padding and NaNs never win the argmin/argmax
+    padded_low = np.full(buckets * size, np.inf)
+    padded_high = np.full(buckets * size, -np.inf)
+    padded_low[:len(interior)] = np.where(np.isnan(interior), np.inf, interior)
+    padded_high[:len(interior)] = np.where(np.isnan(interior), -np.inf, interior)
+
+    offsets = np.arange(buckets) * size + 1
+    low = padded_low.reshape(buckets, size).argmin(axis=1) + offsets
+    high = padded_high.reshape(buckets, size).argmax(axis=1) + offsets
+    return np.unique(np.concatenate(([0], low, high, [n - 1]))).astype(np.int64)
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: keep the points that best preserve the visual shape
+
+    Args:
+        x: Ascending x coordinates (e.g. epoch seconds)
+        y: Values
+        max_points: Point budget (at least 3)
+
+    Returns:
+        Sorted int64 row indices, exactly min(len, max_points) of them
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if n <= max_points:
+        return np.arange(n, dtype=np.int64)
+    if max_points < 3:
+        raise ValueError(f"max_points must be at least 3, got {max_points}")
+
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    for bucket in range(max_points - 2):
+        lo, hi = edges[bucket], edges[bucket + 1]
+        next_lo, next_hi = hi, edges[bucket + 2] if bucket + 2 < len(edges) else n
+        # Triangle with the previous pick and the average of the next bucket
+        next_x = x[next_lo:next_hi].mean()
+        next_y = y[next_lo:next_hi].mean()
+        areas = np.abs(
+            (x[previous] - next_x) * (y[lo:hi] - y[previous])
+            - (x[previous] - x[lo:hi]) * (next_y - y[previous])
+        )
+        previous = lo + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
@@ -0,0 +1,252 @@
+# ml-model/pipelines/anomaly_core/feature_store.py
+"""
+Rolling feature store for incremental retraining
+
+Each incremental pipeline run fetches only the samples newer than the store's
+watermark, featurizes them, and appends them as one Parquet partition. The
+store also keeps a bounded, time-decayed training sample that is updated in
+place, so training cost stays flat no matter how much history the store holds:
+
+    <uri>/manifest.json              generation, watermark, raw tail, partitions, sample
+    <uri>/part-<generation>.parquet  engineered features appended by one run
+    <uri>/sample-<generation>.parquet training sample, with a _sample_key column
+
+The sample is a weighted reservoir (Efraimidis-Spirakis, Gumbel-top-k form)
+with forward decay: a row's weight is 2 ** (t / half_life), so a sample
+half_life older is half as likely to be kept, and keys never need rescoring
+as time passes. Rows older than the retention window leave both the
+partitions and the sample.
+
+Every run writes the next generation: objects it creates are named after the
+generation, and the manifest, written last, is the only thing that references
+them. A run that fails part way leaves the manifest at its previous watermark
+and sample, so the next run fetches the same range again, offers it to the
+previous sample, and overwrites the failed run's objects, which carry the same
+generation. The superseded sample is deleted only after the manifest is saved.
+Only one run per store may write at a time.
+
+The store lives on S3/MinIO (s3:// URIs) or a local directory. boto3 is only
+imported for s3:// URIs, so importing this module does not require it.
+"""
+import json
+import os
+import shutil
+import tempfile
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlparse
+
+import numpy as np
+
+from .datasets import read_dataset, write_dataset
+
+MANIFEST_FILENAME = "manifest.json"
+SAMPLE_KEY_COLUMN = "_sample_key"
+MANIFEST_VERSION = 2
+
+
+class FeatureStore:
+    """Reads and writes the objects of one feature store"""
+
+    def __init__(self, uri: str, s3_endpoint: str = ""):
+        """
+        Args:
+            uri: s3://bucket/prefix or a local directory
+            s3_endpoint: S3 endpoint URL, e.g. http://minio-service.kubeflow:9000
+        """
+        self.uri = uri.rstrip('/')
+        self.s3_endpoint = s3_endpoint
+        parsed = urlparse(self.uri)
+        self._s3 = parsed.scheme == "s3"
+        self._bucket = parsed.netloc
+        self._prefix = parsed.path.lstrip('/')
+        self._client = None
+
+    def load_manifest(self) -> Optional[Dict[str, Any]]:
+        """Manifest of the store, or None for a new store"""
+        data = self.get_bytes(MANIFEST_FILENAME)
+        return None if data is None else json.loads(data)
+
+    def save_manifest(self, manifest: Dict[str, Any]) -> None:
+        self.put_bytes(MANIFEST_FILENAME, json.dumps(manifest, indent=2).encode())
+
+    def upload(self, local_path: str, name: str) -> None:
+        if self._s3:
+            self._s3_client().upload_file(local_path, self._bucket, self._key(name))
+            return
+        os.makedirs(os.path.dirname(self._local(name)), exist_ok=True)
+        partial_path = f"{self._local(name)}.partial"
+        shutil.copyfile(local_path, partial_path)
+        os.replace(partial_path, self._local(name))
+
+    def download(self, name: str, local_path: str) -> bool:
+        """Copy an object to local_path; False when it does not exist"""
+        if self._s3:
+            from botocore.exceptions import ClientError
+            try:
+                self._s3_client().download_file(self._bucket, self._key(name), local_path)
+            except ClientError as e:
+                if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey'):
+                    return False
+                raise
+            return True
+        if not os.path.exists(self._local(name)):
+            return False
+        shutil.copyfile(self._local(name), local_path)
+        return True
+
+    def delete(self, name: str) -> None:
+        if self._s3:
+            self._s3_client().delete_object(Bucket=self._bucket, Key=self._key(name))
+        elif os.path.exists(self._local(name)):
+            os.remove(self._local(name))
+
+    def get_bytes(self, name: str) -> Optional[bytes]:
+        """Contents of an object, or None when it does not exist"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, os.path.basename(name))
+            if not self.download(name, path):
+                return None
+            with open(path, 'rb') as f:
+                return f.read()
+
+    def put_bytes(self, name: str, data: bytes) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, os.path.basename(name))
+            with open(path, 'wb') as f:
+                f.write(data)
+            self.upload(path, name)
+
+    def _key(self, name: str) -> str:
+        return f"{self._prefix}/{name}" if self._prefix else name
+
+    def _local(self, name: str) -> str:
+        return os.path.join(self.uri, name)
+
+    def _s3_client(self):
+        if self._client is None:
+            import boto3
+            self._client = boto3.client("s3", endpoint_url=self.s3_endpoint or None)
+        return self._client
+
+
+def new_manifest(columns: Sequence[str], metric_spec: Dict[str, Any]) -> Dict[str, Any]:
+    """Manifest of an empty store for the given feature columns"""
+    return {
+        'version': MANIFEST_VERSION,
+        'generation': 0,
+        'columns': list(columns),
+        'metric_spec': metric_spec,
+        'watermark': None,
+        'raw_tail': {'timestamps': [], 'values': []},
+        'partitions': [],
+        'sample': None,
+    }
+
+
+def partition_filename(generation: int) -> str:
+    return f"part-{generation:08d}.parquet"
+
+
+def sample_filename(generation: int) -> str:
+    return f"sample-{generation:08d}.parquet"
+
+
+def sample_keys(timestamps: np.ndarray, half_life_hours: float, rng: np.random.Generator) -> np.ndarray:
+    """
+    Reservoir keys for new rows; the rows with the largest keys form the sample
+
+    Args:
+        timestamps: float64 epoch seconds
+        half_life_hours: Age at which a row is half as likely to be kept; 0 for a uniform sample
+        rng: Random generator
+
+    Returns:
+        float64 keys: log-weight plus Gumbel noise
+    """
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    # -log(-log(u)) is Gumbel noise; u in (0, 1] keeps it finite
+    keys = -np.log(-np.log1p(-rng.random(len(timestamps))))
+    if half_life_hours > 0:
+        keys += timestamps * (np.log(2.0) / (half_life_hours * 3600.0))
+    return keys
+
+
+class DecayedSample:
+    """Bounded training sample: rows with the largest keys among everything offered"""
+
+    def __init__(self, size: int, n_features: int, dtype: Any = np.float64):
+        if size < 1:
+            raise ValueError(f"Sample size must be at least 1, got {size}")
+        self.size = size
+        self.timestamps = np.empty(0, dtype=np.float64)
+        self.features = np.empty((0, n_features), dtype=dtype)
+        self.keys = np.empty(0, dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def offer(self, timestamps: np.ndarray, features: np.ndarray, keys: np.ndarray) -> None:
+        """Merge candidate rows, keeping the size largest keys overall"""
+        timestamps = np.concatenate((self.timestamps, np.asarray(timestamps, dtype=np.float64)))
+        features = np.concatenate((self.features, np.asarray(features, dtype=self.features.dtype)))
+        keys = np.concatenate((self.keys, np.asarray(keys, dtype=np.float64)))
+        if len(keys) > self.size:
+            keep = np.argpartition(keys, len(keys) - self.size)[len(keys) - self.size:]
+            timestamps, features, keys = timestamps[keep], features[keep], keys[keep]
+        self.timestamps, self.features, self.keys = timestamps, features, keys
+
+    def drop_before(self, min_timestamp: float) -> None:
+        keep = self.timestamps >= min_timestamp
+        self.timestamps, self.features, self.keys = self.timestamps[keep], self.features[keep], self.keys[keep]
+
+    def sorted(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(timestamps, features) in time order"""
+        order = np.argsort(self.timestamps, kind='stable')
+        return self.timestamps[order], self.features[order]
+
+
+def load_sample(store: FeatureStore, name: str, columns: Sequence[str], size: int) -> Optional[DecayedSample]:
+    """The sample stored as name, or None when it does not exist"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, name)
+        if not store.download(name, path):
+            return None
+        timestamps, data = read_dataset(path)
+    sample = DecayedSample(size, len(columns))
+    sample.offer(timestamps, np.column_stack([data[name] for name in columns]), data[SAMPLE_KEY_COLUMN])
+    return sample
+
+
+def save_sample(store: FeatureStore, name: str, columns: Sequence[str], sample: DecayedSample) -> None:
+    data = {column: sample.features[:, i] for i, column in enumerate(columns)}
+    data[SAMPLE_KEY_COLUMN] = sample.keys
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, name)
+        write_dataset(path, sample.timestamps, data)
+        store.upload(path, name)
+
+
+def rebuild_sample(
+    store: FeatureStore,
+    partitions: List[Dict[str, Any]],
+    columns: Sequence[str],
+    size: int,
+    half_life_hours: float,
+    rng: np.random.Generator
+) -> DecayedSample:
+    """Resample every stored partition, e.g. after the sample size or half-life changed"""
+    sample = DecayedSample(size, len(columns))
+    with tempfile.TemporaryDirectory() as tmp:
+        for partition in partitions:
+            path = os.path.join(tmp, partition['name'])
+            if not store.download(partition['name'], path):
+                print(f"Warning: feature store partition {partition['name']} is missing, skipping it")
+                continue
+            timestamps, data = read_dataset(path, columns=columns)
+            sample.offer(
+                timestamps,
+                np.column_stack([data[name] for name in columns]),
+                sample_keys(timestamps, half_life_hours, rng)
+            )
+            os.remove(path)
+    return sample
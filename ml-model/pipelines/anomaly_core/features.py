@@ -0,0 +1,207 @@
+# ml-model/pipelines/anomaly_core/features.py
+"""
+Vectorized feature engineering shared by the training pipeline and the MCP tool.
+
+Arrays in, arrays out: timestamps are float64 epoch seconds and the result is an
+(n, len(FEATURE_COLUMNS)) float64 matrix, so neither side needs to round-trip
+timestamps through ISO strings or build intermediate DataFrames.
+"""
+from typing import Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+FEATURE_COLUMNS = ['cpu_usage', 'rolling_mean', 'rolling_std', 'rate_of_change', 'hour']
+ROLLING_WINDOW = 5
+
+
+def samples_to_arrays(samples: Sequence[Sequence[Any]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Convert Prometheus range-query samples into timestamp and value arrays
+
+    Args:
+        samples: The ``values`` list of one series, ``[[epoch, "value"], ...]``
+
+    Returns:
+        (timestamps, values) as float64 arrays
+    """
+    if len(samples) == 0:
+        return np.empty(0, dtype=np.float64), np.empty(0, dtype=np.float64)
+    raw = np.asarray(samples, dtype=object)
+    timestamps = raw[:, 0].astype(np.float64)
+    values = raw[:, 1].astype(np.float64)
+    return timestamps, values
+
+
+def segment_starts(lengths: Sequence[int]) -> np.ndarray:
+    """
+    Per-row start index of the segment each row belongs to
+
+    Used to run the rolling engine over several series concatenated into one
+    array: windows and differences never reach back across a segment start.
+
+    Args:
+        lengths: Number of rows in each consecutive segment
+
+    Returns:
+        int64 array with one entry per row
+    """
+    lengths = np.asarray(lengths, dtype=np.int64)
+    offsets = np.concatenate(([0], np.cumsum(lengths)[:-1])) if len(lengths) else lengths
+    return np.repeat(offsets, lengths)
+
+
+def rolling_mean_std(
+    values: np.ndarray,
+    window: int = ROLLING_WINDOW,
+    starts: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Trailing rolling mean and sample std using cumulative sums
+
+    Matches ``Series.rolling(window, min_periods=1).mean()`` and
+    ``.std().fillna(0)``: NaN samples are skipped, and windows with fewer than
+    two valid samples get a std of 0.
+
+    Args:
+        values: 1-D float64 array
+        window: Number of trailing samples per window
+        starts: Optional per-row segment start index (see segment_starts)
+
+    Returns:
+        (rolling_mean, rolling_std) as float64 arrays
+    """
+    values = np.asarray(values, dtype=np.float64)
+    valid = ~np.isnan(values)
+    # Center on the mean to keep the cumulative sum-of-squares well conditioned
+    shift = values[valid].mean() if valid.any() else 0.0
+    centered = np.where(valid, values - shift, 0.0)
+
+    index = np.arange(len(values))
+    lower = np.maximum(index - window + 1, 0)
+    if starts is not None:
+        lower = np.maximum(lower, starts)
+
+    def _window_sum(x: np.ndarray) -> np.ndarray:
+        c = np.concatenate(([0.0], np.cumsum(x)))
+        return c[index + 1] - c[lower]
+
+    count = _window_sum(valid.astype(np.float64))
+    total = _window_sum(centered)
+    total_sq = _window_sum(centered * centered)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = total / count + shift
+        var = (total_sq - total * total / count) / (count - 1)
+    std = np.sqrt(np.clip(var, 0.0, None))
+    std[count < 2] = 0.0
+    return mean, std
+
+
+def rate_of_change(values: np.ndarray, starts: Optional[np.ndarray] = None) -> np.ndarray:
+    """First difference with the leading (and any NaN) entries set to 0"""
+    values = np.asarray(values, dtype=np.float64)
+    diff = np.empty_like(values)
+    if len(values):
+        diff[0] = 0.0
+        np.subtract(values[1:], values[:-1], out=diff[1:])
+    if starts is not None:
+        diff[starts == np.arange(len(values))] = 0.0
+    diff[np.isnan(diff)] = 0.0
+    return diff
+
+
+def hour_of_day(timestamps: np.ndarray) -> np.ndarray:
+    """Hour of day (0-23, UTC) for float64 epoch-second timestamps"""
+    return np.floor_divide(np.asarray(timestamps, dtype=np.float64), 3600.0) % 24
+
+
+def feature_matrix(
+    timestamps: np.ndarray,
+    values: np.ndarray,
+    window: int = ROLLING_WINDOW,
+    starts: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    Feature matrix for every input row, including rows whose raw value is NaN
+
+    Args:
+        timestamps: float64 epoch seconds
+        values: float64 metric values aligned with timestamps
+        window: Rolling window length in samples
+        starts: Optional per-row segment start index for concatenated series
+
+    Returns:
+        (n, len(FEATURE_COLUMNS)) float64 matrix
+    """
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+
+    mean, std = rolling_mean_std(values, window, starts)
+    return np.column_stack((
+        values,
+        mean,
+        std,
+        rate_of_change(values, starts),
+        hour_of_day(timestamps),
+    ))
+
+
+def compute_features(
+    timestamps: np.ndarray,
+    values: np.ndarray,
+    window: int = ROLLING_WINDOW
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Build the model feature matrix from one raw series
+
+    Args:
+        timestamps: float64 epoch seconds
+        values: float64 metric values aligned with timestamps
+        window: Rolling window length in samples
+
+    Returns:
+        (timestamps, features) with rows whose raw value is NaN dropped;
+        feature columns follow FEATURE_COLUMNS
+    """
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+
+    features = feature_matrix(timestamps, values, window)
+    keep = ~np.isnan(values)
+    return timestamps[keep], features[keep]
+
+
+def compute_features_batch(
+    series: Sequence[Tuple[np.ndarray, np.ndarray]],
+    window: int = ROLLING_WINDOW
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Build feature matrices for many series in one vectorized pass
+
+    Equivalent to calling compute_features on each series and stacking the results.
+
+    Args:
+        series: (timestamps, values) pairs, one per series
+        window: Rolling window length in samples
+
+    Returns:
+        (series_index, timestamps, features): series_index gives the position in
+        ``series`` each output row came from; rows with NaN values are dropped
+    """
+    if not series:
+        return np.empty(0, dtype=np.int64), np.empty(0), np.empty((0, len(FEATURE_COLUMNS)))
+
+    lengths = [len(ts) for ts, _ in series]
+    timestamps = np.concatenate([np.asarray(ts, dtype=np.float64) for ts, _ in series])
+    values = np.concatenate([np.asarray(v, dtype=np.float64) for _, v in series])
+    series_index = np.repeat(np.arange(len(series)), lengths)
+
+    features = feature_matrix(timestamps, values, window, segment_starts(lengths))
+    keep = ~np.isnan(values)
+    return series_index[keep], timestamps[keep], features[keep]
+
+
+def format_timestamps(timestamps: np.ndarray) -> List[str]:
+    """ISO-8601 strings (UTC, second precision) for epoch-second timestamps"""
+    seconds = np.asarray(timestamps, dtype=np.float64).astype('datetime64[s]')
+    return np.datetime_as_string(seconds, unit='s').tolist()
@@ -0,0 +1,268 @@
+# ml-model/pipelines/anomaly_core/forest.py
+"""
+Array-backed IsolationForest for low-latency batch scoring
+
+FlatIsolationForest holds every tree of a fitted sklearn IsolationForest in a
+handful of flat node arrays (feature, threshold, left/right child and the
+path-length contribution of each leaf). Scoring walks all trees for a block of
+samples at once with NumPy gathers, so it needs neither sklearn nor a Python
+loop over trees, and it reproduces sklearn's score_samples, decision_function
+and predict.
+
+For scoring, the trees are re-laid out as complete binary trees of depth
+max_depth, stored level by level (a leaf above the last level is repeated down
+to it). The children of node i on one level are 2i and 2i + 1 on the next, so
+each step is two gathers (split feature and threshold), one gather of the
+input, and integer arithmetic instead of a child lookup. Thresholds are
+rounded down to float32, which keeps the float32-input comparison exact and
+halves the data the gathers touch.
+"""
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+FLAT_MODEL_FILENAME = "model_flat.npz"
+
+# (row, tree) pairs scored per block; keeps the scratch arrays within L2 cache
+_BLOCK_PAIRS = 32768
+
+
+def average_path_length(n_samples: np.ndarray) -> np.ndarray:
+    """
+    Average path length of an unsuccessful BST search over n samples, c(n)
+
+    Args:
+        n_samples: Training samples that reached each node
+
+    Returns:
+        float64 array of the same shape
+    """
+    n = np.asarray(n_samples, dtype=np.float64)
+    result = np.zeros_like(n)
+    result[n == 2] = 1.0
+    large = n > 2
+    result[large] = 2.0 * (np.log(n[large] - 1.0) + np.euler_gamma) - 2.0 * (n[large] - 1.0) / n[large]
+    return result
+
+
+class FlatIsolationForest:
+    """IsolationForest flattened into global node arrays"""
+
+    def __init__(
+        self,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        left: np.ndarray,
+        right: np.ndarray,
+        missing_left: np.ndarray,
+        path_length: np.ndarray,
+        roots: np.ndarray,
+        max_depth: int,
+        denominator: float,
+        offset: float,
+        n_features: int
+    ):
+        """
+        Args:
+            feature: Input column tested at each node (0 for leaves)
+            threshold: Split threshold; +inf for leaves so they always go left
+            left: Global index of the left child; leaves point at themselves
+            right: Global index of the right child; leaves point at themselves
+            missing_left: Whether NaN inputs go to the left child
+            path_length: Depth (root = 1) + c(node samples) - 1 at leaves, 0 at split nodes
+            roots: Global index of each tree's root node
+            max_depth: Most splits on any root-to-leaf path
+            denominator: n_estimators * c(max_samples)
+            offset: sklearn offset_, subtracted in decision_function
+            n_features: Width of the input matrix
+        """
+        self.feature = np.asarray(feature, dtype=np.intp)
+        self.threshold = np.asarray(threshold, dtype=np.float64)
+        self.left = np.asarray(left, dtype=np.intp)
+        self.right = np.asarray(right, dtype=np.intp)
+        self.missing_left = np.asarray(missing_left, dtype=bool)
+        self.path_length = np.asarray(path_length, dtype=np.float64)
+        self.roots = np.asarray(roots, dtype=np.intp)
+        self.max_depth = int(max_depth)
+        self.denominator = float(denominator)
+        self.offset = float(offset)
+        self.n_features = int(n_features)
+        self._levels, self._leaf_path_length = self._complete_levels()
+
+    @property
+    def n_estimators(self) -> int:
+        return len(self.roots)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.feature)
+
+    @classmethod
+    def from_sklearn(cls, model) -> "FlatIsolationForest":
+        """
+        Export a fitted sklearn IsolationForest
+
+        Args:
+            model: Fitted sklearn.ensemble.IsolationForest
+
+        Returns:
+            Equivalent FlatIsolationForest
+        """
+        features, thresholds, lefts, rights, missing = [], [], [], [], []
+        path_lengths, roots = [], []
+        max_depth = 0
+        base = 0
+
+        for estimator, columns in zip(model.estimators_, model.estimators_features_):
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            is_leaf = tree.children_left == -1
+            local = np.arange(n_nodes)
+
+            # sklearn counts the root as depth 1
+            depths = np.ones(n_nodes, dtype=np.int64)
+            for node in range(n_nodes):
+                # sklearn numbers children after their parent, so one forward pass fills depths
+                if not is_leaf[node]:
+                    depths[tree.children_left[node]] = depths[node] + 1
+                    depths[tree.children_right[node]] = depths[node] + 1
+
+            columns = np.asarray(columns)
+            features.append(np.where(is_leaf, 0, columns[np.maximum(tree.feature, 0)]))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            lefts.append(base + np.where(is_leaf, local, tree.children_left))
+            rights.append(base + np.where(is_leaf, local, tree.children_right))
+            node_missing = getattr(tree, "missing_go_to_left", None)
+            missing.append(is_leaf | (np.asarray(node_missing, dtype=bool) if node_missing is not None else False))
+            path_lengths.append(np.where(
+                is_leaf,
+                depths + average_path_length(tree.n_node_samples) - 1.0,
+                0.0
+            ))
+            roots.append(base)
+            max_depth = max(max_depth, int(depths.max()) - 1)
+            base += n_nodes
+
+        return cls(
+            feature=np.concatenate(features),
+            threshold=np.concatenate(thresholds),
+            left=np.concatenate(lefts),
+            right=np.concatenate(rights),
+            missing_left=np.concatenate(missing),
+            path_length=np.concatenate(path_lengths),
+            roots=np.asarray(roots),
+            max_depth=max_depth,
+            denominator=len(model.estimators_) * float(average_path_length(np.array([model._max_samples]))[0]),
+            offset=model.offset_,
+            n_features=model.n_features_in_
+        )
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """Arrays for np.savez; node indices are stored as int32"""
+        return {
+            "feature": self.feature.astype(np.int32),
+            "threshold": self.threshold,
+            "left": self.left.astype(np.int32),
+            "right": self.right.astype(np.int32),
+            "missing_left": self.missing_left,
+            "path_length": self.path_length,
+            "roots": self.roots.astype(np.int32),
+            "params": np.array([self.max_depth, self.denominator, self.offset, self.n_features], dtype=np.float64),
+        }
+
+    def save(self, path: str) -> None:
+        """Write the model as an uncompressed .npz archive"""
+        with open(path, "wb") as f:
+            np.savez(f, **self.to_arrays())
+
+    @classmethod
+    def load(cls, path: str) -> "FlatIsolationForest":
+        with np.load(path) as data:
+            max_depth, denominator, offset, n_features = data["params"]
+            return cls(
+                feature=data["feature"],
+                threshold=data["threshold"],
+                left=data["left"],
+                right=data["right"],
+                missing_left=data["missing_left"],
+                path_length=data["path_length"],
+                roots=data["roots"],
+                max_depth=int(max_depth),
+                denominator=denominator,
+                offset=offset,
+                n_features=int(n_features)
+            )
+
+    def _complete_levels(self) -> Tuple[List[Tuple[np.ndarray, np.ndarray, np.ndarray]], np.ndarray]:
+        """
+        (feature, threshold, missing_left) per level of the complete trees, and leaf path lengths
+
+        Level d holds n_estimators * 2 ** d nodes, tree-major; leaves below
+        max_depth hold +inf thresholds and repeat themselves on every lower level.
+        """
+        is_leaf = self.left == np.arange(self.n_nodes)
+        # x <= t for a float32 x exactly when x <= the largest float32 not above t
+        threshold = self.threshold.astype(np.float32)
+        rounded_up = threshold.astype(np.float64) > self.threshold
+        threshold[rounded_up] = np.nextafter(threshold[rounded_up], np.float32(-np.inf))
+        threshold[is_leaf] = np.inf
+
+        levels = []
+        nodes = self.roots[:, None]
+        for _ in range(self.max_depth):
+            level = nodes.ravel()
+            levels.append((self.feature[level], threshold[level], self.missing_left[level]))
+            # Leaves are their own children, so they fill the subtree below them
+            nodes = np.stack((self.left[nodes], self.right[nodes]), axis=-1).reshape(len(self.roots), -1)
+        return levels, self.path_length[nodes.ravel()]
+
+    def path_lengths(self, X: np.ndarray) -> np.ndarray:
+        """Summed path length over all trees for each row of X"""
+        # sklearn scores float32 inputs
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected a 2-D matrix with {self.n_features} columns, got shape {X.shape}")
+
+        has_nan = bool(np.isnan(X).any())
+        n_trees = self.n_estimators
+        block_rows = max(_BLOCK_PAIRS // max(n_trees, 1), 1)
+        totals = np.empty(len(X), dtype=np.float64)
+        for start in range(0, len(X), block_rows):
+            block = X[start:start + block_rows]
+            flat = block.ravel()
+            shape = (len(block), n_trees)
+            row_offsets = (np.arange(len(block), dtype=np.intp) * self.n_features)[:, None]
+            nodes = np.tile(np.arange(n_trees, dtype=np.intp), (len(block), 1))
+            index = np.empty(shape, dtype=np.intp)
+            values = np.empty(shape, dtype=np.float32)
+            thresholds = np.empty(shape, dtype=np.float32)
+            go_right = np.empty(shape, dtype=np.intp)
+            for feature, threshold, missing_left in self._levels:
+                # Indices are always in range; mode='wrap' skips np.take's slower bounds check
+                np.take(feature, nodes, out=index, mode='wrap')
+                index += row_offsets
+                np.take(flat, index, out=values, mode='wrap')
+                np.take(threshold, nodes, out=thresholds, mode='wrap')
+                # go right unless values <= thresholds; NaN goes right unless its node sends it left
+                np.greater(values, thresholds, out=go_right, casting='unsafe')
+                if has_nan:
+                    go_right |= np.isnan(values) & ~np.take(missing_left, nodes)
+                nodes += nodes
+                nodes += go_right
+            totals[start:start + len(block)] = np.take(self._leaf_path_length, nodes).sum(axis=1)
+        return totals
+
+    def score_samples(self, X: np.ndarray) -> np.ndarray:
+        """Opposite of the anomaly score, as sklearn's score_samples (lower is more abnormal)"""
+        depths = self.path_lengths(X)
+        if self.denominator == 0:
+            return -np.ones_like(depths)
+        return -(2.0 ** (-depths / self.denominator))
+
+    def decision_function(self, X: np.ndarray) -> np.ndarray:
+        """Shifted score; negative values are anomalies"""
+        return self.score_samples(X) - self.offset
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """-1 for anomalies, 1 for normal samples"""
+        return np.where(self.decision_function(X) < 0, -1, 1)
@@ -0,0 +1,161 @@
+# ml-model/pipelines/anomaly_core/inference.py
+"""
+KServe v2 (Open Inference Protocol) request/response codec
+
+Supports both the plain JSON encoding and the binary tensor data extension,
+where tensors travel as raw little-endian buffers after a JSON header whose
+length is given by the Inference-Header-Content-Length HTTP header.
+
+The flat-forest predictor answers with two outputs: the -1/1 labels first
+(LABEL_OUTPUT, what every v2 client reads) and the decision_function value
+per row (SCORE_OUTPUT), which the sklearn runtime does not send.
+"""
+import json
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+import numpy as np
+
+INFERENCE_HEADER = "Inference-Header-Content-Length"
+LABEL_OUTPUT = "output-0"
+SCORE_OUTPUT = "anomaly-score"
+
+_V2_DTYPES = {
+    "BOOL": np.dtype("bool"),
+    "UINT8": np.dtype("<u1"),
+    "UINT16": np.dtype("<u2"),
+    "UINT32": np.dtype("<u4"),
+    "UINT64": np.dtype("<u8"),
+    "INT8": np.dtype("<i1"),
+    "INT16": np.dtype("<i2"),
+    "INT32": np.dtype("<i4"),
+    "INT64": np.dtype("<i8"),
+    "FP16": np.dtype("<f2"),
+    "FP32": np.dtype("<f4"),
+    "FP64": np.dtype("<f8"),
+}
+
+
+def encode_infer_request(
+    features: np.ndarray,
+    binary: bool = True,
+    input_name: str = "input-0"
+) -> Tuple[bytes, Dict[str, str]]:
+    """
+    Encode a feature matrix as a v2 inference request body
+
+    Args:
+        features: 2-D float64 matrix, one row per sample
+        binary: Send the tensor as a raw FP64 buffer and ask for binary outputs
+        input_name: Model input tensor name
+
+    Returns:
+        (body, headers) ready to POST to /v2/models/<name>/infer
+    """
+    features = np.ascontiguousarray(features, dtype="<f8")
+    tensor: Dict[str, Any] = {
+        "name": input_name,
+        "shape": list(features.shape),
+        "datatype": "FP64",
+    }
+
+    if not binary:
+        tensor["data"] = features.tolist()
+        body = json.dumps({"inputs": [tensor]}).encode()
+        return body, {"Content-Type": "application/json"}
+
+    tensor["parameters"] = {"binary_data_size": features.nbytes}
+    header = json.dumps({
+        "inputs": [tensor],
+        "parameters": {"binary_data_output": True},
+    }).encode()
+    headers = {
+        "Content-Type": "application/octet-stream",
+        INFERENCE_HEADER: str(len(header)),
+    }
+    return header + features.tobytes(), headers
+
+
+def decode_infer_response(
+    body: bytes,
+    headers: Mapping[str, str],
+    output_index: int = 0
+) -> np.ndarray:
+    """
+    Decode one output tensor from a v2 inference response
+
+    Handles plain JSON responses and binary-extension responses alike.
+
+    Args:
+        body: Raw HTTP response body
+        headers: HTTP response headers (case-insensitive mapping)
+        output_index: Which output tensor to return
+
+    Returns:
+        Output tensor as a NumPy array with its declared shape
+    """
+    outputs = list(decode_infer_outputs(body, headers).values())
+    if output_index >= len(outputs):
+        raise ValueError(f"Inference response has no output {output_index}")
+    return outputs[output_index]
+
+
+def decode_infer_outputs(body: bytes, headers: Mapping[str, str]) -> Dict[str, np.ndarray]:
+    """
+    Decode every output tensor of a v2 inference response
+
+    Args:
+        body: Raw HTTP response body
+        headers: HTTP response headers (case-insensitive mapping)
+
+    Returns:
+        Output tensors by name, in response order (unnamed outputs are "output-<index>")
+    """
+    header_length = _header_length(headers)
+    if header_length is None:
+        response = json.loads(body)
+        buffer = b""
+    else:
+        response = json.loads(body[:header_length])
+        buffer = memoryview(body)[header_length:]
+
+    outputs = {}
+    offset = 0
+    for index, output in enumerate(response.get("outputs", [])):
+        name = output.get("name") or f"output-{index}"
+        shape = output.get("shape") or [-1]
+        size = (output.get("parameters") or {}).get("binary_data_size")
+        if size is None:
+            outputs[name] = np.asarray(output.get("data", [])).reshape(shape)
+            continue
+        dtype = _V2_DTYPES.get(output.get("datatype", ""))
+        if dtype is None:
+            raise ValueError(f"Unsupported binary output datatype: {output.get('datatype')}")
+        outputs[name] = np.frombuffer(buffer[offset:offset + size], dtype=dtype).reshape(shape)
+        offset += size
+    return outputs
+
+
+def anomaly_scores(outputs: Mapping[str, np.ndarray]) -> np.ndarray:
+    """
+    Per-row anomaly score from decoded outputs, negative where the model flags an anomaly
+
+    Args:
+        outputs: Result of decode_infer_outputs
+
+    Returns:
+        float64 decision_function values when the server sent SCORE_OUTPUT, otherwise
+        the -1/1 labels themselves (same sign convention, no ranking within a class)
+    """
+    if SCORE_OUTPUT in outputs:
+        return np.asarray(outputs[SCORE_OUTPUT], dtype=np.float64).reshape(-1)
+    if not outputs:
+        raise ValueError("Inference response has no outputs")
+    labels = outputs.get(LABEL_OUTPUT, next(iter(outputs.values())))
+    return np.asarray(labels, dtype=np.float64).reshape(-1)
+
+
+def _header_length(headers: Mapping[str, str]) -> Optional[int]:
+    value = headers.get(INFERENCE_HEADER)
+    if value is None:
+        value = headers.get(INFERENCE_HEADER.lower())
+    return int(value) if value is not None else None
@@ -0,0 +1,317 @@
+# ml-model/pipelines/anomaly_core/metrics.py
+"""
+Declarative multi-metric specs: which PromQL series feed the model and which
+features are derived from each
+
+A spec drives every stage: the queries the pipeline and the MCP tool fetch,
+how the series are aligned onto one time index, the feature columns written
+for training, and therefore the input width of the deployed model. The default
+spec is the original CPU-only layout (FEATURE_COLUMNS), so existing models keep
+working; NODE_METRIC_SPEC scores CPU, memory, network and disk together.
+
+Specs are plain JSON so they can be passed as a pipeline parameter or an
+environment variable:
+
+    {"metrics": [{"name": "cpu_usage", "query": "...", "features": ["value", "rate_of_change"]}],
+     "time_features": ["hour"], "window": 5}
+
+Query templates are formatted with ``{by}`` (grouping clause, empty or
+" by (instance) "), ``{matchers}`` (extra label matchers with a leading comma,
+for selectors that already have one) and ``{selector}`` (the bare matchers,
+for otherwise empty selectors).
+"""
+import json
+import os
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .features import ROLLING_WINDOW, hour_of_day, rate_of_change, rolling_mean_std, segment_starts
+from .prometheus import CPU_USAGE_QUERY
+
+METRIC_FEATURES = ('value', 'rolling_mean', 'rolling_std', 'rate_of_change')
+_TIME_FEATURES = {'hour': hour_of_day}
+TIME_FEATURES = tuple(_TIME_FEATURES)
+
+Series = Tuple[Dict[str, str], np.ndarray, np.ndarray]
+
+
+class MetricSpec:
+    """Ordered metrics, their per-metric features, and the shared time features"""
+
+    def __init__(
+        self,
+        metrics: Sequence[Mapping[str, Any]],
+        time_features: Sequence[str] = TIME_FEATURES,
+        window: int = ROLLING_WINDOW
+    ):
+        """
+        Args:
+            metrics: One mapping per metric with "name", "query" (template, see module
+                docstring), optional "features" (subset of METRIC_FEATURES, default all)
+                and optional "prefix" for derived column names (default "<name>_")
+            time_features: Features computed from the timestamp, subset of TIME_FEATURES
+            window: Rolling window length in samples
+        """
+        if not metrics:
+            raise ValueError("A metric spec needs at least one metric")
+        self.metrics = []
+        for metric in metrics:
+            name = metric.get('name')
+            if not name or not metric.get('query'):
+                raise ValueError(f"Every metric needs a name and a query, got {dict(metric)!r}")
+            features = list(metric.get('features', METRIC_FEATURES))
+            unknown = set(features) - set(METRIC_FEATURES)
+            if unknown or not features:
+                raise ValueError(f"Metric {name!r} has invalid features {features}; choose from {list(METRIC_FEATURES)}")
+            self.metrics.append({
+                'name': name,
+                'query': metric['query'],
+                'features': features,
+                'prefix': metric.get('prefix', f"{name}_"),
+            })
+        if len({m['name'] for m in self.metrics}) != len(self.metrics):
+            raise ValueError("Metric names must be unique")
+
+        unknown = set(time_features) - set(TIME_FEATURES)
+        if unknown:
+            raise ValueError(f"Invalid time features {sorted(unknown)}; choose from {list(TIME_FEATURES)}")
+        if window < 1:
+            raise ValueError(f"window must be at least 1, got {window}")
+        self.time_features = list(time_features)
+        self.window = window
+
+    @property
+    def metric_names(self) -> List[str]:
+        """Raw metric column names, in query order"""
+        return [m['name'] for m in self.metrics]
+
+    @property
+    def feature_columns(self) -> List[str]:
+        """Model input columns, in order"""
+        columns = []
+        for metric in self.metrics:
+            for feature in metric['features']:
+                columns.append(metric['name'] if feature == 'value' else metric['prefix'] + feature)
+        return columns + self.time_features
+
+    @property
+    def primary_column(self) -> int:
+        """Column of the first metric's raw value (used for peaks and summaries), or 0"""
+        first = self.metrics[0]
+        return self.feature_columns.index(first['name']) if 'value' in first['features'] else 0
+
+    def queries(self, matchers: str = "", by_instance: bool = False) -> List[str]:
+        """
+        PromQL expression per metric for a node selection
+
+        Args:
+            matchers: Extra label matchers, see instance_matchers
+            by_instance: Keep one series per instance instead of aggregating them all
+
+        Returns:
+            One expression per metric, in spec order
+        """
+        return [
+            m['query'].format(
+                by=" by (instance) " if by_instance else "",
+                matchers=f", {matchers}" if matchers else "",
+                selector=matchers
+            )
+            for m in self.metrics
+        ]
+
+    def feature_matrix(
+        self,
+        timestamps: np.ndarray,
+        values: np.ndarray,
+        starts: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Feature matrix for every input row, including rows with NaN values
+
+        Args:
+            timestamps: float64 epoch seconds
+            values: (n, len(metrics)) raw values aligned with timestamps; 1-D for one metric
+            starts: Optional per-row segment start index for concatenated series
+
+        Returns:
+            (n, len(feature_columns)) float64 matrix
+        """
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64).reshape(len(timestamps), len(self.metrics))
+
+        columns = []
+        for i, metric in enumerate(self.metrics):
+            series = values[:, i]
+            if 'rolling_mean' in metric['features'] or 'rolling_std' in metric['features']:
+                mean, std = rolling_mean_std(series, self.window, starts)
+            for feature in metric['features']:
+                if feature == 'value':
+                    columns.append(series)
+                elif feature == 'rolling_mean':
+                    columns.append(mean)
+                elif feature == 'rolling_std':
+                    columns.append(std)
+                else:
+                    columns.append(rate_of_change(series, starts))
+        return np.column_stack(columns + self.time_feature_columns(timestamps))
+
+    def time_feature_columns(self, timestamps: np.ndarray) -> List[np.ndarray]:
+        """The time feature columns for float64 epoch-second timestamps, in order"""
+        return [_TIME_FEATURES[feature](timestamps) for feature in self.time_features]
+
+    def compute_features(
+        self,
+        timestamps: np.ndarray,
+        values: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Build the model feature matrix from one group of aligned series
+
+        Returns:
+            (timestamps, features) with rows where any metric is NaN dropped
+        """
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        features = self.feature_matrix(timestamps, values)
+        keep = ~_missing(values, len(timestamps))
+        return timestamps[keep], features[keep]
+
+    def compute_features_batch(
+        self,
+        series: Sequence[Tuple[np.ndarray, np.ndarray]]
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Feature matrices for many groups (e.g. nodes) in one vectorized pass
+
+        Args:
+            series: (timestamps, values) per group, values shaped as for feature_matrix
+
+        Returns:
+            (series_index, timestamps, features) with rows where any metric is NaN dropped
+        """
+        if not series:
+            return np.empty(0, dtype=np.int64), np.empty(0), np.empty((0, len(self.feature_columns)))
+
+        lengths = [len(ts) for ts, _ in series]
+        timestamps = np.concatenate([np.asarray(ts, dtype=np.float64) for ts, _ in series])
+        values = np.concatenate([
+            np.asarray(v, dtype=np.float64).reshape(len(ts), len(self.metrics)) for ts, v in series
+        ])
+        series_index = np.repeat(np.arange(len(series)), lengths)
+
+        features = self.feature_matrix(timestamps, values, segment_starts(lengths))
+        keep = ~_missing(values, len(timestamps))
+        return series_index[keep], timestamps[keep], features[keep]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'metrics': self.metrics, 'time_features': self.time_features, 'window': self.window}
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict())
+
+    @classmethod
+    def from_dict(cls, spec: Mapping[str, Any]) -> "MetricSpec":
+        return cls(
+            spec['metrics'],
+            time_features=spec.get('time_features', TIME_FEATURES),
+            window=spec.get('window', ROLLING_WINDOW)
+        )
+
+
+def _missing(values: np.ndarray, n_rows: int) -> np.ndarray:
+    """Rows where any metric is NaN"""
+    return np.isnan(np.asarray(values, dtype=np.float64).reshape(n_rows, -1)).any(axis=1)
+
+
+# The original single-metric layout: columns are exactly FEATURE_COLUMNS
+DEFAULT_METRIC_SPEC = MetricSpec([
+    {'name': 'cpu_usage', 'query': CPU_USAGE_QUERY, 'prefix': ''},
+])
+
+NODE_METRIC_SPEC = MetricSpec([
+    {'name': 'cpu_usage', 'query': CPU_USAGE_QUERY},
+    {
+        'name': 'memory_usage',
+        'query': '100 * (1 - sum{by}(node_memory_MemAvailable_bytes{{{selector}}})'
+                 ' / sum{by}(node_memory_MemTotal_bytes{{{selector}}}))',
+    },
+    {
+        'name': 'network_bytes',
+        'query': 'sum{by}(rate(node_network_receive_bytes_total{{device!="lo"{matchers}}}[5m])'
+                 ' + rate(node_network_transmit_bytes_total{{device!="lo"{matchers}}}[5m]))',
+    },
+    {
+        'name': 'disk_io_time',
+        'query': 'sum{by}(rate(node_disk_io_time_seconds_total{{{selector}}}[5m]))',
+    },
+])
+
+_NAMED_SPECS = {'cpu': DEFAULT_METRIC_SPEC, 'node': NODE_METRIC_SPEC}
+
+
+def load_metric_spec(spec: str = "") -> MetricSpec:
+    """
+    Resolve a spec given as a pipeline parameter or environment variable
+
+    Args:
+        spec: "" or "cpu" (default CPU-only spec), "node" (NODE_METRIC_SPEC),
+            a JSON document, or the path of a JSON file
+
+    Returns:
+        MetricSpec
+    """
+    spec = (spec or "").strip()
+    if not spec:
+        return DEFAULT_METRIC_SPEC
+    if spec in _NAMED_SPECS:
+        return _NAMED_SPECS[spec]
+    if not spec.startswith('{') and os.path.exists(spec):
+        with open(spec) as f:
+            spec = f.read()
+    try:
+        return MetricSpec.from_dict(json.loads(spec))
+    except (json.JSONDecodeError, KeyError, TypeError) as e:
+        raise ValueError(f"Invalid metric spec {spec[:80]!r}: {e}") from e
+
+
+def align_series(series_per_metric: Sequence[Sequence[Series]]) -> List[Series]:
+    """
+    Join the results of one range query per metric onto a shared time index
+
+    Series are matched across metrics by label set (e.g. one group per instance
+    for ``by (instance)`` queries). Each group's index is the union of its
+    metrics' timestamps, with NaN where a metric has no sample; groups missing
+    a metric entirely are dropped. With a single metric every series passes
+    through unchanged apart from the value shape.
+
+    Args:
+        series_per_metric: Per metric, the (labels, timestamps, values) series of its query
+
+    Returns:
+        (labels, timestamps, values) per group, values shaped (n, len(series_per_metric))
+    """
+    n_metrics = len(series_per_metric)
+    groups: Dict[Tuple[Tuple[str, str], ...], List[Any]] = {}
+    for m, series in enumerate(series_per_metric):
+        for labels, timestamps, values in series:
+            key = tuple(sorted(labels.items()))
+            group = groups.setdefault(key, [labels] + [None] * n_metrics)
+            group[m + 1] = (np.asarray(timestamps, dtype=np.float64), np.asarray(values, dtype=np.float64))
+
+    aligned = []
+    for labels, *parts in groups.values():
+        if any(part is None for part in parts):
+            continue
+        if n_metrics == 1:
+            timestamps, values = parts[0]
+            aligned.append((labels, timestamps, values.reshape(-1, 1)))
+            continue
+        # Prometheus timestamps have millisecond resolution
+        rounded = [np.round(timestamps, 3) for timestamps, _ in parts]
+        index = np.unique(np.concatenate(rounded))
+        values = np.full((len(index), n_metrics), np.nan)
+        for m, (timestamps, (_, metric_values)) in enumerate(zip(rounded, parts)):
+            values[np.searchsorted(index, timestamps), m] = metric_values
+        aligned.append((labels, index, values))
+    return aligned
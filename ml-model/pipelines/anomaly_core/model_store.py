@@ -0,0 +1,210 @@
+# ml-model/pipelines/anomaly_core/model_store.py
+"""
+Local cache of the trained model artifact for in-process scoring
+
+The artifact location is the same storageUri that deploy_inference_component
+writes into the InferenceService, read either from an explicit URI or from the
+InferenceService itself. Downloads are cached on disk keyed by URI, and
+refresh() swaps in a new model when a pipeline run deploys a new URI.
+
+The flattened forest (model_flat.npz) is preferred when the run exported one,
+so scoring needs neither sklearn nor unpickling; runs that only have model.pkl
+still load through pickle.
+
+Per-instance packages (see registry.py) are loaded as a whole: every model in
+the index becomes available through models, and the package's fleet-wide
+default model through model.
+
+boto3 and kubernetes are only imported when they are needed, so importing this
+module does not require them.
+"""
+import hashlib
+import json
+import os
+import pickle
+import threading
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import urlparse
+
+from .forest import FLAT_MODEL_FILENAME, FlatIsolationForest
+from .registry import MODEL_INDEX_FILENAME
+
+MODEL_FILENAME = "model.pkl"
+
+
+class ModelStore:
+    """Downloads, caches and hot-reloads the trained model from S3/MinIO"""
+
+    def __init__(
+        self,
+        cache_dir: str = "/tmp/anomaly-model-cache",
+        storage_uri: str = "",
+        inference_service_name: str = "",
+        namespace: str = "default",
+        s3_endpoint: str = "",
+        on_change: Optional[Callable[[str], None]] = None,
+        prefer_flat: bool = True
+    ):
+        """
+        Args:
+            cache_dir: Directory for downloaded artifacts, one subdirectory per URI
+            storage_uri: Fixed artifact URI (s3://bucket/path/output_model); when empty
+                the URI is read from the InferenceService on every refresh
+            inference_service_name: InferenceService whose storageUri to follow
+            namespace: Namespace of the InferenceService
+            s3_endpoint: S3 endpoint URL, e.g. http://minio-service.kubeflow:9000
+            on_change: Called with the new URI after a different model is loaded
+            prefer_flat: Load model_flat.npz when present instead of unpickling model.pkl
+        """
+        self.cache_dir = cache_dir
+        self.storage_uri = storage_uri
+        self.inference_service_name = inference_service_name
+        self.namespace = namespace
+        self.s3_endpoint = s3_endpoint
+        self.on_change = on_change
+        self.prefer_flat = prefer_flat
+        self.current_uri: Optional[str] = None
+        self._model: Any = None
+        self._models: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._refresh_thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def model(self) -> Any:
+        """Currently loaded model, or None before the first successful refresh"""
+        return self._model
+
+    @property
+    def models(self) -> Dict[str, Any]:
+        """Per-instance models by serving name; empty unless a package is loaded"""
+        return self._models
+
+    def resolve_uri(self) -> str:
+        """Artifact URI to serve: the fixed URI, else the InferenceService storageUri"""
+        if self.storage_uri:
+            return self.storage_uri
+
+        from kubernetes import client, config
+
+        try:
+            config.load_incluster_config()
+        except config.ConfigException:
+            config.load_kube_config()
+
+        isvc = client.CustomObjectsApi().get_namespaced_custom_object(
+            group="serving.kserve.io",
+            version="v1beta1",
+            namespace=self.namespace,
+            plural="inferenceservices",
+            name=self.inference_service_name
+        )
+        predictor = isvc["spec"]["predictor"]
+        if "model" in predictor:
+            return predictor["model"]["storageUri"]
+        # Custom predictor containers receive the artifact location through STORAGE_URI
+        for container in predictor.get("containers", []):
+            for env in container.get("env", []):
+                if env.get("name") == "STORAGE_URI":
+                    return env["value"]
+        raise ValueError(f"InferenceService {self.inference_service_name} has no storageUri")
+
+    def refresh(self) -> bool:
+        """
+        Load the model for the current URI if it is not loaded yet
+
+        Returns:
+            True if a different model was loaded
+        """
+        uri = self.resolve_uri()
+        if uri == self.current_uri:
+            return False
+
+        index = self._load_index(uri)
+        if index is None:
+            model, models = self._load_model(uri), {}
+        else:
+            default = index.get("default")
+            model = self._load_model(uri, default) if default else None
+            models = {name: self._load_model(uri, name) for name in index["models"].values()}
+
+        with self._lock:
+            self._model = model
+            self._models = models
+            self.current_uri = uri
+
+        print(f"✓ Loaded local model from {uri}")
+        if self.on_change is not None:
+            self.on_change(uri)
+        return True
+
+    def start_auto_refresh(self, interval_seconds: float = 60.0) -> None:
+        """Poll for newly deployed models on a daemon thread"""
+        if self._refresh_thread is not None:
+            return
+
+        def _loop() -> None:
+            while not self._stop.is_set():
+                try:
+                    self.refresh()
+                except Exception as e:
+                    print(f"Warning: model refresh failed: {e}")
+                self._stop.wait(interval_seconds)
+
+        self._refresh_thread = threading.Thread(target=_loop, name="model-refresh", daemon=True)
+        self._refresh_thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _load_model(self, uri: str, subdir: str = "") -> Any:
+        """Model under uri (or a package subdirectory), flattened forest first"""
+        prefix = f"{subdir}/" if subdir else ""
+        model = self._load_flat(uri, prefix) if self.prefer_flat else None
+        if model is None:
+            with open(self._download(uri, prefix + MODEL_FILENAME), "rb") as f:
+                model = pickle.load(f)
+        return model
+
+    def _load_flat(self, uri: str, prefix: str = "") -> Optional[FlatIsolationForest]:
+        """Flattened forest for uri, or None if the run did not export one"""
+        try:
+            return FlatIsolationForest.load(self._download(uri, prefix + FLAT_MODEL_FILENAME))
+        except Exception as e:
+            print(f"Warning: no {prefix}{FLAT_MODEL_FILENAME} at {uri}, loading {prefix}{MODEL_FILENAME}: {e}")
+            return None
+
+    def _load_index(self, uri: str) -> Optional[Dict[str, Any]]:
+        """Package index at uri, or None for a single-model artifact"""
+        from botocore.exceptions import ClientError
+        try:
+            path = self._download(uri, MODEL_INDEX_FILENAME)
+        except ClientError as e:
+            # Only a missing index means a single-model artifact; credentials, throttling
+            # and network errors must not make a package look like one
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey'):
+                return None
+            raise
+        with open(path) as f:
+            return json.load(f)
+
+    def _download(self, uri: str, filename: str = MODEL_FILENAME) -> str:
+        """Local path of filename under uri, downloading it on a cache miss"""
+        cache_path = os.path.join(self.cache_dir, hashlib.sha256(uri.encode()).hexdigest()[:16], filename)
+        if os.path.exists(cache_path):
+            return cache_path
+
+        parsed = urlparse(uri)
+        if parsed.scheme != "s3":
+            raise ValueError(f"Unsupported model storage URI: {uri}")
+        key = f"{parsed.path.strip('/')}/{filename}"
+
+        import boto3
+
+        s3 = boto3.client("s3", endpoint_url=self.s3_endpoint or None)
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        # Download next to the final path and rename, so readers never see a partial file
+        partial_path = f"{cache_path}.partial"
+        s3.download_file(parsed.netloc, key, partial_path)
+        os.replace(partial_path, cache_path)
+        return cache_path
@@ -0,0 +1,244 @@
+# ml-model/pipelines/anomaly_core/prometheus.py
+"""
+Prometheus helpers shared by the pipeline fetch step and the MCP tool
+
+fetch_range_sharded splits long range queries into step-aligned shards that
+stay under Prometheus's 11,000 points-per-series limit. It runs the shards
+concurrently with bounded parallelism and retries, and yields them in time
+order so callers can stream them to disk.
+
+requests is only imported when a sharded fetch runs.
+"""
+import math
+import re
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .features import samples_to_arrays
+
+_DURATION_UNITS = {
+    'ms': 0.001,
+    's': 1,
+    'm': 60,
+    'h': 3600,
+    'd': 86400,
+    'w': 604800,
+    'y': 31536000,
+}
+_DURATION_RE = re.compile(r'(\d+(?:\.\d+)?)(ms|s|m|h|d|w|y)')
+
+
+def parse_duration(duration: str) -> float:
+    """
+    Convert a Prometheus duration or step (e.g. "10s", "1h30m", "15") to seconds
+
+    Args:
+        duration: Prometheus duration string; a bare number is taken as seconds
+
+    Returns:
+        Duration in seconds
+    """
+    duration = str(duration).strip()
+    try:
+        return float(duration)
+    except ValueError:
+        pass
+
+    parts = _DURATION_RE.findall(duration)
+    if not parts or ''.join(num + unit for num, unit in parts) != duration:
+        raise ValueError(f"Invalid Prometheus duration: {duration!r}")
+    return sum(float(num) * _DURATION_UNITS[unit] for num, unit in parts)
+
+
+CPU_USAGE_QUERY = '100 - (avg{by}(rate(node_cpu_seconds_total{{mode="idle"{matchers}}}[5m])) * 100)'
+
+
+def instance_matchers(
+    instance: str = "",
+    instances: Optional[Sequence[str]] = None,
+    instance_pattern: str = "",
+    label_selector: str = ""
+) -> str:
+    """
+    Build the extra label matchers for a node selection
+
+    Args:
+        instance: One exact instance (e.g. "10.0.0.194:9100")
+        instances: Several exact instances, combined into one regex matcher
+        instance_pattern: RE2 regex on the instance label (fully anchored by Prometheus)
+        label_selector: Raw additional matchers, e.g. 'job="node-exporter"'
+
+    Returns:
+        Matchers joined with commas (no braces), empty if nothing was selected
+    """
+    matchers = []
+    if instance:
+        matchers.append(f'instance="{_quote(instance)}"')
+    if instances:
+        alternatives = "|".join(re.escape(i) for i in instances)
+        matchers.append(f'instance=~"{_quote(alternatives)}"')
+    if instance_pattern:
+        matchers.append(f'instance=~"{_quote(instance_pattern)}"')
+    if label_selector:
+        matchers.append(label_selector.strip().strip("{}").strip(", "))
+    return ", ".join(matchers)
+
+
+def _quote(value: str) -> str:
+    # PromQL double-quoted strings unescape backslashes once, so regex escapes are doubled
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def cpu_usage_query(matchers: str = "", by_instance: bool = False) -> str:
+    """
+    CPU usage (%) PromQL used for training and inference
+
+    Args:
+        matchers: Extra label matchers, see instance_matchers
+        by_instance: Keep one series per instance instead of averaging them all
+
+    Returns:
+        PromQL expression
+    """
+    return CPU_USAGE_QUERY.format(
+        by=" by (instance) " if by_instance else "",
+        matchers=f", {matchers}" if matchers else ""
+    )
+
+
+# Prometheus rejects range queries returning more than 11,000 points per series
+MAX_POINTS_PER_QUERY = 10000
+
+
+def shard_range(
+    start: float,
+    end: float,
+    step: float,
+    max_points: int = MAX_POINTS_PER_QUERY
+) -> List[Tuple[float, float]]:
+    """
+    Split [start, end] into step-aligned, non-overlapping query windows
+
+    start is floored to a multiple of step, so every shard evaluates on the same
+    global grid and repeated fetches of overlapping ranges produce identical
+    timestamps.
+
+    Args:
+        start: Range start, epoch seconds
+        end: Range end, epoch seconds
+        step: Resolution in seconds
+        max_points: Most evaluation points per shard
+
+    Returns:
+        (shard_start, shard_end) pairs, both inclusive, in time order
+    """
+    if step <= 0:
+        raise ValueError(f"step must be positive, got {step}")
+    if max_points < 1:
+        raise ValueError(f"max_points must be at least 1, got {max_points}")
+
+    aligned_start = math.floor(start / step) * step
+    span = (max_points - 1) * step
+    shards = []
+    shard_start = aligned_start
+    while shard_start <= end:
+        shards.append((shard_start, min(shard_start + span, end)))
+        shard_start += max_points * step
+    return shards
+
+
+def fetch_range_sharded(
+    prometheus_url: str,
+    query: str,
+    start: float,
+    end: float,
+    step: str = "10s",
+    max_points: int = MAX_POINTS_PER_QUERY,
+    max_workers: int = 4,
+    retries: int = 3,
+    backoff_seconds: float = 1.0,
+    timeout: float = 60.0,
+    session: Any = None
+) -> Iterator[List[Tuple[Dict[str, str], np.ndarray, np.ndarray]]]:
+    """
+    Run a long range query as parallel shards, yielding each shard in time order
+
+    At most max_workers shards are in flight or waiting to be consumed, so memory
+    stays bounded by a few shards regardless of the total range. Samples at or
+    before the last timestamp already yielded for a series are dropped, so shard
+    boundaries never produce duplicates.
+
+    Args:
+        prometheus_url: Prometheus base URL
+        query: PromQL expression
+        start: Range start, epoch seconds
+        end: Range end, epoch seconds
+        step: Prometheus step, e.g. "10s"
+        max_points: Most evaluation points per shard
+        max_workers: Shards queried concurrently
+        retries: Extra attempts per shard on connection errors, timeouts, 429 and 5xx
+        backoff_seconds: First retry delay, doubled on every further attempt
+        timeout: Per-request timeout, seconds
+        session: requests.Session to reuse; one is created when omitted
+
+    Returns:
+        Iterator over shards, each a list of (labels, timestamps, values) per series
+    """
+    import requests
+
+    step_seconds = parse_duration(step)
+    shards = shard_range(start, end, step_seconds, max_points)
+    session = session or requests.Session()
+    url = f"{prometheus_url.rstrip('/')}/api/v1/query_range"
+
+    def _fetch(shard: Tuple[float, float]) -> List[Dict[str, Any]]:
+        params = {"query": query, "start": shard[0], "end": shard[1], "step": step_seconds}
+        for attempt in range(retries + 1):
+            try:
+                response = session.get(url, params=params, timeout=timeout)
+                if response.status_code != 429 and response.status_code < 500:
+                    response.raise_for_status()
+                    body = response.json()
+                    if body.get("status") != "success":
+                        raise ValueError(f"Prometheus query failed: {body.get('error', body)}")
+                    return body["data"]["result"]
+                error = f"HTTP {response.status_code}"
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = str(e)
+
+            if attempt == retries:
+                raise RuntimeError(f"Prometheus shard {shard[0]:.0f}-{shard[1]:.0f} failed after {retries + 1} attempts: {error}")
+            delay = backoff_seconds * 2 ** attempt
+            print(f"Warning: shard {shard[0]:.0f}-{shard[1]:.0f} failed ({error}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+    last_timestamps: Dict[Tuple[Tuple[str, str], ...], float] = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending: deque = deque()
+        shard_iter = iter(shards)
+        for shard in shard_iter:
+            pending.append(pool.submit(_fetch, shard))
+            if len(pending) >= max_workers:
+                break
+
+        while pending:
+            result = pending.popleft().result()
+            next_shard = next(shard_iter, None)
+            if next_shard is not None:
+                pending.append(pool.submit(_fetch, next_shard))
+
+            series = []
+            for item in result:
+                labels = item.get("metric", {})
+                key = tuple(sorted(labels.items()))
+                timestamps, values = samples_to_arrays(item.get("values", []))
+                fresh = timestamps > last_timestamps.get(key, float("-inf"))
+                timestamps, values = timestamps[fresh], values[fresh]
+                if len(timestamps):
+                    last_timestamps[key] = float(timestamps[-1])
+                    series.append((labels, timestamps, values))
+            yield series
@@ -0,0 +1,201 @@
+# ml-model/pipelines/anomaly_core/pushdown.py
+"""
+Rolling features computed by Prometheus instead of the client
+
+pushdown_query wraps one metric's expression so a single range query returns
+the raw value and its rolling features as separate series, told apart by a
+"feature" label:
+
+- value: the expression itself
+- rolling_mean: avg_over_time over a window-sample subquery
+- rolling_std: stddev_over_time over the same subquery, rescaled from the
+  population to the sample std the client engine (pandas .std()) uses
+- rate_of_change: idelta over a two-sample subquery, i.e. value(t) - value(t - step)
+
+Subqueries evaluate the expression on the absolute step grid, so the range
+query must be evaluated on the same grid (align_window). The subquery range is
+(window - 1/2) steps, which holds exactly window grid points whether the range
+is left-closed (Prometheus 2) or left-open (Prometheus 3).
+
+The two engines differ by design in the first window - 1 rows of a range and
+after a scrape gap. Prometheus sees the samples before the range start and
+windows by time, while the client engine only sees the fetched rows and
+windows by row. validate_pushdown compares the two everywhere else.
+"""
+import math
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from .metrics import MetricSpec, align_series
+
+Series = Tuple[Dict[str, str], np.ndarray, np.ndarray]
+
+FEATURE_LABEL = 'feature'
+
+
+def _duration(seconds: float) -> str:
+    """PromQL duration literal, in milliseconds unless it is a whole number of seconds"""
+    if float(seconds).is_integer():
+        return f"{int(seconds)}s"
+    return f"{int(round(seconds * 1000))}ms"
+
+
+def align_window(start: float, end: float, step: float) -> Tuple[float, float]:
+    """Snap a range onto the absolute step grid the subqueries are evaluated on"""
+    return math.ceil(start / step) * step, math.floor(end / step) * step
+
+
+def pushdown_query(query: str, features: Sequence[str], step: float, window: int) -> str:
+    """
+    One PromQL expression returning a metric's value and its rolling features
+
+    Args:
+        query: The metric's expression, already formatted for a node selection
+        features: Features of the metric (see metrics.METRIC_FEATURES); the value
+            is always returned, it marks the rows that have data
+        step: Range-query step in seconds
+        window: Rolling window length in samples
+
+    Returns:
+        PromQL whose series carry feature="value", "rolling_mean", ... labels
+    """
+    step_literal = _duration(step)
+    rolling = f"({query})[{_duration((window - 0.5) * step)}:{step_literal}]"
+    previous = f"({query})[{_duration(1.5 * step)}:{step_literal}]"
+    expressions = {
+        'value': f"({query})",
+        'rolling_mean': f"avg_over_time({rolling})",
+        'rolling_std': (
+            f"stddev_over_time({rolling})"
+            f" * sqrt(count_over_time({rolling}) / clamp_min(count_over_time({rolling}) - 1, 1))"
+        ),
+        'rate_of_change': f"idelta({previous})",
+    }
+    wanted = ['value'] + [feature for feature in features if feature != 'value']
+    return "\nor ".join(
+        f'label_replace({expressions[feature]}, "{FEATURE_LABEL}", "{feature}", "", "")'
+        for feature in wanted
+    )
+
+
+def pushdown_queries(spec: MetricSpec, queries: Sequence[str], step: float) -> List[str]:
+    """pushdown_query for each metric of the spec, given its formatted query"""
+    if len(queries) != len(spec.metrics):
+        raise ValueError(f"Expected {len(spec.metrics)} queries for metrics {spec.metric_names}, got {len(queries)}")
+    return [
+        pushdown_query(query, metric['features'], step, spec.window)
+        for query, metric in zip(queries, spec.metrics)
+    ]
+
+
+def pushdown_features(spec: MetricSpec, series_per_metric: Sequence[Sequence[Series]]) -> List[Series]:
+    """
+    Assemble the feature matrix of each group from the results of pushdown_queries
+
+    Args:
+        spec: Spec the queries were built from
+        series_per_metric: Per metric, the (labels, timestamps, values) series of its push-down query
+
+    Returns:
+        (labels, timestamps, features) per group, like MetricSpec.compute_features
+        (rows where any metric has no value are dropped, columns follow spec.feature_columns)
+    """
+    # One pseudo-metric per (metric, feature) so align_series joins everything onto one index
+    columns: List[Tuple[int, str]] = []
+    per_column: List[List[Series]] = []
+    for m, (metric, series) in enumerate(zip(spec.metrics, series_per_metric)):
+        by_feature: Dict[str, List[Series]] = {}
+        for labels, timestamps, values in series:
+            labels = dict(labels)
+            feature = labels.pop(FEATURE_LABEL, 'value')
+            by_feature.setdefault(feature, []).append((labels, timestamps, values))
+        for feature in ['value'] + [f for f in metric['features'] if f != 'value']:
+            columns.append((m, feature))
+            per_column.append(by_feature.get(feature, []))
+
+    value_columns = [columns.index((m, 'value')) for m in range(len(spec.metrics))]
+    groups = []
+    for labels, timestamps, values in align_series(per_column):
+        keep = ~np.isnan(values[:, value_columns]).any(axis=1)
+        timestamps, values = timestamps[keep], values[keep]
+        matrix = []
+        for m, metric in enumerate(spec.metrics):
+            raw = values[:, columns.index((m, 'value'))]
+            for feature in metric['features']:
+                column = values[:, columns.index((m, feature))]
+                # A subquery that found too few points yields no sample; use what the client engine would
+                if feature == 'rolling_mean':
+                    column = np.where(np.isnan(column), raw, column)
+                elif feature in ('rolling_std', 'rate_of_change'):
+                    column = np.nan_to_num(column, nan=0.0)
+                matrix.append(column)
+        features = np.column_stack(matrix + spec.time_feature_columns(timestamps))
+        groups.append((labels, timestamps, features))
+    return groups
+
+
+def validate_pushdown(
+    spec: MetricSpec,
+    raw_groups: Sequence[Series],
+    pushed_groups: Sequence[Series],
+    step: float,
+    rtol: float = 1e-6,
+    atol: float = 1e-6
+) -> Dict[str, Any]:
+    """
+    Compare push-down features with the client engine on the same data
+
+    Rows in the first window - 1 samples of a group, or within window - 1 samples
+    after a scrape gap, are skipped: there the engines differ by design.
+
+    Args:
+        spec: Spec both feature sets follow
+        raw_groups: (labels, timestamps, values) per group, as from align_series
+        pushed_groups: (labels, timestamps, features) per group, from pushdown_features
+        step: Range-query step in seconds
+        rtol: Relative tolerance
+        atol: Absolute tolerance
+
+    Returns:
+        {'ok', 'groups', 'rows_compared', 'max_abs_error': {column: error}}
+    """
+    pushed = {tuple(sorted(labels.items())): (ts, features) for labels, ts, features in pushed_groups}
+    errors = np.zeros(len(spec.feature_columns))
+    ok = True
+    rows_compared = 0
+    groups = 0
+    for labels, timestamps, values in raw_groups:
+        key = tuple(sorted(labels.items()))
+        if key not in pushed:
+            ok = False
+            continue
+        timestamps, expected = spec.compute_features(timestamps, values)
+        pushed_timestamps, actual = pushed[key]
+
+        # Warm-up rows: the window still reaches before the range start or across a gap
+        row = np.arange(len(timestamps))
+        gap = np.concatenate(([True], np.diff(timestamps) > 1.5 * step))
+        segment_start = np.maximum.accumulate(np.where(gap, row, 0))
+        settled = row - segment_start >= spec.window - 1
+
+        common, expected_rows, actual_rows = np.intersect1d(
+            np.round(timestamps[settled], 3), np.round(pushed_timestamps, 3), return_indices=True
+        )
+        if len(common) < settled.sum():
+            ok = False
+        expected = expected[settled][expected_rows]
+        actual = actual[actual_rows]
+        difference = np.abs(expected - actual)
+        if len(common):
+            errors = np.maximum(errors, difference.max(axis=0))
+        ok = ok and bool(np.all(difference <= atol + rtol * np.abs(expected)))
+        rows_compared += len(common)
+        groups += 1
+
+    return {
+        'ok': ok and groups > 0,
+        'groups': groups,
+        'rows_compared': rows_compared,
+        'max_abs_error': dict(zip(spec.feature_columns, errors.tolist())),
+    }
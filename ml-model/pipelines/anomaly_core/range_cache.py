@@ -0,0 +1,246 @@
+# ml-model/pipelines/anomaly_core/range_cache.py
+"""
+LRU + TTL cache for Prometheus range-query results
+
+Entries are keyed by (PromQL, step) and hold every series the query returned
+over one contiguous, step-aligned window. A request for an overlapping or
+adjacent window only fetches the missing head and/or tail and splices it in,
+so repeated calls over a sliding "last N hours" window cost one small query
+each. A disjoint window replaces the entry.
+
+Samples newer than settle_seconds before the fetch are returned but not cached,
+since Prometheus may still revise them (late scrapes, rate windows).
+"""
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+Series = Tuple[Dict[str, str], np.ndarray, np.ndarray]
+_SeriesKey = Tuple[Tuple[str, str], ...]
+_Range = Tuple[float, float]
+
+# Rough per-series overhead (labels dict, tuples) added to the array sizes
+_SERIES_OVERHEAD_BYTES = 512
+
+
+class _Entry:
+    """Cached window [start, end] (both on the step grid) for one (query, step)"""
+
+    def __init__(self, start: float, end: float, series: Dict[_SeriesKey, Series], created: float):
+        self.start = start
+        self.end = end
+        self.series = series
+        self.created = created
+        self.nbytes = sum(
+            timestamps.nbytes + values.nbytes + _SERIES_OVERHEAD_BYTES
+            for _, timestamps, values in series.values()
+        )
+
+
+class RangeCache:
+    """Bounded cache of range-query results with partial-hit splicing"""
+
+    def __init__(
+        self,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttl_seconds: float = 300.0,
+        settle_seconds: float = 60.0
+    ):
+        """
+        Args:
+            max_bytes: Approximate memory budget; least recently used entries are evicted beyond it
+            ttl_seconds: Entries older than this are discarded and refetched
+            settle_seconds: Samples this close to the fetch time are not cached
+        """
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.settle_seconds = settle_seconds
+        self.hits = 0
+        self.partial_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[Tuple[str, float], _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def align(start: float, end: float, step: float) -> _Range:
+        """Snap a window onto the global step grid (start and end floored)"""
+        return math.floor(start / step) * step, math.floor(end / step) * step
+
+    def get(
+        self,
+        query: str,
+        start: float,
+        end: float,
+        step: float,
+        fetch: Callable[[float, float], List[Series]]
+    ) -> List[Series]:
+        """
+        Series for [start, end], calling fetch(start, end) only for uncached sub-ranges
+
+        Args:
+            query: PromQL expression (cache key)
+            start: Window start, epoch seconds
+            end: Window end, epoch seconds
+            step: Resolution in seconds (cache key); the window is aligned to it
+            fetch: Runs the range query for an aligned sub-range
+
+        Returns:
+            List of (labels, timestamps, values) covering the aligned window
+        """
+        start, end = self.align(start, end, step)
+        entry, missing = self._plan(query, step, start, end)
+        fetched = [(window, fetch(*window)) for window in missing]
+        return self._splice(query, step, start, end, entry, fetched)
+
+    async def aget(
+        self,
+        query: str,
+        start: float,
+        end: float,
+        step: float,
+        fetch: Callable[[float, float], Awaitable[List[Series]]]
+    ) -> List[Series]:
+        """Async version of get; missing sub-ranges are fetched concurrently"""
+        start, end = self.align(start, end, step)
+        entry, missing = self._plan(query, step, start, end)
+        results = await asyncio.gather(*(fetch(*window) for window in missing))
+        return self._splice(query, step, start, end, entry, list(zip(missing, results)))
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.partial_hits + self.misses
+        return {
+            'hits': self.hits,
+            'partial_hits': self.partial_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_ratio': round((self.hits + self.partial_hits) / lookups, 4) if lookups else 0.0,
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _plan(self, query: str, step: float, start: float, end: float) -> Tuple[Optional[_Entry], List[_Range]]:
+        """
+        Cached entry to splice with, if any, and the sub-ranges of [start, end] to fetch
+
+        Entries are never modified in place, so the returned entry stays valid
+        while the caller fetches without holding the lock.
+        """
+        with self._lock:
+            entry = self._live_entry((query, step))
+            if entry is None or end < entry.start - step or start > entry.end + step:
+                self.misses += 1
+                return None, [(start, end)]
+
+            missing = []
+            if start < entry.start:
+                missing.append((start, entry.start - step))
+            if end > entry.end:
+                missing.append((entry.end + step, end))
+            if missing:
+                self.partial_hits += 1
+            else:
+                self.hits += 1
+            return entry, missing
+
+    def _splice(
+        self,
+        query: str,
+        step: float,
+        start: float,
+        end: float,
+        entry: Optional[_Entry],
+        fetched: List[Tuple[_Range, List[Series]]]
+    ) -> List[Series]:
+        """Merge fetched sub-ranges into the entry, store the settled part, return [start, end]"""
+        parts: List[Tuple[float, Dict[_SeriesKey, Series]]] = []
+        if entry is not None:
+            parts.append((entry.start, entry.series))
+        for (window_start, _), series in fetched:
+            parts.append((window_start, {_series_key(labels): (labels, t, v) for labels, t, v in series}))
+        merged = _merge(parts) if fetched else entry.series
+
+        if fetched:
+            window_start = min(start, entry.start) if entry is not None else start
+            settled_end = math.floor((time.time() - self.settle_seconds) / step) * step
+            window_end = min(max(end, entry.end) if entry is not None else end, settled_end)
+            # A spliced entry keeps its creation time, so TTL bounds the age of its oldest samples
+            created = entry.created if entry is not None else time.time()
+            with self._lock:
+                self._store((query, step), window_start, window_end, merged, created)
+
+        result = []
+        for labels, timestamps, values in merged.values():
+            in_window = (timestamps >= start) & (timestamps <= end)
+            if in_window.any():
+                result.append((labels, timestamps[in_window], values[in_window]))
+        return result
+
+    def _live_entry(self, key: Tuple[str, float]) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry.created > self.ttl_seconds:
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _store(self, key: Tuple[str, float], start: float, end: float, series: Dict[_SeriesKey, Series], created: float) -> None:
+        if key in self._entries:
+            self._remove(key)
+        if end < start:
+            return
+
+        trimmed = {}
+        for series_key, (labels, t, v) in series.items():
+            keep = t <= end
+            trimmed[series_key] = (labels, t[keep], v[keep])
+        entry = _Entry(start, end, trimmed, created)
+        if entry.nbytes > self.max_bytes:
+            return
+
+        self._entries[key] = entry
+        self._bytes += entry.nbytes
+        while self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: Tuple[str, float]) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry.nbytes
+
+
+def _series_key(labels: Dict[str, str]) -> _SeriesKey:
+    return tuple(sorted(labels.items()))
+
+
+def _merge(parts: List[Tuple[float, Dict[_SeriesKey, Series]]]) -> Dict[_SeriesKey, Series]:
+    """Concatenate per-series arrays of several windows in time order, dropping duplicate timestamps"""
+    merged: Dict[_SeriesKey, List[Series]] = {}
+    for _, series in sorted(parts, key=lambda part: part[0]):
+        for key, item in series.items():
+            merged.setdefault(key, []).append(item)
+
+    result = {}
+    for key, items in merged.items():
+        timestamps = np.concatenate([t for _, t, _ in items])
+        values = np.concatenate([v for _, _, v in items])
+        order = np.argsort(timestamps, kind='stable')
+        timestamps, values = timestamps[order], values[order]
+        unique = np.ones(len(timestamps), dtype=bool)
+        unique[1:] = timestamps[1:] != timestamps[:-1]
+        result[key] = (items[-1][0], timestamps[unique], values[unique])
+    return result
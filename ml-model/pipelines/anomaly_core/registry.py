@@ -0,0 +1,120 @@
+# ml-model/pipelines/anomaly_core/registry.py
+"""
+Per-instance model packages and routing
+
+The per-instance pipeline trains one model per node plus a fleet-wide default
+and packages them into one artifact served by a single multi-model predictor:
+
+    model_index.json              {"default": "default", "models": {instance: model name}}
+    default/model_flat.npz
+    node-10-0-0-194-9100/model_flat.npz
+    ...
+
+Model names are derived from the instance label, so the MCP tool can route an
+instance to its model by checking which names the deployment serves
+(ModelRouter) without reading the package itself.
+"""
+import json
+import os
+import re
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+MODEL_INDEX_FILENAME = "model_index.json"
+MODEL_INFO_FILENAME = "model_info.json"
+DEFAULT_MODEL_DIR = "default"
+
+_INVALID_NAME_CHARS = re.compile(r'[^a-z0-9]+')
+
+
+def model_name_for(instance: str) -> str:
+    """
+    Serving name of an instance's model, e.g. "10.0.0.194:9100" -> "node-10-0-0-194-9100"
+
+    Names only use [a-z0-9-] so they are valid in KServe model URLs.
+    """
+    slug = _INVALID_NAME_CHARS.sub('-', instance.lower()).strip('-')
+    if not slug:
+        raise ValueError(f"Cannot derive a model name from instance {instance!r}")
+    return f"node-{slug}"
+
+
+def write_model_index(directory: str, models: Dict[str, str], default: Optional[str] = DEFAULT_MODEL_DIR) -> str:
+    """
+    Write the package index
+
+    Args:
+        directory: Package root
+        models: Instance -> model name (also the model's subdirectory)
+        default: Subdirectory of the fleet-wide model, or None
+
+    Returns:
+        Path of the index file
+    """
+    path = os.path.join(directory, MODEL_INDEX_FILENAME)
+    with open(path, 'w') as f:
+        json.dump({'default': default, 'models': models}, f, indent=2, sort_keys=True)
+    return path
+
+
+def read_model_index(directory: str) -> Optional[Dict[str, object]]:
+    """Index of a package directory, or None for a single-model artifact"""
+    path = os.path.join(directory, MODEL_INDEX_FILENAME)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+class ModelRouter:
+    """
+    Maps instances to served model names, with a TTL-cached list of available models
+
+    Instances without their own model, and every instance while the model list
+    cannot be fetched, route to the default model.
+    """
+
+    def __init__(
+        self,
+        default_model: str,
+        list_models: Callable[[], Iterable[str]],
+        ttl_seconds: float = 60.0
+    ):
+        """
+        Args:
+            default_model: Model used for instances without a model of their own
+            list_models: Returns the model names currently served
+            ttl_seconds: How long a fetched model list is reused
+        """
+        self.default_model = default_model
+        self.ttl_seconds = ttl_seconds
+        self._list_models = list_models
+        self._models: frozenset = frozenset()
+        self._fetched_at = float('-inf')
+        self._lock = threading.Lock()
+
+    def route(self, instance: str) -> str:
+        """Model name to score instance with"""
+        if not instance:
+            return self.default_model
+        name = model_name_for(instance)
+        return name if name in self.available() else self.default_model
+
+    def available(self) -> frozenset:
+        """Served model names, refetched once the cached list is older than the TTL"""
+        with self._lock:
+            if time.monotonic() - self._fetched_at < self.ttl_seconds:
+                return self._models
+            try:
+                self._models = frozenset(self._list_models())
+            except Exception as e:
+                print(f"Warning: could not list served models, routing to {self.default_model}: {e}")
+            # Also on failure, so a down predictor is not polled on every call
+            self._fetched_at = time.monotonic()
+            return self._models
+
+    def invalidate(self) -> None:
+        """Refetch the model list on the next route, e.g. after a new deployment"""
+        with self._lock:
+            self._fetched_at = float('-inf')
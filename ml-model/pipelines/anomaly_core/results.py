@@ -0,0 +1,89 @@
+# ml-model/pipelines/anomaly_core/results.py
+"""
+On-disk store for full prediction results
+
+Tool responses only carry a summary; the complete per-sample arrays are saved
+here under a short id that a follow-up call can page through. The store keeps
+the most recent max_results files and deletes older ones.
+"""
+import json
+import os
+import re
+import threading
+import uuid
+from typing import Any, Dict, Mapping, Tuple
+
+import numpy as np
+
+_RESULT_ID_RE = re.compile(r'^[0-9a-f]{12}$')
+
+
+class ResultStore:
+    """Saves and loads full results as compressed .npz files"""
+
+    def __init__(self, directory: str = "/tmp/anomaly-results", max_results: int = 200):
+        """
+        Args:
+            directory: Where result files are written
+            max_results: Number of most recent results kept on disk
+        """
+        self.directory = directory
+        self.max_results = max_results
+        self._lock = threading.Lock()
+
+    def save(self, arrays: Mapping[str, np.ndarray], metadata: Mapping[str, Any]) -> str:
+        """
+        Store one result
+
+        Args:
+            arrays: Per-sample columns, all the same length
+            metadata: JSON-serializable description (query, window, counts)
+
+        Returns:
+            Result id for load()
+        """
+        result_id = uuid.uuid4().hex[:12]
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(result_id)
+        partial_path = f"{path}.partial"
+        with open(partial_path, "wb") as f:
+            np.savez_compressed(f, _metadata=np.array(json.dumps(dict(metadata))), **arrays)
+        os.replace(partial_path, path)
+        self._prune()
+        return result_id
+
+    def load(self, result_id: str) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+        """
+        Load a stored result
+
+        Returns:
+            (metadata, arrays)
+        """
+        if not _RESULT_ID_RE.match(result_id or ""):
+            raise ValueError(f"Invalid result id: {result_id!r}")
+        path = self._path(result_id)
+        if not os.path.exists(path):
+            raise ValueError(f"Result {result_id} not found (it may have expired)")
+
+        with np.load(path) as data:
+            metadata = json.loads(str(data["_metadata"]))
+            arrays = {name: data[name] for name in data.files if name != "_metadata"}
+        return metadata, arrays
+
+    def _path(self, result_id: str) -> str:
+        return os.path.join(self.directory, f"{result_id}.npz")
+
+    def _prune(self) -> None:
+        with self._lock:
+            entries = [
+                entry for entry in os.scandir(self.directory)
+                if entry.is_file() and entry.name.endswith(".npz")
+            ]
+            if len(entries) <= self.max_results:
+                return
+            entries.sort(key=lambda entry: entry.stat().st_mtime)
+            for entry in entries[:len(entries) - self.max_results]:
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
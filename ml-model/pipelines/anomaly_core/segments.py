@@ -0,0 +1,113 @@
+# ml-model/pipelines/anomaly_core/segments.py
+"""
+Run-length segmentation of per-sample anomaly flags into anomaly periods
+"""
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+def anomaly_runs(
+    mask: np.ndarray,
+    segment_ids: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Find runs of consecutive True values
+
+    Args:
+        mask: 1-D boolean array, True where a sample is anomalous
+        segment_ids: Optional per-row series id; runs never span two series
+
+    Returns:
+        (starts, ends) as int64 index arrays; ends are inclusive
+    """
+    mask = np.asarray(mask, dtype=bool)
+    if len(mask) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    split = np.zeros(len(mask) - 1, dtype=bool)
+    if segment_ids is not None:
+        segment_ids = np.asarray(segment_ids)
+        split = segment_ids[1:] != segment_ids[:-1]
+
+    # A run opens where the previous row is normal or in another series, and closes likewise
+    opens = np.concatenate(([True], ~mask[:-1] | split))
+    closes = np.concatenate((~mask[1:] | split, [True]))
+    return np.flatnonzero(mask & opens), np.flatnonzero(mask & closes)
+
+
+def anomaly_periods(
+    timestamps: np.ndarray,
+    mask: np.ndarray,
+    step_seconds: float,
+    segment_ids: Optional[np.ndarray] = None,
+    max_gap_seconds: float = 0.0,
+    min_duration_seconds: float = 0.0
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Anomaly periods from flags and real timestamps, in one vectorized pass
+
+    Runs are split wherever samples are missing (timestamp delta above 1.5
+    steps), so a scrape gap never stretches a period. Periods separated by at
+    most max_gap_seconds of normal or missing data are then merged, and periods
+    shorter than min_duration_seconds are dropped.
+
+    Args:
+        timestamps: float64 epoch seconds per row, ascending within each series
+        mask: True where a sample is anomalous
+        step_seconds: Query resolution; each sample covers one step
+        segment_ids: Optional per-row series id; periods never span two series
+        max_gap_seconds: Merge periods whose gap is at most this long (0 keeps them apart)
+        min_duration_seconds: Drop periods shorter than this
+
+    Returns:
+        (starts, ends, durations): inclusive row indices and duration in seconds per period
+    """
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    if segment_ids is None:
+        segment_ids = np.zeros(len(timestamps), dtype=np.int64)
+    segment_ids = np.asarray(segment_ids)
+
+    # Treat each stretch of contiguous samples as its own segment
+    breaks = np.zeros(len(timestamps), dtype=np.int64)
+    if len(timestamps) > 1:
+        breaks[1:] = (np.diff(timestamps) > 1.5 * step_seconds) | (segment_ids[1:] != segment_ids[:-1])
+    starts, ends = anomaly_runs(mask, np.cumsum(breaks))
+
+    if max_gap_seconds > 0 and len(starts) > 1:
+        gaps = timestamps[starts[1:]] - timestamps[ends[:-1]] - step_seconds
+        same_series = segment_ids[starts[1:]] == segment_ids[ends[:-1]]
+        opens = np.concatenate(([True], (gaps > max_gap_seconds) | ~same_series))
+        keep_ends = np.concatenate((opens[1:], [True]))
+        starts, ends = starts[opens], ends[keep_ends]
+
+    durations = timestamps[ends] - timestamps[starts] + step_seconds
+    keep = durations >= min_duration_seconds
+    return starts[keep], ends[keep], durations[keep]
+
+
+def run_max(values: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Maximum of values over each inclusive [start, end] run"""
+    values = np.asarray(values, dtype=np.float64)
+    if len(starts) == 0:
+        return np.empty(0, dtype=np.float64)
+    # reduceat over interleaved (start, end + 1) bounds; the odd slots are discarded
+    bounds = np.empty(2 * len(starts), dtype=np.int64)
+    bounds[0::2] = starts
+    bounds[1::2] = ends + 1
+    padded = np.append(values, -np.inf)
+    return np.maximum.reduceat(padded, bounds)[0::2]
+
+
+def run_min(values: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Minimum of values over each inclusive [start, end] run"""
+    return -run_max(-np.asarray(values, dtype=np.float64), starts, ends)
+
+
+def run_mean(values: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Mean of values over each inclusive [start, end] run"""
+    values = np.asarray(values, dtype=np.float64)
+    if len(starts) == 0:
+        return np.empty(0, dtype=np.float64)
+    totals = np.concatenate(([0.0], np.cumsum(values)))
+    return (totals[ends + 1] - totals[starts]) / (ends - starts + 1)
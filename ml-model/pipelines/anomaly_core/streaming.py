@@ -0,0 +1,136 @@
+# ml-model/pipelines/anomaly_core/streaming.py
+"""
+Incremental feature state for polling the same series repeatedly.
+
+RollingFeatureState keeps only the trailing raw samples the rolling window
+needs, so each update costs O(new samples) and produces exactly the rows
+compute_features would produce over the full history. RingBuffer holds the
+last N rows of per-sample results in preallocated arrays.
+"""
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+
+from .features import ROLLING_WINDOW, feature_matrix
+
+
+class RollingFeatureState:
+    """Running rolling-window state for one series or one group of aligned series"""
+
+    def __init__(
+        self,
+        window: int = ROLLING_WINDOW,
+        featurize: Optional[Callable[[np.ndarray, np.ndarray], np.ndarray]] = None
+    ):
+        """
+        Args:
+            window: Rolling window length in samples
+            featurize: (timestamps, values) -> feature matrix, e.g. MetricSpec.feature_matrix
+                for (n, n_metrics) values; defaults to the single-series feature_matrix
+        """
+        self.window = window
+        self._featurize = featurize or (lambda timestamps, values: feature_matrix(timestamps, values, self.window))
+        self._tail_timestamps = np.empty(0, dtype=np.float64)
+        self._tail_values = np.empty(0, dtype=np.float64)
+
+    @property
+    def last_timestamp(self) -> float:
+        """Timestamp of the newest raw sample seen, or -inf before the first update"""
+        return float(self._tail_timestamps[-1]) if len(self._tail_timestamps) else float('-inf')
+
+    @property
+    def tail(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Trailing raw samples the next update builds on
+
+        Passing them to update() on a fresh state resumes the rolling window,
+        e.g. across pipeline runs.
+        """
+        return self._tail_timestamps.copy(), self._tail_values.copy()
+
+    def update(self, timestamps: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Feed new raw samples and return features for them
+
+        Samples at or before the last seen timestamp are ignored, so overlapping
+        fetches can be passed in as-is.
+
+        Args:
+            timestamps: float64 epoch seconds, ascending
+            values: float64 metric values, (n,) or (n, n_metrics)
+
+        Returns:
+            (timestamps, features) for the new non-NaN samples
+        """
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64)
+        fresh = timestamps > self.last_timestamp
+        timestamps, values = timestamps[fresh], values[fresh]
+
+        all_timestamps = np.concatenate((self._tail_timestamps, timestamps))
+        all_values = np.concatenate((self._tail_values, values)) if len(self._tail_values) else values
+        features = self._featurize(all_timestamps, all_values)[len(self._tail_values):]
+
+        keep_tail = max(self.window - 1, 1)
+        self._tail_timestamps = all_timestamps[-keep_tail:]
+        self._tail_values = all_values[-keep_tail:]
+
+        keep = ~(np.isnan(values).any(axis=1) if values.ndim > 1 else np.isnan(values))
+        return timestamps[keep], features[keep]
+
+
+class RingBuffer:
+    """Fixed-capacity FIFO of timestamped rows; the oldest rows are overwritten"""
+
+    def __init__(self, capacity: int, width: int):
+        self.capacity = capacity
+        self.width = width
+        self._timestamps = np.empty(capacity, dtype=np.float64)
+        self._rows = np.empty((capacity, width), dtype=np.float64)
+        self._start = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def oldest_timestamp(self) -> float:
+        return float(self._timestamps[self._start]) if self._size else float('inf')
+
+    @property
+    def newest_timestamp(self) -> float:
+        if not self._size:
+            return float('-inf')
+        return float(self._timestamps[(self._start + self._size - 1) % self.capacity])
+
+    def append(self, timestamps: np.ndarray, rows: np.ndarray) -> None:
+        """Append rows in timestamp order, evicting the oldest when full"""
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        rows = np.asarray(rows, dtype=np.float64).reshape(len(timestamps), self.width)
+        if len(timestamps) > self.capacity:
+            timestamps, rows = timestamps[-self.capacity:], rows[-self.capacity:]
+
+        n = len(timestamps)
+        positions = (self._start + self._size + np.arange(n)) % self.capacity
+        self._timestamps[positions] = timestamps
+        self._rows[positions] = rows
+
+        overflow = max(self._size + n - self.capacity, 0)
+        self._start = (self._start + overflow) % self.capacity
+        self._size = min(self._size + n, self.capacity)
+
+    def since(self, start_timestamp: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Rows with timestamp >= start_timestamp, oldest first
+
+        Returns:
+            (timestamps, rows) as ordered copies
+        """
+        order = (self._start + np.arange(self._size)) % self.capacity
+        timestamps = self._timestamps[order]
+        first = int(np.searchsorted(timestamps, start_timestamp, side='left'))
+        return timestamps[first:], self._rows[order[first:]]
+
+    def clear(self) -> None:
+        self._start = 0
+        self._size = 0
@@ -0,0 +1,191 @@
+# ml-model/pipelines/anomaly_core/telemetry.py
+"""
+Prometheus metrics and OpenTelemetry spans for the MCP tool's hot path
+
+Every stage of a tool call (Prometheus query, feature engineering, inference
+request, post-processing, response formatting) runs inside Telemetry.stage(),
+which records its duration in one histogram, counts its exceptions, and opens
+a span. Spans nest under the server span FastMCP opens per tool call, and the
+trace context is injected into KServe requests, so one trace shows where a
+slow answer spent its time.
+
+Cold-start cost is reported separately: how long the module import and the
+background warm-up took, and how long the first call of each stage took, to
+compare against the stage histogram.
+
+prometheus_client and opentelemetry are only used when installed: without
+prometheus_client the metrics are no-ops, and without an OpenTelemetry SDK
+(see configure_tracing) spans are not recorded.
+"""
+import os
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+# Upper bounds in seconds: a cached query is ~1ms, a week-long fleet sweep tens of seconds
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Telemetry:
+    """Stage timings, payload and row gauges, cache hit ratios and error counts"""
+
+    def __init__(self, namespace: str = "anomaly_tool", tracer_name: str = "anomaly-detection-tool"):
+        """
+        Args:
+            namespace: Prefix of every metric name
+            tracer_name: Instrumentation scope of the spans
+        """
+        self.enabled = False
+        self._tracer = None
+        self._propagate = None
+        try:
+            import prometheus_client
+        except ImportError:
+            print("Warning: prometheus_client is not installed, tool metrics are disabled")
+        else:
+            self._prometheus_client = prometheus_client
+            # Own registry: several tools in one process do not clash, and /metrics shows only these
+            self.registry = prometheus_client.CollectorRegistry()
+            self._stage_seconds = prometheus_client.Histogram(
+                f"{namespace}_stage_duration_seconds", "Time spent per tool stage",
+                ['stage'], buckets=STAGE_BUCKETS, registry=self.registry
+            )
+            self._errors = prometheus_client.Counter(
+                f"{namespace}_errors_total", "Exceptions per stage or tool",
+                ['stage', 'error'], registry=self.registry
+            )
+            self._payload_bytes = prometheus_client.Gauge(
+                f"{namespace}_payload_bytes", "Size of the most recent payload of each kind",
+                ['kind'], registry=self.registry
+            )
+            self._rows = prometheus_client.Gauge(
+                f"{namespace}_rows", "Rows handled by the most recent call of each stage",
+                ['stage'], registry=self.registry
+            )
+            self._cache_hit_ratio = prometheus_client.Gauge(
+                f"{namespace}_cache_hit_ratio", "Share of lookups served (fully or partly) from cache",
+                ['cache'], registry=self.registry
+            )
+            self._startup_seconds = prometheus_client.Gauge(
+                f"{namespace}_startup_seconds", "Duration of each start-up phase (import, warm_up)",
+                ['phase'], registry=self.registry
+            )
+            self._first_call_seconds = prometheus_client.Gauge(
+                f"{namespace}_first_call_seconds", "Duration of the first call of each stage since start",
+                ['stage'], registry=self.registry
+            )
+            self._feature_source = prometheus_client.Gauge(
+                f"{namespace}_feature_source", "1 for the engine computing full-fetch features, else 0",
+                ['source'], registry=self.registry
+            )
+            self.enabled = True
+        self._called_stages: set = set()
+
+        try:
+            from opentelemetry import propagate, trace
+        except ImportError:
+            pass
+        else:
+            self._tracer = trace.get_tracer(tracer_name)
+            self._propagate = propagate
+
+    @contextmanager
+    def stage(self, name: str, **attributes: Any) -> Iterator[Any]:
+        """
+        Time a stage, count its exceptions and trace it as a span
+
+        Args:
+            name: Stage label, e.g. "prometheus_query"
+            attributes: Span attributes (str, bool, int or float)
+
+        Yields:
+            The span (record more attributes with set_attribute), or None without OpenTelemetry
+        """
+        span_context = (
+            self._tracer.start_as_current_span(f"anomaly.{name}", attributes=attributes)
+            if self._tracer is not None else nullcontext()
+        )
+        started = time.perf_counter()
+        with span_context as span:
+            try:
+                yield span
+            except Exception as e:
+                self.count_error(name, e)
+                raise
+            finally:
+                if self.enabled:
+                    elapsed = time.perf_counter() - started
+                    self._stage_seconds.labels(stage=name).observe(elapsed)
+                    if name not in self._called_stages:
+                        self._called_stages.add(name)
+                        self._first_call_seconds.labels(stage=name).set(elapsed)
+
+    def observe_startup(self, phase: str, seconds: float) -> None:
+        """Record how long a start-up phase took, e.g. "import" or "warm_up" """
+        if self.enabled:
+            self._startup_seconds.labels(phase=phase).set(seconds)
+
+    def count_error(self, stage: str, error: BaseException) -> None:
+        if self.enabled:
+            self._errors.labels(stage=stage, error=type(error).__name__).inc()
+
+    def observe_feature_source(self, source: str) -> None:
+        """Record which engine computes full-fetch features: "client" or "prometheus" """
+        if self.enabled:
+            for name in ("client", "prometheus"):
+                self._feature_source.labels(source=name).set(1 if name == source else 0)
+
+    def observe_payload(self, kind: str, size_bytes: int) -> None:
+        """Record a payload size, e.g. kind "inference_request" or "tool_response" """
+        if self.enabled:
+            self._payload_bytes.labels(kind=kind).set(size_bytes)
+
+    def observe_rows(self, stage: str, rows: int) -> None:
+        if self.enabled:
+            self._rows.labels(stage=stage).set(rows)
+
+    def track_cache(self, cache: str, hit_ratio: Callable[[], float]) -> None:
+        """Report hit_ratio() as the cache's hit ratio on every scrape"""
+        if self.enabled:
+            self._cache_hit_ratio.labels(cache=cache).set_function(hit_ratio)
+
+    def trace_headers(self, headers: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        """headers plus the W3C trace context of the current span, for outgoing requests"""
+        headers = dict(headers or {})
+        if self._propagate is not None:
+            self._propagate.inject(headers)
+        return headers
+
+    def render(self) -> Tuple[bytes, str]:
+        """(body, content type) of the Prometheus text exposition"""
+        if not self.enabled:
+            return b"# prometheus_client is not installed\n", "text/plain; charset=utf-8"
+        return self._prometheus_client.generate_latest(self.registry), self._prometheus_client.CONTENT_TYPE_LATEST
+
+
+def configure_tracing(service_name: str) -> bool:
+    """
+    Export spans over OTLP when OTEL_EXPORTER_OTLP_ENDPOINT is set
+
+    Uses the standard OTEL_* environment variables, e.g.
+    OTEL_EXPORTER_OTLP_ENDPOINT=http://jaeger-collector.jaeger.svc.cluster.local:4317
+
+    Returns:
+        True if a tracer provider was installed
+    """
+    if not os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT"):
+        return False
+    try:
+        from opentelemetry import trace
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    except ImportError as e:
+        print(f"Warning: OTEL_EXPORTER_OTLP_ENDPOINT is set but the OpenTelemetry SDK is missing: {e}")
+        return False
+
+    provider = TracerProvider(resource=Resource.create({"service.name": os.getenv("OTEL_SERVICE_NAME", service_name)}))
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    trace.set_tracer_provider(provider)
+    return True
@@ -0,0 +1,310 @@
+# ml-model/pipelines/anomaly_core/training.py
+"""
+Model training, export and hyperparameter sweeps for the pipeline components
+
+save_model writes everything a model artifact holds (model.pkl, the flat
+export and model_info.json), so single runs and sweeps publish identical
+artifacts.
+
+A sweep fits every candidate on most of the training window and scores it on
+held-out rows spread across the whole window, which the model has not seen.
+Holding out the newest slice instead would put the hour feature outside
+anything the model was fitted on and flag most of the slice:
+
+- instability: 1 - Jaccard overlap of the anomalies flagged by two fits
+  with different seeds; a configuration whose verdicts depend on the seed
+  is not trustworthy
+- calibration error: absolute gap between the held-out anomaly rate and
+  the contamination the model was configured with; a large gap means the
+  learned threshold does not carry over to unseen rows
+- latency: per-row cost of the flat forest that serves the model
+
+objective = instability + calibration_weight * calibration error
+            + latency_weight * (latency / fastest latency - 1),
+lower is better. The absolute gap is at most the anomaly rate itself, so it
+cannot drown out the other terms the way a gap relative to a small
+contamination would.
+
+load_training_sample streams a features dataset into a float32 matrix, whole
+or as a bounded sample (uniform reservoir, or stratified by hour of day), so
+the training pod's memory does not grow with the training window. sklearn's
+IsolationForest converts its input to float32 anyway, so the float32 matrix
+trains the same model at half the memory.
+
+sklearn is only imported when a model is fitted, so importing this module
+does not require it.
+"""
+import itertools
+import json
+import os
+import pickle
+import random
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .datasets import ROW_GROUP_ROWS, TIMESTAMP_COLUMN, iter_dataset
+from .feature_store import DecayedSample, sample_keys
+from .features import hour_of_day
+from .forest import FLAT_MODEL_FILENAME, FlatIsolationForest
+from .registry import MODEL_INFO_FILENAME
+
+RANDOM_STATE = 42
+LATENCY_REPEATS = 3
+SAMPLING_METHODS = ("reservoir", "hour")
+
+
+def fit_isolation_forest(X: np.ndarray, contamination: float, n_estimators: int, random_state: int = RANDOM_STATE):
+    from sklearn.ensemble import IsolationForest
+
+    model = IsolationForest(contamination=contamination, random_state=random_state, n_estimators=n_estimators)
+    model.fit(X)
+    return model
+
+
+def load_training_sample(
+    path: str,
+    max_samples: int = 0,
+    sampling: str = "reservoir",
+    batch_rows: int = ROW_GROUP_ROWS,
+    seed: int = RANDOM_STATE
+) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """
+    Training rows of a features dataset as float32, read batch by batch
+
+    Args:
+        path: Features dataset (Parquet)
+        max_samples: Rows to keep; 0 keeps every row
+        sampling: "reservoir" keeps a uniform random sample; "hour" keeps up to
+            max_samples / 24 uniform rows per hour of day (UTC), so hours with few
+            samples are not crowded out, and an hour with fewer rows keeps all of them
+        batch_rows: Rows read per batch
+        seed: Seed of the sample
+
+    Returns:
+        (columns, timestamps, X): feature column names, and the kept rows in time
+        order as float64 epoch seconds and a float32 matrix
+    """
+    import pyarrow.parquet as pq
+
+    if sampling not in SAMPLING_METHODS:
+        raise ValueError(f"sampling must be one of {SAMPLING_METHODS}, got {sampling!r}")
+    columns = [name for name in pq.read_schema(path).names if name != TIMESTAMP_COLUMN]
+    batches = iter_dataset(path, columns, batch_rows=batch_rows, dtype=np.float32)
+
+    if max_samples <= 0:
+        n_rows = pq.read_metadata(path).num_rows
+        timestamps = np.empty(n_rows, dtype=np.float64)
+        X = np.empty((n_rows, len(columns)), dtype=np.float32)
+        offset = 0
+        for batch_timestamps, values in batches:
+            timestamps[offset:offset + len(values)] = batch_timestamps
+            X[offset:offset + len(values)] = values
+            offset += len(values)
+        return columns, timestamps, X
+
+    rng = np.random.default_rng(seed)
+    if sampling == "reservoir":
+        sample = DecayedSample(max_samples, len(columns), dtype=np.float32)
+        for batch_timestamps, values in batches:
+            sample.offer(batch_timestamps, values, sample_keys(batch_timestamps, 0.0, rng))
+        timestamps, X = sample.sorted()
+        return columns, timestamps, X
+
+    # One reservoir per hour of day, the remainder going to the first hours
+    quotas = [max_samples // 24 + (1 if hour < max_samples % 24 else 0) for hour in range(24)]
+    strata = {hour: DecayedSample(quota, len(columns), dtype=np.float32) for hour, quota in enumerate(quotas) if quota}
+    for batch_timestamps, values in batches:
+        hours = hour_of_day(batch_timestamps).astype(np.int64)
+        keys = sample_keys(batch_timestamps, 0.0, rng)
+        for hour, sample in strata.items():
+            rows = hours == hour
+            if rows.any():
+                sample.offer(batch_timestamps[rows], values[rows], keys[rows])
+    timestamps = np.concatenate([sample.timestamps for sample in strata.values()])
+    X = np.concatenate([sample.features for sample in strata.values()])
+    order = np.argsort(timestamps, kind='stable')
+    return columns, timestamps[order], X[order]
+
+
+def peak_rss_bytes() -> int:
+    """Peak resident set size of this process so far (Linux reports ru_maxrss in KiB)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def save_model(directory: str, model, X: np.ndarray, instance: str = "") -> Dict[str, Any]:
+    """
+    Write a model artifact: model.pkl, the verified flat export and model_info.json
+
+    Args:
+        directory: Model artifact directory (created if needed)
+        model: Fitted IsolationForest
+        X: Training matrix (array or DataFrame), used to check the flat export agrees with sklearn
+        instance: Instance the model is for, "" for a fleet-wide model
+
+    Returns:
+        Training metrics (sample counts, anomaly split, flat model size)
+    """
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, "model.pkl"), 'wb') as f:
+        pickle.dump(model, f)
+
+    # Export the array-backed forest used by the flat-forest predictor and local scoring,
+    # and check it agrees with sklearn before publishing it. Both score float32, so X is
+    # passed as is: a float32 training matrix is not copied at all
+    predictions = model.predict(X)
+    flat_model = FlatIsolationForest.from_sklearn(model)
+    if not (flat_model.predict(X) == predictions).all():
+        raise ValueError("Flattened model predictions differ from the sklearn model")
+    flat_model.save(os.path.join(directory, FLAT_MODEL_FILENAME))
+
+    # Lets package_models_component tell per-instance models apart
+    with open(os.path.join(directory, MODEL_INFO_FILENAME), 'w') as f:
+        json.dump({'instance': instance, 'n_features': X.shape[1], 'training_samples': len(X)}, f)
+
+    anomalies = int((predictions == -1).sum())
+    normal = int((predictions == 1).sum())
+    return {
+        'training_samples': len(X),
+        'n_features': X.shape[1],
+        'normal_samples': normal,
+        'anomalies_detected': anomalies,
+        'normal_percentage': float(normal / len(X) * 100),
+        'anomalies_percentage': float(anomalies / len(X) * 100),
+        'flat_model_nodes': flat_model.n_nodes
+    }
+
+
+def sweep_grid(
+    contamination_values: Sequence[float],
+    n_estimators_values: Sequence[int],
+    max_trials: int = 0,
+    seed: int = RANDOM_STATE
+) -> List[Dict[str, Any]]:
+    """
+    Candidate configurations: the full grid, or a random subset of it
+
+    Args:
+        contamination_values: Contamination candidates, each in (0, 0.5]
+        n_estimators_values: Tree count candidates
+        max_trials: Random subset size; 0 (or at least the grid size) keeps the whole grid
+        seed: Seed of the random subset
+
+    Returns:
+        [{'contamination': ..., 'n_estimators': ...}, ...]
+    """
+    if not contamination_values or not n_estimators_values:
+        raise ValueError("A sweep needs at least one contamination and one n_estimators value")
+    for contamination in contamination_values:
+        if not 0 < contamination <= 0.5:
+            raise ValueError(f"contamination must be in (0, 0.5], got {contamination}")
+    for n_estimators in n_estimators_values:
+        if n_estimators < 1:
+            raise ValueError(f"n_estimators must be at least 1, got {n_estimators}")
+
+    grid = [
+        {'contamination': float(c), 'n_estimators': int(n)}
+        for c, n in itertools.product(sorted(set(contamination_values)), sorted(set(n_estimators_values)))
+    ]
+    if 0 < max_trials < len(grid):
+        grid = random.Random(seed).sample(grid, max_trials)
+    return grid
+
+
+def split_holdout(
+    X: np.ndarray,
+    holdout_fraction: float,
+    seed: int = RANDOM_STATE
+) -> Tuple[np.ndarray, np.ndarray]:
+    """(train, holdout) with a random holdout_fraction of the rows held out, both in time order"""
+    if not 0 < holdout_fraction < 1:
+        raise ValueError(f"holdout_fraction must be in (0, 1), got {holdout_fraction}")
+    n_holdout = int(round(len(X) * holdout_fraction))
+    if n_holdout < 1 or len(X) - n_holdout < 2:
+        raise ValueError(f"Not enough samples ({len(X)}) to hold out {holdout_fraction:.0%}")
+    held_out = np.zeros(len(X), dtype=bool)
+    held_out[np.random.default_rng(seed).choice(len(X), n_holdout, replace=False)] = True
+    return X[~held_out], X[held_out]
+
+
+# Set once per worker process so the matrices are not pickled for every trial
+_sweep_data: Dict[str, np.ndarray] = {}
+
+
+def _init_sweep_worker(X_train: np.ndarray, X_holdout: np.ndarray) -> None:
+    _sweep_data['train'] = X_train
+    _sweep_data['holdout'] = X_holdout
+
+
+def evaluate_trial(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Fit one configuration on the training slice and score it on the held-out slice"""
+    X_train, X_holdout = _sweep_data['train'], _sweep_data['holdout']
+    contamination, n_estimators = params['contamination'], params['n_estimators']
+
+    started = time.perf_counter()
+    model = fit_isolation_forest(X_train, contamination, n_estimators)
+    fit_seconds = time.perf_counter() - started
+    reseeded = fit_isolation_forest(X_train, contamination, n_estimators, random_state=RANDOM_STATE + 1)
+
+    flat_model = FlatIsolationForest.from_sklearn(model)
+    latencies = []
+    for _ in range(LATENCY_REPEATS):
+        started = time.perf_counter()
+        anomalous = flat_model.predict(X_holdout) == -1
+        latencies.append(time.perf_counter() - started)
+    reseeded_anomalous = reseeded.predict(X_holdout) == -1
+
+    union = np.count_nonzero(anomalous | reseeded_anomalous)
+    agreement = np.count_nonzero(anomalous & reseeded_anomalous) / union if union else 1.0
+    holdout_rate = float(anomalous.mean())
+    return {
+        **params,
+        'holdout_anomaly_rate': holdout_rate,
+        'calibration_error': abs(holdout_rate - contamination),
+        'instability': 1.0 - agreement,
+        'latency_us_per_row': min(latencies) / len(X_holdout) * 1e6,
+        'fit_seconds': fit_seconds,
+    }
+
+
+def run_sweep(
+    X: np.ndarray,
+    candidates: Sequence[Dict[str, Any]],
+    holdout_fraction: float = 0.2,
+    latency_weight: float = 0.1,
+    calibration_weight: float = 1.0,
+    max_workers: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Evaluate every candidate in a process pool
+
+    Args:
+        X: Time-ordered training matrix
+        candidates: Configurations from sweep_grid
+        holdout_fraction: Share of rows, drawn across the window, used for scoring
+        latency_weight: Weight of the relative latency penalty in the objective
+        calibration_weight: Weight of the calibration error in the objective; 0 ignores it
+        max_workers: Worker processes; None uses every CPU
+
+    Returns:
+        Trial results with an 'objective', best (lowest) first
+    """
+    # sklearn fits and scores float32, so the split copies (and what each worker receives) are float32 too
+    X_train, X_holdout = split_holdout(np.asarray(X, dtype=np.float32), holdout_fraction)
+    workers = min(max_workers or os.cpu_count() or 1, len(candidates))
+    with ProcessPoolExecutor(workers, initializer=_init_sweep_worker, initargs=(X_train, X_holdout)) as pool:
+        trials = list(pool.map(evaluate_trial, candidates))
+
+    fastest = min(trial['latency_us_per_row'] for trial in trials)
+    for trial in trials:
+        latency_penalty = trial['latency_us_per_row'] / fastest - 1.0 if fastest > 0 else 0.0
+        trial['objective'] = (
+            trial['instability']
+            + calibration_weight * trial['calibration_error']
+            + latency_weight * latency_penalty
+        )
+    # Ties go to the cheaper model
+    return sorted(trials, key=lambda trial: (trial['objective'], trial['n_estimators']))
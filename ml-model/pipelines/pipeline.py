@@ -1,9 +1,16 @@
 # ml-model/pipelines/pipeline.py
 """
 Kubeflow Pipeline for Anomaly Detection - Single File Approach
+
+Components are containerized: `kfp component build` bakes this directory,
+including the shared `anomaly_core` package, into PIPELINE_IMAGE so training
+and the MCP tool run the same feature engineering code.
 """
+import os
 import kfp
 from kfp import dsl
+from kfp import kubernetes
+from typing import List
 from kfp.dsl import (
     Input,
     Output,
@@ -13,126 +20,397 @@ from kfp.dsl import (
     component
 )
 
+PIPELINE_IMAGE = os.getenv("PIPELINE_IMAGE", "chidambaram27/anomaly-detection-pipeline:v1")
+
 @component(
     base_image='python:3.13-slim',
-    packages_to_install=['pandas==2.3.3', 'prometheus-api-client==0.7.0', 'requests==2.31.0']
+    target_image=PIPELINE_IMAGE,
+    packages_to_install=['requests==2.31.0', 'numpy==2.3.5', 'pyarrow==22.0.0']
 )
 def fetch_data_component(
     prometheus_url: str,
     training_hours: int,
     instance_ip: str,
-    output_data: Output[Dataset]
+    output_data: Output[Dataset],
+    max_parallel_shards: int = 4,
+    metric_spec: str = ""
 ):
-    """Fetch CPU metrics from Prometheus"""
-    import os
-    import pandas as pd
-    from datetime import datetime, timedelta
-    from prometheus_api_client import PrometheusConnect
-    
-    prom = PrometheusConnect(url=prometheus_url, disable_ssl=True)
-    prom.check_prometheus_connection()
-    
-    end_time = datetime.now()
-    start_time = end_time - timedelta(hours=training_hours)
-    metrics_query = f'100 - (avg(rate(node_cpu_seconds_total{{mode="idle", instance="{instance_ip}"}}[5m])) * 100)'
-    
-    result = prom.custom_query_range(
-        query=metrics_query,
-        start_time=start_time,
-        end_time=end_time,
-        step='10s'
-    )
-    
-    if not result:
+    """Fetch the metrics of the metric spec from Prometheus"""
+    import time
+    from anomaly_core import DatasetWriter, align_series, fetch_range_sharded, instance_matchers, load_metric_spec
+    
+    spec = load_metric_spec(metric_spec)
+    end_time = time.time()
+    start_time = end_time - training_hours * 3600
+    queries = spec.queries(instance_matchers(instance=instance_ip))
+    
+    # Long windows exceed Prometheus's 11,000 points per query, so fetch
+    # step-aligned shards in parallel and stream each one to the artifact.
+    # Every metric uses the same shard boundaries, so the queries run side by
+    # side and each shard is aligned onto one time index before it is written.
+    shard_streams = [
+        fetch_range_sharded(
+            prometheus_url,
+            query,
+            start_time,
+            end_time,
+            step='10s',
+            max_workers=max_parallel_shards
+        )
+        for query in queries
+    ]
+    with DatasetWriter(output_data.path, spec.metric_names) as writer:
+        for shard in zip(*shard_streams):
+            aligned = align_series(shard)
+            if aligned:
+                _, timestamps, values = aligned[0]
+                writer.write(timestamps, {name: values[:, i] for i, name in enumerate(spec.metric_names)})
+    
+    if writer.num_rows == 0:
         raise ValueError("No data returned from Prometheus")
     
-    timestamps = []
-    values = []
-    for sample in result[0]['values']:
-        timestamps.append(datetime.fromtimestamp(sample[0]).isoformat())
-        values.append(float(sample[1]))
-    
-    df = pd.DataFrame({'timestamp': timestamps, 'cpu_usage': values})
-    df.to_csv(output_data.path, index=False)
-    print(f"✓ Fetched {len(df)} data points")
+    output_data.metadata.update(writer.metadata)
+    output_data.metadata['metric_spec'] = spec.to_dict()
+    print(f"✓ Fetched {writer.num_rows} data points for {len(queries)} metrics")
 
 @component(
     base_image='python:3.13-slim',
-    packages_to_install=['pandas==2.3.3']
+    target_image=PIPELINE_IMAGE,
+    packages_to_install=['numpy==2.3.5', 'pyarrow==22.0.0']
 )
 def engineer_features_component(
     input_data: Input[Dataset],
-    output_features: Output[Dataset]
+    output_features: Output[Dataset],
+    metric_spec: str = ""
 ):
     """Engineer features for ML"""
-    import pandas as pd
+    import numpy as np
+    from anomaly_core import load_metric_spec, read_dataset, write_dataset
     
-    df = pd.read_csv(input_data.path)
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    spec = load_metric_spec(metric_spec)
+    timestamps, columns = read_dataset(input_data.path, columns=spec.metric_names)
     
-    df['rolling_mean'] = df['cpu_usage'].rolling(window=5, min_periods=1).mean()
-    df['rolling_std'] = df['cpu_usage'].rolling(window=5, min_periods=1).std().fillna(0)
-    df['rate_of_change'] = df['cpu_usage'].diff().fillna(0)
-    df['hour'] = df['timestamp'].dt.hour
-    df = df.dropna()
+    timestamps, features = spec.compute_features(
+        timestamps,
+        np.column_stack([columns[name] for name in spec.metric_names])
+    )
     
-    df.to_csv(output_features.path, index=False)
-    print(f"✓ Created features for {len(df)} samples")
+    output_features.metadata.update(write_dataset(
+        output_features.path,
+        timestamps,
+        {name: features[:, i] for i, name in enumerate(spec.feature_columns)}
+    ))
+    print(f"✓ Created features for {len(timestamps)} samples")
+
+@component(
+    base_image='python:3.13-slim',
+    target_image=PIPELINE_IMAGE,
+    packages_to_install=['numpy==2.3.5', 'pyarrow==22.0.0']
+)
+def stack_features_component(
+    instance_features: Input[List[Dataset]],
+    output_features: Output[Dataset],
+    metric_spec: str = ""
+):
+    """Stack the engineered features of several instances into one training set"""
+    from anomaly_core import DatasetWriter, iter_dataset, load_metric_spec
+    
+    columns = load_metric_spec(metric_spec).feature_columns
+    # Rows are instance by instance, not in time order; training does not depend on row order
+    with DatasetWriter(output_features.path, columns) as writer:
+        for features in instance_features:
+            for timestamps, values in iter_dataset(features.path, columns=columns):
+                writer.write(timestamps, {name: values[:, i] for i, name in enumerate(columns)})
+    output_features.metadata.update(writer.metadata)
+    output_features.metadata['instances'] = len(instance_features)
+    print(f"✓ Stacked {writer.num_rows} rows from {len(instance_features)} instances")
 
 @component(
     base_image='python:3.13-slim',
-    packages_to_install=['pandas==2.3.3', 'numpy==2.3.5', 'scikit-learn==1.8.0']
+    target_image=PIPELINE_IMAGE,
+    packages_to_install=['requests==2.31.0', 'numpy==2.3.5', 'pyarrow==22.0.0', 'boto3==1.35.0']
+)
+def update_feature_store_component(
+    prometheus_url: str,
+    instance_ip: str,
+    feature_store_uri: str,
+    output_features: Output[Dataset],
+    initial_hours: int = 2,
+    retention_hours: int = 336,
+    max_training_samples: int = 100000,
+    half_life_hours: float = 72.0,
+    s3_endpoint: str = "http://minio-service.kubeflow:9000",
+    max_parallel_shards: int = 4,
+    metric_spec: str = ""
+):
+    """Append samples newer than the feature store's watermark and output the decayed training sample"""
+    import os
+    import tempfile
+    import time
+    import numpy as np
+    from anomaly_core import (
+        DatasetWriter,
+        FeatureStore,
+        RollingFeatureState,
+        align_series,
+        fetch_range_sharded,
+        instance_matchers,
+        load_metric_spec,
+        sample_keys,
+        write_dataset,
+    )
+    from anomaly_core.feature_store import (
+        load_sample,
+        new_manifest,
+        partition_filename,
+        rebuild_sample,
+        sample_filename,
+        save_sample,
+    )
+    
+    spec = load_metric_spec(metric_spec)
+    columns = spec.feature_columns
+    store = FeatureStore(feature_store_uri, s3_endpoint=s3_endpoint)
+    manifest = store.load_manifest() or new_manifest(columns, spec.to_dict())
+    if manifest['columns'] != columns:
+        raise ValueError(
+            f"Feature store {feature_store_uri} holds columns {manifest['columns']}, "
+            f"the metric spec produces {columns}; use a new feature_store_uri for a new spec"
+        )
+    
+    end_time = time.time()
+    retention_start = end_time - retention_hours * 3600
+    watermark = manifest['watermark']
+    if watermark is None:
+        start_time = end_time - initial_hours * 3600
+    else:
+        start_time = max(watermark, retention_start)
+    
+    # Rolling features continue from the raw samples just before the watermark,
+    # so appended rows match what a full recompute would produce
+    state = RollingFeatureState(spec.window, spec.feature_matrix)
+    raw_tail = manifest['raw_tail']
+    if raw_tail['timestamps']:
+        state.update(np.array(raw_tail['timestamps']), np.array(raw_tail['values']))
+    
+    # Objects of this run are named after its generation, so a retry after a failed
+    # run overwrites them instead of leaving orphans, and only the manifest makes them live
+    generation = manifest.get('generation', 0) + 1
+    previous_sample = manifest['sample'] or {}
+    rng = np.random.default_rng()
+    sample_params = {'size': max_training_samples, 'half_life_hours': half_life_hours}
+    sample = None
+    if previous_sample.get('name') and all(previous_sample.get(k) == v for k, v in sample_params.items()):
+        sample = load_sample(store, previous_sample['name'], columns, max_training_samples)
+    if sample is None:
+        if manifest['partitions']:
+            print("Rebuilding the training sample from the stored partitions")
+        partitions = [p for p in manifest['partitions'] if p['end_time'] >= retention_start]
+        sample = rebuild_sample(store, partitions, columns, max_training_samples, half_life_hours, rng)
+    
+    queries = spec.queries(instance_matchers(instance=instance_ip))
+    shard_streams = [
+        fetch_range_sharded(prometheus_url, query, start_time, end_time, step='10s', max_workers=max_parallel_shards)
+        for query in queries
+    ]
+    partition_name = partition_filename(generation)
+    with tempfile.TemporaryDirectory() as tmp:
+        partition_path = os.path.join(tmp, partition_name)
+        with DatasetWriter(partition_path, columns) as writer:
+            for shard in zip(*shard_streams):
+                aligned = align_series(shard)
+                if not aligned:
+                    continue
+                timestamps, features = state.update(aligned[0][1], aligned[0][2])
+                writer.write(timestamps, {name: features[:, i] for i, name in enumerate(columns)})
+                sample.offer(timestamps, features, sample_keys(timestamps, half_life_hours, rng))
+        if writer.num_rows:
+            store.upload(partition_path, partition_name)
+            manifest['partitions'].append({
+                'name': partition_name,
+                'start_time': writer.start_time,
+                'end_time': writer.end_time,
+                'num_rows': writer.num_rows,
+            })
+    
+    # Expire history past the retention window
+    expired = [p for p in manifest['partitions'] if p['end_time'] < retention_start]
+    manifest['partitions'] = [p for p in manifest['partitions'] if p['end_time'] >= retention_start]
+    sample.drop_before(retention_start)
+    if len(sample) == 0:
+        raise ValueError("Feature store has no samples in the retention window")
+    
+    sample_name = sample_filename(generation)
+    save_sample(store, sample_name, columns, sample)
+    if state.last_timestamp > float('-inf'):
+        tail_timestamps, tail_values = state.tail
+        manifest['watermark'] = state.last_timestamp
+        manifest['raw_tail'] = {'timestamps': tail_timestamps.tolist(), 'values': tail_values.tolist()}
+    manifest['generation'] = generation
+    manifest['sample'] = {**sample_params, 'name': sample_name}
+    store.save_manifest(manifest)
+    for partition in expired:
+        store.delete(partition['name'])
+    if previous_sample:
+        # Stores written before samples were versioned keep theirs as sample.parquet
+        store.delete(previous_sample.get('name', 'sample.parquet'))
+    
+    timestamps, features = sample.sorted()
+    output_features.metadata.update(write_dataset(
+        output_features.path,
+        timestamps,
+        {name: features[:, i] for i, name in enumerate(columns)}
+    ))
+    output_features.metadata['feature_store'] = {
+        'uri': feature_store_uri,
+        'watermark': manifest['watermark'],
+        'new_samples': writer.num_rows,
+        'stored_samples': sum(p['num_rows'] for p in manifest['partitions']),
+    }
+    print(f"✓ Appended {writer.num_rows} samples; training on {len(timestamps)} of "
+          f"{output_features.metadata['feature_store']['stored_samples']} stored samples")
+
+@component(
+    base_image='python:3.13-slim',
+    target_image=PIPELINE_IMAGE,
+    packages_to_install=['pandas==2.3.3', 'numpy==2.3.5', 'scikit-learn==1.8.0', 'pyarrow==22.0.0']
 )
 def train_model_component(
     input_features: Input[Dataset],
     output_model: Output[Model],
     output_metrics: Output[Metrics],
     contamination: float = 0.05,
-    n_estimators: int = 100
+    n_estimators: int = 100,
+    instance: str = "",
+    max_training_samples: int = 0,
+    sampling: str = "reservoir"
 ):
     """Train IsolationForest model"""
-    import pickle
     import json
     import pandas as pd
-    import os
-    from sklearn.ensemble import IsolationForest
+    from anomaly_core import load_training_sample, save_model
+    from anomaly_core.training import fit_isolation_forest, peak_rss_bytes
+    
+    # Every column of the features dataset, in the order the metric spec wrote them, streamed
+    # as float32; with max_training_samples set only that many rows are ever held
+    columns, _, X = load_training_sample(input_features.path, max_training_samples, sampling)
+    X = pd.DataFrame(X, columns=columns)
+    
+    model = fit_isolation_forest(X, contamination, n_estimators)
+    
+    # Save model, its flat export and model_info.json
+    metrics = save_model(output_model.path, model, X, instance=instance)
+    normal, anomalies = metrics['normal_samples'], metrics['anomalies_detected']
+    metrics.update({
+        'sampling': sampling if max_training_samples > 0 else "all",
+        'peak_rss_bytes': peak_rss_bytes(),
+    })
+    output_metrics.log_metric('training_samples', metrics['training_samples'])
+    output_metrics.log_metric('peak_rss_mib', metrics['peak_rss_bytes'] / 2**20)
     
-    df = pd.read_csv(input_features.path)
-    feature_columns = ['cpu_usage', 'rolling_mean', 'rolling_std', 'rate_of_change', 'hour']
-    X = df[feature_columns]
+    with open(output_metrics.path, 'w') as f:
+        json.dump(metrics, f)
     
-    model = IsolationForest(
-        contamination=contamination,
-        random_state=42,
-        n_estimators=n_estimators
+    print(f"✓ Model trained: {normal} normal, {anomalies} anomalies")
+
+@component(
+    base_image='python:3.13-slim',
+    target_image=PIPELINE_IMAGE,
+    packages_to_install=['pandas==2.3.3', 'numpy==2.3.5', 'scikit-learn==1.8.0', 'pyarrow==22.0.0']
+)
+def sweep_model_component(
+    input_features: Input[Dataset],
+    output_model: Output[Model],
+    output_metrics: Output[Metrics],
+    contamination_values: List[float] = [0.01, 0.02, 0.05, 0.1],
+    n_estimators_values: List[int] = [50, 100, 200],
+    max_trials: int = 0,
+    holdout_fraction: float = 0.2,
+    latency_weight: float = 0.1,
+    calibration_weight: float = 1.0,
+    max_workers: int = 0,
+    instance: str = ""
+):
+    """Fit a grid of IsolationForest configurations in parallel and publish the best one"""
+    import json
+    import pandas as pd
+    from anomaly_core import read_dataset, run_sweep, save_model, sweep_grid
+    from anomaly_core.training import fit_isolation_forest
+    
+    _, columns = read_dataset(input_features.path)
+    X = pd.DataFrame(columns)
+    
+    # Trials are scored on a random holdout_fraction of the rows and fitted on the rest
+    candidates = sweep_grid(contamination_values, n_estimators_values, max_trials)
+    trials = run_sweep(
+        X.to_numpy(),
+        candidates,
+        holdout_fraction=holdout_fraction,
+        latency_weight=latency_weight,
+        calibration_weight=calibration_weight,
+        max_workers=max_workers or None
     )
-    model.fit(X)
-    
-    predictions = model.predict(X)
-    anomalies = (predictions == -1).sum()
-    normal = (predictions == 1).sum()
-    
-    # Save model
-    os.makedirs(output_model.path, exist_ok=True)
-    with open(f"{output_model.path}/model.pkl", 'wb') as f:
-        pickle.dump(model, f)
-    
-    # Save metrics
-    metrics = {
-        'training_samples': len(X),
-        'normal_samples': int(normal),
-        'anomalies_detected': int(anomalies),
-        'normal_percentage': float(normal / len(X) * 100),
-        'anomalies_percentage': float(anomalies / len(X) * 100)
-    }
+    for i, trial in enumerate(trials):
+        print(f"  #{i + 1} contamination={trial['contamination']} n_estimators={trial['n_estimators']}: "
+              f"objective={trial['objective']:.4f} instability={trial['instability']:.3f} "
+              f"calibration_error={trial['calibration_error']:.3f} latency={trial['latency_us_per_row']:.2f}us/row")
+        output_metrics.log_metric(f"trial_c{trial['contamination']}_n{trial['n_estimators']}_objective", trial['objective'])
+    
+    # The winner is refitted on the full window, holdout included
+    best = trials[0]
+    model = fit_isolation_forest(X, best['contamination'], best['n_estimators'])
+    metrics = save_model(output_model.path, model, X, instance=instance)
+    metrics.update({
+        'contamination': best['contamination'],
+        'n_estimators': best['n_estimators'],
+        'objective': best['objective'],
+        'trials': trials,
+    })
+    output_model.metadata.update({'contamination': best['contamination'], 'n_estimators': best['n_estimators']})
+    for name in ('contamination', 'n_estimators', 'objective'):
+        output_metrics.log_metric(f"best_{name}", best[name])
     
     with open(output_metrics.path, 'w') as f:
         json.dump(metrics, f)
     
-    print(f"✓ Model trained: {normal} normal, {anomalies} anomalies")
+    print(f"✓ Best of {len(trials)} trials: contamination={best['contamination']}, "
+          f"n_estimators={best['n_estimators']}")
+
+@component(
+    base_image='python:3.13-slim',
+    target_image=PIPELINE_IMAGE
+)
+def package_models_component(
+    instance_models: Input[List[Model]],
+    default_model: Input[Model],
+    output_model: Output[Model]
+):
+    """Bundle per-instance models and the fleet-wide default into one multi-model artifact"""
+    import json
+    import os
+    import shutil
+    from anomaly_core import model_name_for, write_model_index
+    from anomaly_core.registry import DEFAULT_MODEL_DIR, MODEL_INFO_FILENAME
+    
+    os.makedirs(output_model.path, exist_ok=True)
+    shutil.copytree(default_model.path, os.path.join(output_model.path, DEFAULT_MODEL_DIR))
+    
+    # ParallelFor outputs are collected in no guaranteed order, so each model says which instance it is for
+    models = {}
+    for model in instance_models:
+        with open(os.path.join(model.path, MODEL_INFO_FILENAME)) as f:
+            instance = json.load(f)['instance']
+        name = model_name_for(instance)
+        shutil.copytree(model.path, os.path.join(output_model.path, name))
+        models[instance] = name
+    
+    write_model_index(output_model.path, models, default=DEFAULT_MODEL_DIR)
+    output_model.metadata['models'] = len(models)
+    print(f"✓ Packaged {len(models)} per-instance models and the default model")
 
 @component(
     base_image='python:3.13-slim',
+    target_image=PIPELINE_IMAGE,
     packages_to_install=['kubernetes==30.1.0', 'pyyaml==6.0.2']
 )
 def deploy_inference_component(
@@ -140,7 +418,8 @@ def deploy_inference_component(
     inference_service_name: str = "sklearn-iris",
     namespace: str = "default",
     service_account_name: str = "sa-minio-kserve",
-    storage_uri_override: str = ""  # Optional: override if auto-detection fails
+    storage_uri_override: str = "",  # Optional: override if auto-detection fails
+    predictor_image: str = ""  # Optional: serve model_flat.npz with the flat-forest predictor image
 ):
     """Deploy InferenceService to cluster using model artifact location"""
     import os
@@ -263,6 +542,18 @@ def deploy_inference_component(
         }
     }
     
+    if predictor_image:
+        # Custom container: KServe's storage initializer still downloads STORAGE_URI to /mnt/models
+        inference_service["spec"]["predictor"] = {
+            "serviceAccountName": service_account_name,
+            "containers": [{
+                "name": "kserve-container",
+                "image": predictor_image,
+                "args": ["--model_name", inference_service_name, "--model_dir", "/mnt/models"],
+                "env": [{"name": "STORAGE_URI", "value": storage_uri}]
+            }]
+        }
+    
     # Apply InferenceService using Kubernetes API
     api_instance = client.CustomObjectsApi()
     group = "serving.kserve.io"
@@ -280,14 +571,18 @@ def deploy_inference_component(
                 name=inference_service_name
             )
             print(f"InferenceService {inference_service_name} already exists. Updating...")
-            # Update existing
+            # Update existing; null out whichever predictor form is unused so the
+            # merge patch can switch between the sklearn runtime and the custom predictor
+            patch = json.loads(json.dumps(inference_service))
+            patch["spec"]["predictor"].setdefault("model", None)
+            patch["spec"]["predictor"].setdefault("containers", None)
             api_instance.patch_namespaced_custom_object(
                 group=group,
                 version=version,
                 namespace=namespace,
                 plural=plural,
                 name=inference_service_name,
-                body=inference_service
+                body=patch
             )
             print(f"✓ InferenceService {inference_service_name} updated successfully")
         except ApiException as e:
@@ -313,6 +608,65 @@ def deploy_inference_component(
     print(f"  Storage URI: {storage_uri}")
     print(f"  Namespace: {namespace}")
 
+@component(
+    base_image='python:3.13-slim',
+    target_image=PIPELINE_IMAGE,
+    packages_to_install=[
+        'requests==2.31.0', 'numpy==2.3.5', 'pyarrow==22.0.0', 'boto3==1.35.0',
+        'kubernetes==30.1.0', 'scikit-learn==1.8.0'
+    ]
+)
+def backfill_scoring_component(
+    prometheus_url: str,
+    instances: List[str],
+    output_uri: str,
+    start_time: str,
+    output_metrics: Output[Metrics],
+    end_time: str = "",
+    step: str = "10s",
+    window_hours: float = 24.0,
+    inference_service_name: str = "anomaly-detection",
+    namespace: str = "default",
+    model_uri: str = "",
+    anomaly_threshold: float = 0.0,
+    merge_gap_seconds: float = 0.0,
+    min_period_seconds: float = 0.0,
+    s3_endpoint: str = "http://minio-service.kubeflow:9000",
+    max_workers: int = 0,
+    metric_spec: str = ""
+):
+    """Score [start_time, end_time] for every instance and write the anomaly periods as partitioned Parquet"""
+    import json
+    import time
+    from anomaly_core import load_metric_spec, run_backfill
+    from anomaly_core.backfill import parse_time
+    
+    summary = run_backfill(
+        prometheus_url,
+        output_uri,
+        instances,
+        parse_time(start_time),
+        parse_time(end_time) if end_time else time.time(),
+        step=step,
+        window_hours=window_hours,
+        metric_spec=load_metric_spec(metric_spec),
+        model_uri=model_uri,
+        inference_service_name=inference_service_name,
+        namespace=namespace,
+        threshold=anomaly_threshold,
+        merge_gap_seconds=merge_gap_seconds,
+        min_period_seconds=min_period_seconds,
+        s3_endpoint=s3_endpoint,
+        max_workers=max_workers or None
+    )
+    for name in ('windows', 'resumed', 'scored', 'rows', 'anomalies', 'periods'):
+        output_metrics.log_metric(name, summary[name])
+    
+    with open(output_metrics.path, 'w') as f:
+        json.dump(summary, f)
+    
+    print(f"✓ Backfill wrote {summary['periods']} anomaly periods from {summary['rows']} rows to {output_uri}")
+
 @dsl.pipeline(
     name='anomaly-detection-training',
     description='Train anomaly detection model from Prometheus metrics'
@@ -322,27 +676,35 @@ def anomaly_detection_pipeline(
     training_hours: int = 2,
     instance_ip: str = "10.0.0.194:9100",
     contamination: float = 0.05,
-    n_estimators: int = 100
+    n_estimators: int = 100,
+    predictor_image: str = "",
+    metric_spec: str = "",
+    max_training_samples: int = 0,
+    training_sampling: str = "reservoir"
 ):
     """Main pipeline definition"""
     
-    # Step 1: Fetch data
+    # Step 1: Fetch data (never cached: the window ends at the time of the run)
     fetch_task = fetch_data_component(
         prometheus_url=prometheus_url,
         training_hours=training_hours,
-        instance_ip=instance_ip
-    )
+        instance_ip=instance_ip,
+        metric_spec=metric_spec
+    ).set_caching_options(False)
     
     # Step 2: Engineer features
     engineer_task = engineer_features_component(
-        input_data=fetch_task.outputs['output_data']
+        input_data=fetch_task.outputs['output_data'],
+        metric_spec=metric_spec
     )
     
     # Step 3: Train model
     train_task = train_model_component(
         input_features=engineer_task.outputs['output_features'],
         contamination=contamination,
-        n_estimators=n_estimators
+        n_estimators=n_estimators,
+        max_training_samples=max_training_samples,
+        sampling=training_sampling
     )
     
     # Step 4: Deploy InferenceService
@@ -350,12 +712,272 @@ def anomaly_detection_pipeline(
         input_model=train_task.outputs['output_model'],
         inference_service_name="anomaly-detection",
         namespace="default",
-        service_account_name="sa-minio-kserve"
+        service_account_name="sa-minio-kserve",
+        predictor_image=predictor_image
+    ).set_caching_options(False)
+
+@dsl.pipeline(
+    name='anomaly-detection-per-instance-training',
+    description='Train one anomaly detection model per instance and serve them from one deployment'
+)
+def per_instance_anomaly_detection_pipeline(
+    instances: List[str],
+    prometheus_url: str = "http://kube-prometheus-stack-prometheus.kube-prometheus-stack.svc.cluster.local:9090",
+    training_hours: int = 2,
+    contamination: float = 0.05,
+    n_estimators: int = 100,
+    predictor_image: str = "chidambaram27/anomaly-flat-predictor:v1",
+    metric_spec: str = "",
+    inference_service_name: str = "anomaly-detection",
+    max_training_samples: int = 0,
+    training_sampling: str = "reservoir"
+):
+    """
+    Per-instance variant of anomaly_detection_pipeline
+    
+    Each instance gets its own fetch/engineer/train branch in a ParallelFor, so
+    nodes with very different baselines are judged against their own history.
+    A fleet-wide model trained on the per-instance feature sets stacked together
+    (every node's own rows, not an averaged series) is packaged alongside as the
+    default for instances without a model. Everything is served by one flat-forest
+    predictor deployment (predictor_image is required: the sklearn runtime
+    serves a single model).
+    """
+    
+    with dsl.ParallelFor(instances) as instance_ip:
+        fetch_task = fetch_data_component(
+            prometheus_url=prometheus_url,
+            training_hours=training_hours,
+            instance_ip=instance_ip,
+            metric_spec=metric_spec
+        ).set_caching_options(False)
+        engineer_task = engineer_features_component(
+            input_data=fetch_task.outputs['output_data'],
+            metric_spec=metric_spec
+        )
+        train_task = train_model_component(
+            input_features=engineer_task.outputs['output_features'],
+            contamination=contamination,
+            n_estimators=n_estimators,
+            instance=instance_ip,
+            max_training_samples=max_training_samples,
+            sampling=training_sampling
+        )
+    
+    # Fleet-wide default: the rows of every instance, each with its own baseline.
+    # A query without an instance matcher would average the nodes into one flat series.
+    stack_task = stack_features_component(
+        instance_features=dsl.Collected(engineer_task.outputs['output_features']),
+        metric_spec=metric_spec
+    )
+    default_train_task = train_model_component(
+        input_features=stack_task.outputs['output_features'],
+        contamination=contamination,
+        n_estimators=n_estimators,
+        max_training_samples=max_training_samples,
+        sampling=training_sampling
+    )
+    
+    package_task = package_models_component(
+        instance_models=dsl.Collected(train_task.outputs['output_model']),
+        default_model=default_train_task.outputs['output_model']
     )
+    
+    deploy_task = deploy_inference_component(
+        input_model=package_task.outputs['output_model'],
+        inference_service_name=inference_service_name,
+        namespace="default",
+        service_account_name="sa-minio-kserve",
+        predictor_image=predictor_image
+    ).set_caching_options(False)
+
+@dsl.pipeline(
+    name='anomaly-detection-tuned-training',
+    description='Sweep IsolationForest hyperparameters in parallel and deploy the best model'
+)
+def tuned_anomaly_detection_pipeline(
+    prometheus_url: str = "http://kube-prometheus-stack-prometheus.kube-prometheus-stack.svc.cluster.local:9090",
+    training_hours: int = 2,
+    instance_ip: str = "10.0.0.194:9100",
+    contamination_values: List[float] = [0.01, 0.02, 0.05, 0.1],
+    n_estimators_values: List[int] = [50, 100, 200],
+    max_trials: int = 0,
+    holdout_fraction: float = 0.2,
+    latency_weight: float = 0.1,
+    calibration_weight: float = 1.0,
+    predictor_image: str = "",
+    metric_spec: str = ""
+):
+    """
+    anomaly_detection_pipeline with a hyperparameter sweep in place of the single training step
+    
+    Every contamination x n_estimators configuration (or max_trials random ones)
+    is fitted in a process pool and ranked on a random holdout_fraction of the
+    window's rows by seed stability, anomaly-rate calibration and per-row inference
+    cost (see anomaly_core.training). Only the winner is deployed.
+    """
+    
+    fetch_task = fetch_data_component(
+        prometheus_url=prometheus_url,
+        training_hours=training_hours,
+        instance_ip=instance_ip,
+        metric_spec=metric_spec
+    ).set_caching_options(False)
+    
+    engineer_task = engineer_features_component(
+        input_data=fetch_task.outputs['output_data'],
+        metric_spec=metric_spec
+    )
+    
+    sweep_task = sweep_model_component(
+        input_features=engineer_task.outputs['output_features'],
+        contamination_values=contamination_values,
+        n_estimators_values=n_estimators_values,
+        max_trials=max_trials,
+        holdout_fraction=holdout_fraction,
+        latency_weight=latency_weight,
+        calibration_weight=calibration_weight,
+        max_workers=4
+    ).set_cpu_limit('4')
+    
+    deploy_task = deploy_inference_component(
+        input_model=sweep_task.outputs['output_model'],
+        inference_service_name="anomaly-detection",
+        namespace="default",
+        service_account_name="sa-minio-kserve",
+        predictor_image=predictor_image
+    ).set_caching_options(False)
+
+def _use_minio_credentials(task) -> None:
+    """Expose the KFP MinIO credentials to a step that reads or writes S3 itself"""
+    kubernetes.use_secret_as_env(
+        task,
+        secret_name='mlpipeline-minio-artifact',
+        secret_key_to_env={'accesskey': 'AWS_ACCESS_KEY_ID', 'secretkey': 'AWS_SECRET_ACCESS_KEY'}
+    )
+
+@dsl.pipeline(
+    name='anomaly-detection-incremental-training',
+    description='Retrain from a rolling feature store, fetching only data newer than the last run'
+)
+def incremental_anomaly_detection_pipeline(
+    prometheus_url: str = "http://kube-prometheus-stack-prometheus.kube-prometheus-stack.svc.cluster.local:9090",
+    feature_store_uri: str = "s3://mlpipeline/feature-store/anomaly-detection",
+    instance_ip: str = "10.0.0.194:9100",
+    initial_hours: int = 2,
+    retention_hours: int = 336,
+    max_training_samples: int = 100000,
+    half_life_hours: float = 72.0,
+    contamination: float = 0.05,
+    n_estimators: int = 100,
+    predictor_image: str = "",
+    metric_spec: str = ""
+):
+    """
+    Incremental variant of anomaly_detection_pipeline, meant for a recurring run
+    
+    Each run fetches only the samples since the previous run, appends their
+    features to the store at feature_store_uri, and trains on a bounded sample
+    of up to retention_hours of history that favours recent data (see
+    anomaly_core.feature_store). The first run backfills initial_hours. Use one
+    store per instance/metric spec and at most one concurrent run per store.
+    """
+    
+    # Never cached: it reads Prometheus up to the time of the run and writes the store
+    store_task = update_feature_store_component(
+        prometheus_url=prometheus_url,
+        instance_ip=instance_ip,
+        feature_store_uri=feature_store_uri,
+        initial_hours=initial_hours,
+        retention_hours=retention_hours,
+        max_training_samples=max_training_samples,
+        half_life_hours=half_life_hours,
+        metric_spec=metric_spec
+    ).set_caching_options(False)
+    _use_minio_credentials(store_task)
+    
+    train_task = train_model_component(
+        input_features=store_task.outputs['output_features'],
+        contamination=contamination,
+        n_estimators=n_estimators,
+        instance=instance_ip
+    )
+    
+    deploy_task = deploy_inference_component(
+        input_model=train_task.outputs['output_model'],
+        inference_service_name="anomaly-detection",
+        namespace="default",
+        service_account_name="sa-minio-kserve",
+        predictor_image=predictor_image
+    ).set_caching_options(False)
+
+@dsl.pipeline(
+    name='anomaly-detection-backfill-scoring',
+    description='Score historical metrics with the deployed model and store the anomaly periods in MinIO'
+)
+def backfill_scoring_pipeline(
+    prometheus_url: str = "http://kube-prometheus-stack-prometheus.kube-prometheus-stack.svc.cluster.local:9090",
+    output_uri: str = "s3://mlpipeline/anomaly-backfill/anomaly-detection",
+    instances: List[str] = ["10.0.0.194:9100"],
+    start_time: str = "",
+    end_time: str = "",
+    window_hours: float = 24.0,
+    inference_service_name: str = "anomaly-detection",
+    model_uri: str = "",
+    anomaly_threshold: float = 0.0,
+    max_workers: int = 4,
+    metric_spec: str = ""
+):
+    """
+    Backfill anomaly periods over months of history
+    
+    Scores every instance from start_time up to end_time (ISO 8601 or epoch
+    seconds; end_time defaults to now) with the model deployed behind
+    inference_service_name, or the artifact at model_uri, and writes one Parquet
+    file of periods per instance and window under output_uri, partitioned by
+    instance and date (see anomaly_core.backfill). A failed or cancelled run
+    started again with the same output_uri resumes where it stopped.
+    """
+    
+    # Never cached: resuming depends on the checkpoint in output_uri, not on the inputs
+    backfill_task = backfill_scoring_component(
+        prometheus_url=prometheus_url,
+        instances=instances,
+        output_uri=output_uri,
+        start_time=start_time,
+        end_time=end_time,
+        window_hours=window_hours,
+        inference_service_name=inference_service_name,
+        model_uri=model_uri,
+        anomaly_threshold=anomaly_threshold,
+        max_workers=max_workers,
+        metric_spec=metric_spec
+    ).set_cpu_limit('4').set_caching_options(False)
+    _use_minio_credentials(backfill_task)
 
 if __name__ == "__main__":
     kfp.compiler.Compiler().compile(
         pipeline_func=anomaly_detection_pipeline,
         package_path='generated-anomaly-detection-pipeline.yaml'
     )
-    print("✓ Pipeline compiled to generated-anomaly-detection-pipeline.yaml")
\ No newline at end of file
+    print("✓ Pipeline compiled to generated-anomaly-detection-pipeline.yaml")
+    kfp.compiler.Compiler().compile(
+        pipeline_func=per_instance_anomaly_detection_pipeline,
+        package_path='generated-per-instance-anomaly-detection-pipeline.yaml'
+    )
+    print("✓ Pipeline compiled to generated-per-instance-anomaly-detection-pipeline.yaml")
+    kfp.compiler.Compiler().compile(
+        pipeline_func=incremental_anomaly_detection_pipeline,
+        package_path='generated-incremental-anomaly-detection-pipeline.yaml'
+    )
+    print("✓ Pipeline compiled to generated-incremental-anomaly-detection-pipeline.yaml")
+    kfp.compiler.Compiler().compile(
+        pipeline_func=tuned_anomaly_detection_pipeline,
+        package_path='generated-tuned-anomaly-detection-pipeline.yaml'
+    )
+    print("✓ Pipeline compiled to generated-tuned-anomaly-detection-pipeline.yaml")
+    kfp.compiler.Compiler().compile(
+        pipeline_func=backfill_scoring_pipeline,
+        package_path='generated-backfill-scoring-pipeline.yaml'
+    )
+    print("✓ Pipeline compiled to generated-backfill-scoring-pipeline.yaml")
@@ -6,6 +6,10 @@ source myenv/bin/activate
 
 pip install -r requirements.txt
 
+# build and push the containerized component image (bundles the shared anomaly_core package)
+# requires: pip install "kfp[all]" and a running docker daemon
+kfp component build . --component-filepattern pipeline.py --push-image
+
 python pipeline.py 
 
 kubectl apply -f minio.yaml 
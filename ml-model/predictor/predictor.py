@@ -0,0 +1,81 @@
+# ml-model/predictor/predictor.py
+"""
+KServe custom predictor serving the flattened IsolationForest
+
+Loads model_flat.npz (written next to model.pkl by train_model_component) from
+the storage-initializer mount and scores v1/v2 requests with the vectorized
+NumPy scorer, without loading sklearn or unpickling the forest.
+
+Besides the -1/1 labels every response carries the decision_function value
+per row (negative = anomaly, lower = more anomalous): v2 responses as a second
+output tensor named anomaly-score, v1 responses as a "scores" list next to
+"predictions". Clients rank nodes and periods by it and can re-threshold it
+without re-scoring.
+
+A per-instance package (model_index.json at the root) is served as one model
+per instance under its registry name, plus the package default under
+--model_name, all from this one server.
+"""
+import argparse
+import os
+from typing import Dict, List, Union
+
+import numpy as np
+import pandas as pd
+from kserve import InferRequest, InferResponse, Model, ModelServer, model_server
+from kserve.utils.utils import get_predict_input, get_predict_response
+
+from anomaly_core.forest import FLAT_MODEL_FILENAME, FlatIsolationForest
+from anomaly_core.inference import LABEL_OUTPUT, SCORE_OUTPUT
+from anomaly_core.registry import read_model_index
+
+
+class FlatForestModel(Model):
+    def __init__(self, name: str, model_dir: str):
+        super().__init__(name)
+        self.model_dir = model_dir
+        self._model = None
+
+    def load(self) -> bool:
+        path = os.path.join(self.model_dir, FLAT_MODEL_FILENAME)
+        self._model = FlatIsolationForest.load(path)
+        print(f"✓ Loaded {self._model.n_estimators} trees ({self._model.n_nodes} nodes) from {path}")
+        self.ready = True
+        return self.ready
+
+    async def predict(
+        self,
+        payload: Union[Dict, InferRequest],
+        headers: Dict[str, str] = None,
+        response_headers: Dict[str, str] = None
+    ) -> Union[Dict, InferResponse]:
+        instances = get_predict_input(payload)
+        scores = self._model.decision_function(instances)
+        labels = np.where(scores < 0, -1, 1)
+        if isinstance(payload, dict):
+            return {"predictions": labels.tolist(), "scores": scores.tolist()}
+        # One v2 output per column, labels first so clients reading output 0 are unaffected
+        result = pd.DataFrame({LABEL_OUTPUT: labels, SCORE_OUTPUT: scores})
+        return get_predict_response(payload, result, self.name)
+
+
+def load_models(model_name: str, model_dir: str) -> List[FlatForestModel]:
+    """One model for a single-model artifact, or every model of a per-instance package"""
+    index = read_model_index(model_dir)
+    if index is None:
+        models = [FlatForestModel(model_name, model_dir)]
+    else:
+        models = [FlatForestModel(name, os.path.join(model_dir, name)) for name in index["models"].values()]
+        if index.get("default"):
+            models.append(FlatForestModel(model_name, os.path.join(model_dir, index["default"])))
+    for model in models:
+        model.load()
+    return models
+
+
+parser = argparse.ArgumentParser(parents=[model_server.parser])
+parser.add_argument("--model_dir", default="/mnt/models", help="Directory containing model_flat.npz or model_index.json")
+
+if __name__ == "__main__":
+    args, _ = parser.parse_known_args()
+    ModelServer().start(load_models(args.model_name, args.model_dir))